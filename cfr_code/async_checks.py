@@ -0,0 +1,131 @@
+from data_structures.cfr_trees import CFRJointStrategy
+from cfr_code.worker_results import putResult, getResult
+import multiprocessing
+import queue
+
+class AsyncChecker:
+    """
+    Evaluates the convergence checkpoints of a solver in a background process, so that the iterations can go on
+    meanwhile.
+    Each submitted checkpoint is a snapshot of the cumulative strategies of all the information sets (or of the
+    plans of the joint strategy, if any, together with the cumulative strategies only if the epsilon of the marginal
+    strategies is needed too); the worker process computes its epsilon and utility on its own copy of the tree, and
+    the completed datapoints are appended to graph_data and passed to check_callback in the order they were
+    submitted, each one with the iteration number it was taken at.
+    If a checkpoint fails in the worker process, its exception is raised by collect (as is a WorkerError if the
+    worker dies), so the solver never waits for a datapoint that will not come.
+    The worker process is forked, so this is only available where the 'fork' start method is (e.g. Linux).
+    """
+
+    def __init__(self, cfr_tree, graph_data, check_callback = None, marginal_epsilon = False):
+        """
+        Start the worker process for the given tree. If marginal_epsilon is True, the checkpoints with a joint
+        strategy also get the epsilon of the marginal strategies (see CFRTree.checkMarginalsEpsilon).
+        """
+
+        self.infosets = sorted(cfr_tree.information_sets.values(), key = lambda i: i.index)
+        self.graph_data = graph_data
+        self.check_callback = check_callback
+        self.marginal_epsilon = marginal_epsilon
+
+        context = multiprocessing.get_context('fork')
+        self.requests = context.Queue()
+        self.results = context.Queue()
+        self.pending = 0
+
+        self.process = context.Process(target = checkWorker, daemon = True,
+                                       args = (cfr_tree, self.infosets, self.requests, self.results, marginal_epsilon))
+        self.process.start()
+
+    def submit(self, data, joint = None):
+        """
+        Submit a checkpoint of the current strategies (and of the given joint strategy). data holds the entries of the
+        datapoint known by the solver (e.g. iteration_number and duration); the worker adds epsilon and utility (of
+        the joint strategy if given, otherwise of the average strategies).
+        """
+
+        # The cumulative strategies are only needed to evaluate the average strategies
+        snapshot = None
+        if joint == None or self.marginal_epsilon:
+            snapshot = [list(iset.cumulative_strategy) for iset in self.infosets]
+
+        joint_snapshot = None
+        if joint != None:
+            joint_snapshot = (dict(joint.plans), list(joint.product_components), joint.frequencyCount)
+
+        self.requests.put((data, snapshot, joint_snapshot))
+        self.pending += 1
+
+    def collect(self, wait = False):
+        """
+        Deliver the datapoints which are ready (or all of them, if wait is True).
+        """
+
+        while self.pending > 0:
+            try:
+                data = getResult(self.results, self.process, block = wait)
+            except queue.Empty:
+                return
+
+            self.graph_data.append(data)
+            if(self.check_callback != None):
+                self.check_callback(data)
+            self.pending -= 1
+
+    def close(self):
+        """
+        Deliver all the pending datapoints and stop the worker process.
+        """
+
+        self.collect(wait = True)
+        self.requests.put(None)
+        self.process.join()
+
+    def terminate(self):
+        """
+        Kill the worker process without waiting for the pending datapoints (e.g. to clean up after an error). Does
+        nothing if the worker process already stopped.
+        """
+
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process.join()
+
+def checkWorker(cfr_tree, infosets, requests, results, marginal_epsilon):
+    """
+    Worker side of AsyncChecker: evaluate each snapshot received (see cfr_code.worker_results.putResult).
+    """
+
+    while True:
+        request = requests.get()
+        if request == None:
+            return
+
+        # After a failure no later datapoint could be delivered in order, so the worker stops
+        if not putResult(results, lambda: evaluateCheckpoint(cfr_tree, infosets, request, marginal_epsilon)):
+            return
+
+def evaluateCheckpoint(cfr_tree, infosets, request, marginal_epsilon):
+    """
+    Complete the datapoint of a checkpoint submitted to AsyncChecker, evaluating its snapshot on the tree.
+    """
+
+    (data, snapshot, joint_snapshot) = request
+
+    if snapshot != None:
+        for (iset, strategy) in zip(infosets, snapshot):
+            iset.cumulative_strategy = strategy
+
+    if joint_snapshot == None:
+        data['epsilon'] = cfr_tree.checkMarginalsEpsilon()
+        data['utility'] = cfr_tree.root.getExpectedUtility()
+    else:
+        joint = CFRJointStrategy(cfr_tree)
+        (joint.plans, joint.product_components, joint.frequencyCount) = joint_snapshot
+
+        data['epsilon'] = cfr_tree.checkEquilibrium(joint)
+        if marginal_epsilon:
+            data['marginal_epsilon'] = cfr_tree.checkMarginalsEpsilon()
+        data['utility'] = cfr_tree.getUtility(joint)
+
+    return data
@@ -1,9 +1,30 @@
+from data_structures.trees import useIterativeTraversals
 from functools import reduce
+import math
+from enum import Enum
 import time
 
-def CFR(node, player, pi, use_cfr_plus = False):
+class CFREngine(Enum):
+    Recursive = 0
+    Vectorized = 1
+
+def CFR(node, player, pi, use_cfr_plus = False, discounter = None, weight = 1):
     """
     Vanilla CFR algorithm.
+    If use_cfr_plus is True, the regrets updated at the node are clipped at zero (CFR+). The flag is only passed
+    down through chance nodes, so only the first decision node on each path is clipped.
+    If a discounter is given (see cfr_code.discounted_cfr.LazyDiscounter), regrets and strategies are updated
+    through it, as in Discounted CFR.
+    All the regret and strategy updates are multiplied by weight (see ChanceSampledCFR).
+    """
+
+    if useIterativeTraversals():
+        return iterativeCFR(node, player, pi, use_cfr_plus, discounter, weight)
+    return recursiveCFR(node, player, pi, use_cfr_plus, discounter, weight)
+
+def recursiveCFR(node, player, pi, use_cfr_plus = False, discounter = None, weight = 1):
+    """
+    Recursive implementation of CFR(), used when recursive traversals are selected.
     """
 
     n_players = len(pi)
@@ -12,7 +33,7 @@ def CFR(node, player, pi, use_cfr_plus = False):
     if node.isChance():
         res = 0
         for (p, child) in zip (node.distribution, node.children):
-            res += CFR(child, player, pi, use_cfr_plus) * p
+            res += recursiveCFR(child, player, pi, use_cfr_plus, discounter, weight) * p
         return res
     
     if(node.isLeaf()):
@@ -26,7 +47,7 @@ def CFR(node, player, pi, use_cfr_plus = False):
         
         old_pi = pi[iset.player]
         pi[iset.player] *= iset.current_strategy[a]
-        v_alt[a] = CFR(node.children[a], player, pi)        
+        v_alt[a] = recursiveCFR(node.children[a], player, pi, discounter = discounter, weight = weight)
         pi[iset.player] = old_pi
             
         v += v_alt[a] * iset.current_strategy[a]
@@ -37,49 +58,605 @@ def CFR(node, player, pi, use_cfr_plus = False):
             if(i != player):
                 pi_other *= pi[i]
 
+        if(discounter != None):
+            discounter.addRegrets(iset, weight * pi_other, v_alt, v)
+            discounter.addStrategy(iset, weight * pi[player])
+            return v
+
         for a in range(len(node.children)):
+            #iset.cumulative_regret[a] += pi[player] * (v_alt[a] - v)
+            iset.cumulative_regret[a] += weight * pi_other * (v_alt[a] - v)
             if use_cfr_plus:
-                #iset.cumulative_regret[a] += pi[player] * max(0, (v_alt[a] - v)) # CFR+
-                iset.cumulative_regret[a] = max(iset.cumulative_regret[a] + pi_other * (v_alt[a] - v), 0)
-            else:
-                #iset.cumulative_regret[a] += pi[player] * (v_alt[a] - v)
-                iset.cumulative_regret[a] += pi_other * (v_alt[a] - v)
-            iset.cumulative_strategy[a] += pi[player] * iset.current_strategy[a]
+                iset.cumulative_regret[a] = max(iset.cumulative_regret[a], 0)
+            iset.cumulative_strategy[a] += weight * pi[player] * iset.current_strategy[a]
     
     return v
 
-def SolveWithCFR(cfr_tree, iterations, perc = 10, show_perc = False, checkEveryIteration = -1, 
-                 check_callback = None, use_cfr_plus = False):
-    # Graph data
-    graph_data = []
+def MultiPlayerCFR(node, pi, use_cfr_plus = False):
+    """
+    Vanilla CFR algorithm, updating the regrets of all the players in a single traversal (simultaneous updates).
+    If use_cfr_plus is True, regrets are clipped as in CFR(), so the updates are the same as running CFR() once per
+    player.
+    Returns the vector of values of the node, one per player.
+    """
+
+    if useIterativeTraversals():
+        return iterativeMultiPlayerCFR(node, pi, use_cfr_plus)
+    return recursiveMultiPlayerCFR(node, pi, use_cfr_plus)
+
+def recursiveMultiPlayerCFR(node, pi, use_cfr_plus = False):
+    """
+    Recursive implementation of MultiPlayerCFR(), used when recursive traversals are selected.
+    """
+
+    n_players = len(pi)
+    node.visits += reduce(lambda x, y: x * y, pi, 1)
+
+    if node.isChance():
+        res = [0] * n_players
+        for (p, child) in zip (node.distribution, node.children):
+            child_v = recursiveMultiPlayerCFR(child, pi, use_cfr_plus)
+            for i in range(n_players):
+                res[i] += child_v[i] * p
+        return res
+
+    if(node.isLeaf()):
+        return node.utility
+
+    iset = node.information_set
+    player = iset.player
+    v = [0] * n_players
+    v_alt = [None for a in node.children]
+
+    for a in range(len(node.children)):
+
+        old_pi = pi[player]
+        pi[player] *= iset.current_strategy[a]
+        v_alt[a] = recursiveMultiPlayerCFR(node.children[a], pi)
+        pi[player] = old_pi
+
+        for i in range(n_players):
+            v[i] += v_alt[a][i] * iset.current_strategy[a]
+
+    pi_other = 1
+    for i in range(n_players):
+        if(i != player):
+            pi_other *= pi[i]
+
+    for a in range(len(node.children)):
+        iset.cumulative_regret[a] += pi_other * (v_alt[a][player] - v[player])
+        if use_cfr_plus:
+            iset.cumulative_regret[a] = max(iset.cumulative_regret[a], 0)
+        iset.cumulative_strategy[a] += pi[player] * iset.current_strategy[a]
+
+    return v
+
+def iterativeCFR(root, player, pi, use_cfr_plus = False, discounter = None, weight = 1):
+    """
+    Explicit-stack version of CFR(), visiting the nodes and updating the regrets in the same order.
+    As in CFR(), pi is updated in place while going down the tree and restored while going up.
+    """
+
+    # Parallel stacks (so that no frame is allocated per node) with the internal nodes being visited, the values of
+    # the children visited so far, the reach probability of the player playing in each node and whether its regrets
+    # are clipped (see CFR())
+    nodes = []
+    children_values = []
+    reaches = []
+    clipped = []
+    node = root
+
+    while True:
+        node.visits += math.prod(pi)
 
-    start_time = time.time()
-    last_checkpoint_time = start_time
+        if not node.is_leaf:
+            nodes.append(node)
+            children_values.append([])
+            reaches.append(pi[node.information_set.player] if not node.isChance() else None)
+            clipped.append(use_cfr_plus)
+        else:
+            value = node.utility[player]
 
-    player_count = cfr_tree.numOfPlayers
+            # Go up, evaluating the nodes whose children have all been visited
+            while len(nodes) > 0:
+                node = nodes[-1]
+                values = children_values[-1]
+                values.append(value)
+                if len(values) < len(node.children):
+                    break
+                nodes.pop()
+                children_values.pop()
+                reach = reaches.pop()
+                use_cfr_plus = clipped.pop()
 
-    for i in range(1, iterations + 1):
-        if(show_perc and i % (iterations / 100 * perc) == 0):
-            print(str(i / (iterations / 100 * perc) * perc) + "%")
+                if node.isChance():
+                    value = 0
+                    for (p, v_child) in zip(node.distribution, values):
+                        value += v_child * p
+                    continue
 
-        # Run CFR for each player
+                iset = node.information_set
+                pi[iset.player] = reach
+                value = 0
+                for a in range(len(node.children)):
+                    value += values[a] * iset.current_strategy[a]
+
+                if(iset.player == player):
+                    pi_other = 1
+                    for i in range(len(pi)):
+                        if(i != player):
+                            pi_other *= pi[i]
+
+                    if(discounter != None):
+                        discounter.addRegrets(iset, weight * pi_other, values, value)
+                        discounter.addStrategy(iset, weight * pi[player])
+                        continue
+
+                    for a in range(len(node.children)):
+                        iset.cumulative_regret[a] += weight * pi_other * (values[a] - value)
+                        if use_cfr_plus:
+                            iset.cumulative_regret[a] = max(iset.cumulative_regret[a], 0)
+                        iset.cumulative_strategy[a] += weight * pi[player] * iset.current_strategy[a]
+            else:
+                return value
+
+        # Go down into the next child of the node on top of the stack
+        node = nodes[-1]
+        a = len(children_values[-1])
+        if node.isChance():
+            use_cfr_plus = clipped[-1]
+        else:
+            use_cfr_plus = False
+            iset = node.information_set
+            pi[iset.player] = reaches[-1] * iset.current_strategy[a]
+        node = node.children[a]
+
+def iterativeMultiPlayerCFR(root, pi, use_cfr_plus = False):
+    """
+    Explicit-stack version of MultiPlayerCFR(), visiting the nodes and updating the regrets in the same order.
+    As in MultiPlayerCFR(), pi is updated in place while going down the tree and restored while going up.
+    """
+
+    n_players = len(pi)
+
+    # Parallel stacks (so that no frame is allocated per node) with the internal nodes being visited, the values of
+    # the children visited so far, the reach probability of the player playing in each node and whether its regrets
+    # are clipped (see CFR())
+    nodes = []
+    children_values = []
+    reaches = []
+    clipped = []
+    node = root
+
+    while True:
+        node.visits += math.prod(pi)
+
+        if not node.is_leaf:
+            nodes.append(node)
+            children_values.append([])
+            reaches.append(pi[node.information_set.player] if not node.isChance() else None)
+            clipped.append(use_cfr_plus)
+        else:
+            value = node.utility
+
+            # Go up, evaluating the nodes whose children have all been visited
+            while len(nodes) > 0:
+                node = nodes[-1]
+                values = children_values[-1]
+                values.append(value)
+                if len(values) < len(node.children):
+                    break
+                nodes.pop()
+                children_values.pop()
+                reach = reaches.pop()
+                use_cfr_plus = clipped.pop()
+
+                value = [0] * n_players
+
+                if node.isChance():
+                    for (p, v_child) in zip(node.distribution, values):
+                        for i in range(n_players):
+                            value[i] += v_child[i] * p
+                    continue
+
+                iset = node.information_set
+                player = iset.player
+                pi[player] = reach
+                for a in range(len(node.children)):
+                    for i in range(n_players):
+                        value[i] += values[a][i] * iset.current_strategy[a]
+
+                pi_other = 1
+                for i in range(n_players):
+                    if(i != player):
+                        pi_other *= pi[i]
+
+                for a in range(len(node.children)):
+                    iset.cumulative_regret[a] += pi_other * (values[a][player] - value[player])
+                    if use_cfr_plus:
+                        iset.cumulative_regret[a] = max(iset.cumulative_regret[a], 0)
+                    iset.cumulative_strategy[a] += pi[player] * iset.current_strategy[a]
+            else:
+                return value
+
+        # Go down into the next child of the node on top of the stack
+        node = nodes[-1]
+        a = len(children_values[-1])
+        if node.isChance():
+            use_cfr_plus = clipped[-1]
+        else:
+            use_cfr_plus = False
+            iset = node.information_set
+            pi[iset.player] = reaches[-1] * iset.current_strategy[a]
+        node = node.children[a]
+
+def ChanceSampledCFR(root, player_count, batch_size, use_cfr_plus = False):
+    """
+    Chance-sampling CFR iteration: instead of traversing all the children of the root chance node, batch_size of
+    them are sampled (with replacement, from the chance distribution) and CFR() is run on them for each player
+    (with its CFR+ update if use_cfr_plus is True).
+    The updates in the subtree of a child c sampled k times are weighted by k / (batch_size * p(c)), so that the
+    regrets and strategies accumulated are unbiased estimates of those of a full CFR() iteration.
+    If the root is not a chance node, a full CFR() iteration is run.
+    Returns the fraction of the children of the root that have been traversed (i.e. how much of a full iteration
+    has been done).
+    """
+
+    if not root.isChance():
         for p in range(player_count):
-            CFR(cfr_tree.root, p, [1] * player_count, use_cfr_plus)
-            
-        # Update the current strategy for each information set
-        for infoset in cfr_tree.information_sets.values():
-            infoset.updateCurrentStrategy()
-
-        if(checkEveryIteration > 0 and i % checkEveryIteration == 0):
-            data = {'epsilon': cfr_tree.checkMarginalsEpsilon(),
-                    'iteration_number': i,
-                    'duration': time.time() - last_checkpoint_time,
-                    'utility': cfr_tree.root.getExpectedUtility()}
-            graph_data.append(data)
-
-            if(check_callback != None):
-                check_callback(data)
-                
-            last_checkpoint_time = time.time()
+            CFR(root, p, [1] * player_count, use_cfr_plus)
+        return 1
+
+    samples = {}
+    for b in range(batch_size):
+        c = root.sampleAction()
+        samples[c] = samples.get(c, 0) + 1
+
+    for p in range(player_count):
+        for (c, count) in samples.items():
+            CFR(root.children[c], p, [1] * player_count, use_cfr_plus,
+                weight = count / (batch_size * root.distribution[c]))
+
+    return len(samples) / len(root.children)
+
+def childWithReach(node, pi, a):
+    """
+    Returns the a-th child of node, together with the reach probabilities of the players in that child.
+    """
+
+    if node.isChance():
+        return (node.children[a], pi)
+
+    iset = node.information_set
+    child_pi = pi.copy()
+    child_pi[iset.player] *= iset.current_strategy[a]
+    return (node.children[a], child_pi)
+
+def PrunedCFR(root, player, pi, iteration, discounter = None):
+    """
+    CFR with regret-based pruning, for the given player, at the given iteration (it needs startRegretPruning to be
+    called on the tree first, and iterations to be numbered consecutively).
+    Subtrees reached with probability zero by the other players are skipped, as they give no regret to the player
+    (their value is only ever multiplied by zero).
+    An action of the player with zero probability in the current strategy and a negative regret R is skipped as well,
+    for the next ceil(-R / U) iterations, where U is the most its regret can grow in an iteration (the sum, over the
+    nodes of its information set, of the maximum utility reachable through the action minus the minimum utility of
+    the node, as the other players reach a node with probability at most 1). Its regret then stays negative, so its
+    probability stays zero, and at each skipped node it is increased by the upper bound
+    pi_other * (max utility through the action - value of the node) instead of its actual value. This keeps the
+    regrets an upper bound of the actual ones, which preserves the regret matching (and so the convergence)
+    guarantees. Once those iterations are over, the action is visited again at all the nodes of its information set
+    (in the first iteration it is reached) before it can be skipped again; it is also visited whenever its
+    probability is not zero (e.g. because of discounting).
+    Cumulative strategies are not updated (see accumulateAverageStrategy), as they would be the only updates
+    needed in the pruned subtrees. If a discounter is given, regrets are updated through it (see CFR()).
+    Returns the value of the root for the player and the number of nodes visited.
+    """
+
+    visited_nodes = 0
+
+    # Each frame holds an internal node, its reach probabilities (also of the other players only), the values of
+    # the children visited so far (None for the pruned ones) and which actions are pruned
+    stack = []
+    node = root
+
+    while True:
+        visited_nodes += 1
+        node.visits += reduce(lambda x, y: x * y, pi, 1)
+
+        pi_other = 1
+        for i in range(len(pi)):
+            if(i != player):
+                pi_other *= pi[i]
+
+        has_value = True
+        if node.isLeaf():
+            value = node.utility[player]
+        elif pi_other == 0:
+            value = 0
+        else:
+            pruned = None
+            if not node.isChance() and node.player == player:
+                iset = node.information_set
+                if(discounter != None):
+                    discounter.catchUp(iset)
+                pruned = [isPruned(iset, a, iteration) for a in range(len(node.children))]
+            stack.append((node, pi, pi_other, [], pruned))
+            has_value = False
+
+        # Go up, evaluating the nodes whose children have all been visited (or pruned)
+        while True:
+            if len(stack) == 0:
+                return (value, visited_nodes)
+
+            (node, pi, pi_other, values, pruned) = stack[-1]
+            if has_value:
+                values.append(value)
+
+            while pruned != None and len(values) < len(node.children) and pruned[len(values)]:
+                values.append(None)
+
+            if len(values) < len(node.children):
+                break
+
+            stack.pop()
+            has_value = True
+
+            if node.isChance():
+                value = 0
+                for (p, v_child) in zip(node.distribution, values):
+                    value += v_child * p
+                continue
+
+            iset = node.information_set
+            value = 0
+            for a in range(len(node.children)):
+                if values[a] != None:
+                    value += values[a] * iset.current_strategy[a]
+
+            if(iset.player == player):
+                v_alt = [values[a] if values[a] != None else node.children[a].max_utility[player]
+                         for a in range(len(node.children))]
+                if(discounter != None):
+                    discounter.addRegrets(iset, pi_other, v_alt, value)
+                    continue
+                for a in range(len(node.children)):
+                    iset.cumulative_regret[a] += pi_other * (v_alt[a] - value)
+
+        # Go down into the next child of the node on top of the stack
+        (node, pi) = childWithReach(node, pi, len(values))
+
+def startRegretPruning(cfr_tree):
+    """
+    Prepare a tree for PrunedCFR: compute the utility bounds of its subtrees (see
+    CFRTree.computeSubtreeUtilityBounds) and mark all the actions as not pruned.
+    """
+
+    cfr_tree.computeSubtreeUtilityBounds()
+
+    for iset in cfr_tree.information_sets.values():
+        # For each action, the first iteration in which it is no longer skipped (0 if it is not pruned), and the
+        # last iteration in which it had to be visited at all the nodes because its pruning was over
+        iset.pruned_until = [0] * iset.action_count
+        iset.pruning_recheck_iteration = [0] * iset.action_count
+
+        # For each action, the most its regret can grow in an iteration (see PrunedCFR)
+        iset.max_regret_growth = [0] * iset.action_count
+        for node in iset.nodes:
+            for a in range(iset.action_count):
+                iset.max_regret_growth[a] += node.children[a].max_utility[iset.player] - node.min_utility[iset.player]
+
+def isPruned(iset, a, iteration):
+    """
+    Returns whether action a of the information set is skipped by PrunedCFR at the given iteration, starting to prune
+    it (see PrunedCFR) if it is not pruned yet and it can be.
+    """
+
+    if iset.current_strategy[a] != 0:
+        return False
+
+    if iteration < iset.pruned_until[a]:
+        return True
+
+    if iset.pruned_until[a] != 0:
+        # The iterations it was pruned for are over: it is visited at all the nodes of the information set in this
+        # iteration before it can be pruned again
+        iset.pruned_until[a] = 0
+        iset.pruning_recheck_iteration[a] = iteration
+        return False
+
+    if iteration == iset.pruning_recheck_iteration[a]:
+        return False
+
+    max_growth = iset.max_regret_growth[a]
+    regret = iset.cumulative_regret[a]
+    if regret + max_growth >= 0:
+        return False
+
+    if max_growth <= 0:
+        # The regret can never grow, so the action can be skipped for good
+        iset.pruned_until[a] = math.inf
+    else:
+        iset.pruned_until[a] = iteration + math.ceil(-regret / max_growth)
+
+    return True
+
+def infosetsInSequenceOrder(cfr_tree, player):
+    """
+    Returns the information sets of a player, each one together with the information set and action that precede it
+    in its sequence (or None for the first ones), so that every information set comes after the one preceding it.
+    """
+
+    res = []
+
+    for iset in sorted(cfr_tree.infosets_by_player[player], key = lambda i: len(i.sequence)):
+        if len(iset.sequence) == 0:
+            res.append((iset, None, None))
+        else:
+            (parent_id, action) = list(iset.sequence.items())[-1]
+            res.append((iset, cfr_tree.information_sets[parent_id], action))
+
+    return res
+
+def accumulateAverageStrategy(ordered_infosets, weight = 1):
+    """
+    Do the cumulative strategy update of CFR for the information sets of a player (given by infosetsInSequenceOrder),
+    without traversing the tree. Every node of an information set is reached by the player with the same
+    probability, so each node contributes the same update. The update is multiplied by the given weight.
+    """
+
+    reach = {}
+
+    for (iset, parent, action) in ordered_infosets:
+        pi = 1 if parent == None else reach[parent] * parent.current_strategy[action]
+        reach[iset] = pi
+
+        for a in range(iset.action_count):
+            iset.cumulative_strategy[a] += weight * len(iset.nodes) * pi * iset.current_strategy[a]
+
+def SolveWithCFR(cfr_tree, iterations, perc = 10, show_perc = False, checkEveryIteration = -1, 
+                 check_callback = None, use_cfr_plus = False, engine = CFREngine.Recursive,
+                 single_pass_traversal = False, regret_pruning = False, processes = 1, chance_sampling_batch = 0,
+                 async_checks = False):
+    """
+    Find a Nash equilibrium (in the two-player zero-sum case) with CFR or CFR+, run for a given amount of iterations.
+    engine selects how the tree is traversed: CFREngine.Recursive runs CFR() once per player, while
+    CFREngine.Vectorized processes the whole tree one depth level at a time on its compiled (array-based) form.
+    If single_pass_traversal is True, the recursive engine updates all the players with a single traversal per
+    iteration (the vectorized engine always does).
+    If regret_pruning is True, the recursive engine runs PrunedCFR once per player (single_pass_traversal is
+    ignored), and the fraction of nodes it skipped is returned as skipped_nodes_fraction (the vectorized engine
+    does not prune).
+    If processes is greater than 1, the traversals of the recursive engine are split among that many worker processes
+    (see cfr_code.parallel_cfr.ParallelCFR); regret pruning is not supported in this case.
+    If chance_sampling_batch is greater than 0, the recursive engine runs ChanceSampledCFR with that batch size
+    (single_pass_traversal, regret_pruning and processes are ignored), and the effective iterations per second
+    (i.e. full iterations worth of traversed subtrees of the root) are returned as effective_iterations_per_second.
+    Chance sampling is not supported by the vectorized engine (a ValueError is raised).
+    If async_checks is True, the epsilon and the utility of each checkpoint are computed by a background process (see
+    cfr_code.async_checks.AsyncChecker), so the datapoints may reach check_callback some iterations later.
+    With use_cfr_plus, the default, single pass, parallel and chance sampled traversals apply the CFR+ update of CFR(),
+    while regret pruning applies regret matching+ to the whole information sets when their current strategies are
+    updated. The vectorized engine can only apply the latter, which is a different algorithm, so use_cfr_plus is not
+    supported with it (a ValueError is raised).
+    """
+
+    if engine == CFREngine.Vectorized and use_cfr_plus:
+        raise ValueError("CFR+ is not supported by the vectorized engine: it cannot apply the per node clipping of CFR()")
+    if engine == CFREngine.Vectorized and chance_sampling_batch > 0:
+        raise ValueError("Chance sampling is not supported by the vectorized engine")
+
+    chance_sampling = chance_sampling_batch > 0
+    parallel = processes > 1 and engine == CFREngine.Recursive and not chance_sampling
+    regret_pruning = regret_pruning and engine == CFREngine.Recursive and not parallel and not chance_sampling
+    regret_matching_plus = use_cfr_plus and regret_pruning
+
+    parallel_cfr = None
+    checker = None
+
+    try:
+        if parallel:
+            from cfr_code.parallel_cfr import ParallelCFR
+            parallel_cfr = ParallelCFR(cfr_tree, processes, use_cfr_plus)
+
+        if engine == CFREngine.Vectorized:
+            from cfr_code.vectorized_cfr import VectorizedCFR
+            vectorized_engine = VectorizedCFR(cfr_tree)
+
+        # Graph data
+        graph_data = []
+
+        if async_checks:
+            from cfr_code.async_checks import AsyncChecker
+            checker = AsyncChecker(cfr_tree, graph_data, check_callback)
+
+        start_time = time.time()
+        last_checkpoint_time = start_time
+
+        player_count = cfr_tree.numOfPlayers
+
+        if regret_pruning:
+            startRegretPruning(cfr_tree)
+            ordered_infosets = [infosetsInSequenceOrder(cfr_tree, p) for p in range(player_count)]
+            nodes_per_traversal = len(cfr_tree.root.iterativeSubtree())
+            visited_nodes = 0
+
+        effective_iterations = 0
+        checkpoint_effective_iterations = 0
+
+        for i in range(1, iterations + 1):
+            if(show_perc and i % (iterations / 100 * perc) == 0):
+                print(str(i / (iterations / 100 * perc) * perc) + "%")
+
+            if engine == CFREngine.Vectorized:
+                vectorized_engine.iteration()
+            else:
+                if chance_sampling:
+                    effective_iterations += ChanceSampledCFR(cfr_tree.root, player_count, chance_sampling_batch, use_cfr_plus)
+                elif parallel:
+                    parallel_cfr.iteration(single_pass_traversal)
+                elif regret_pruning:
+                    for p in range(player_count):
+                        (_, visited) = PrunedCFR(cfr_tree.root, p, [1] * player_count, i)
+                        visited_nodes += visited
+                        accumulateAverageStrategy(ordered_infosets[p])
+                elif single_pass_traversal:
+                    MultiPlayerCFR(cfr_tree.root, [1] * player_count, use_cfr_plus)
+                else:
+                    # Run CFR for each player
+                    for p in range(player_count):
+                        CFR(cfr_tree.root, p, [1] * player_count, use_cfr_plus)
+
+                # Update the current strategy for each information set
+                for infoset in cfr_tree.information_sets.values():
+                    infoset.updateCurrentStrategy(regret_matching_plus)
+
+            if(checkEveryIteration > 0 and i % checkEveryIteration == 0):
+                if engine == CFREngine.Vectorized:
+                    vectorized_engine.writeBack()
+
+                data = {'iteration_number': i,
+                        'duration': time.time() - last_checkpoint_time}
+                if regret_pruning:
+                    data['skipped_nodes_fraction'] = 1 - visited_nodes / (nodes_per_traversal * player_count * i)
+                if chance_sampling:
+                    data['effective_iterations_per_second'] = (effective_iterations - checkpoint_effective_iterations) / data['duration']
+                    checkpoint_effective_iterations = effective_iterations
+
+                if async_checks:
+                    checker.submit(data)
+                    checker.collect()
+                else:
+                    data['epsilon'] = cfr_tree.checkMarginalsEpsilon()
+                    data['utility'] = cfr_tree.root.getExpectedUtility()
+                    graph_data.append(data)
+
+                    if(check_callback != None):
+                        check_callback(data)
+
+                last_checkpoint_time = time.time()
+
+        if engine == CFREngine.Vectorized:
+            vectorized_engine.writeBack()
+
+        if parallel:
+            parallel_cfr.close()
+
+        if async_checks:
+            checker.close()
+    finally:
+        # Release the worker processes and the shared memory also if the loop was interrupted (e.g. by Ctrl-C)
+        if parallel_cfr != None:
+            parallel_cfr.terminate()
+        if checker != None:
+            checker.terminate()
         
-    return {'utility': cfr_tree.root.getExpectedUtility(), 'graph_data': graph_data, 'tot_time': time.time() - start_time}
\ No newline at end of file
+    res = {'utility': cfr_tree.root.getExpectedUtility(), 'graph_data': graph_data, 'tot_time': time.time() - start_time}
+
+    if regret_pruning:
+        res['skipped_nodes_fraction'] = 1 - visited_nodes / (nodes_per_traversal * player_count * iterations)
+
+    if chance_sampling:
+        res['effective_iterations_per_second'] = effective_iterations / res['tot_time']
+
+    return res
\ No newline at end of file
@@ -0,0 +1,177 @@
+from cfr_code.cfr import CFR, PrunedCFR, startRegretPruning, infosetsInSequenceOrder, accumulateAverageStrategy
+import math
+import time
+
+class LazyDiscounter:
+    """
+    Discounts of Discounted CFR (DCFR), applied lazily.
+    At the end of each iteration t, DCFR multiplies the positive cumulative regrets by t^alpha / (t^alpha + 1), the
+    negative ones by t^beta / (t^beta + 1) and the cumulative strategies by (t / (t + 1))^gamma.
+    The strategy discount is the same for all the information sets, so it is kept as a global scale: the contribution
+    of iteration t is weighted by t^gamma instead (average strategies are normalized, so they are the same).
+    The regret discount depends on the sign, but a regret cannot change sign while its information set is not
+    updated, so each information set keeps the first iteration whose discount it has not received yet and gets all
+    the pending discounts at once (from prefix sums of their logarithms) right before its regrets change.
+    Regret matching is not affected by the pending discounts, as all the positive regrets of an information set
+    are missing the same factor.
+    """
+
+    def __init__(self, alpha, beta, gamma):
+        self.alpha = alpha
+        self.beta = beta
+        self.gamma = gamma
+
+        self.iteration = 1
+        self.strategy_weight = 1
+
+        # Sums of the logarithms of the discounts of iterations 1..t (at index t)
+        self.log_positive_discounts = [0]
+        self.log_negative_discounts = [0]
+
+    @staticmethod
+    def logDiscount(t, exponent):
+        # log(t^exponent / (t^exponent + 1))
+        return -math.log1p(t ** -exponent)
+
+    def startTracking(self, infosets):
+        """
+        Start tracking the given information sets (their regrets are assumed to be up to date).
+        """
+
+        for iset in infosets:
+            iset.discount_timestamp = self.iteration
+
+    def nextIteration(self):
+        """
+        End the current iteration: its discounts become pending for all the information sets.
+        """
+
+        t = self.iteration
+        self.log_positive_discounts.append(self.log_positive_discounts[-1] + LazyDiscounter.logDiscount(t, self.alpha))
+        self.log_negative_discounts.append(self.log_negative_discounts[-1] + LazyDiscounter.logDiscount(t, self.beta))
+
+        self.iteration += 1
+        self.strategy_weight = self.iteration ** self.gamma
+
+    def catchUp(self, iset):
+        """
+        Apply to the regrets of an information set all of its pending discounts.
+        """
+
+        since = iset.discount_timestamp
+        if since == self.iteration:
+            return
+
+        positive_discount = math.exp(self.log_positive_discounts[self.iteration - 1] - self.log_positive_discounts[since - 1])
+        negative_discount = math.exp(self.log_negative_discounts[self.iteration - 1] - self.log_negative_discounts[since - 1])
+
+        for a in range(iset.action_count):
+            r = iset.cumulative_regret[a]
+            iset.cumulative_regret[a] = r * (positive_discount if r > 0 else negative_discount)
+
+        iset.discount_timestamp = self.iteration
+
+    def addRegrets(self, iset, pi_other, v_alt, v):
+        """
+        Add the instantaneous regrets of a node of the information set (reached by the other players with probability
+        pi_other, with value v and values v_alt for its actions).
+        """
+
+        if pi_other == 0:
+            # Nothing changes, so the information set can keep its pending discounts
+            return
+
+        self.catchUp(iset)
+
+        for a in range(iset.action_count):
+            iset.cumulative_regret[a] += pi_other * (v_alt[a] - v)
+
+    def addStrategy(self, iset, pi_player):
+        """
+        Add the current strategy of the information set to its cumulative strategy, for a node reached by its player
+        with probability pi_player.
+        """
+
+        for a in range(iset.action_count):
+            iset.cumulative_strategy[a] += self.strategy_weight * pi_player * iset.current_strategy[a]
+
+def SolveWithDiscountedCFR(cfr_tree, iterations, alpha = 1.5, beta = 0, gamma = 2, perc = 10, show_perc = False,
+                           checkEveryIteration = -1, check_callback = None, regret_pruning = False):
+    """
+    Find a Nash equilibrium (in the two-player zero-sum case) with Discounted CFR, DCFR(alpha, beta, gamma), run
+    for a given amount of iterations. Linear CFR is DCFR(1, 1, 1) (see SolveWithLinearCFR).
+    Discounts are applied lazily (see LazyDiscounter), so each iteration costs as much as a plain CFR iteration.
+    If regret_pruning is True, the tree is traversed with PrunedCFR (see SolveWithCFR) and the fraction of nodes it
+    skipped is returned as skipped_nodes_fraction.
+    """
+
+    discounter = LazyDiscounter(alpha, beta, gamma)
+    discounter.startTracking(cfr_tree.information_sets.values())
+
+    # Graph data
+    graph_data = []
+
+    start_time = time.time()
+    last_checkpoint_time = start_time
+
+    player_count = cfr_tree.numOfPlayers
+
+    if regret_pruning:
+        startRegretPruning(cfr_tree)
+        ordered_infosets = [infosetsInSequenceOrder(cfr_tree, p) for p in range(player_count)]
+        nodes_per_traversal = len(cfr_tree.root.iterativeSubtree())
+        visited_nodes = 0
+
+    for i in range(1, iterations + 1):
+        if(show_perc and i % (iterations / 100 * perc) == 0):
+            print(str(i / (iterations / 100 * perc) * perc) + "%")
+
+        for p in range(player_count):
+            if regret_pruning:
+                (_, visited) = PrunedCFR(cfr_tree.root, p, [1] * player_count, i, discounter = discounter)
+                visited_nodes += visited
+                accumulateAverageStrategy(ordered_infosets[p], discounter.strategy_weight)
+            else:
+                CFR(cfr_tree.root, p, [1] * player_count, discounter = discounter)
+
+        # Update the current strategy for each information set
+        for infoset in cfr_tree.information_sets.values():
+            infoset.updateCurrentStrategy()
+
+        discounter.nextIteration()
+
+        if(checkEveryIteration > 0 and i % checkEveryIteration == 0):
+            data = {'epsilon': cfr_tree.checkMarginalsEpsilon(),
+                    'iteration_number': i,
+                    'duration': time.time() - last_checkpoint_time,
+                    'utility': cfr_tree.root.getExpectedUtility()}
+            if regret_pruning:
+                data['skipped_nodes_fraction'] = 1 - visited_nodes / (nodes_per_traversal * player_count * i)
+            graph_data.append(data)
+
+            if(check_callback != None):
+                check_callback(data)
+
+            last_checkpoint_time = time.time()
+
+    # Leave the actual (discounted) regrets in the information sets
+    for infoset in cfr_tree.information_sets.values():
+        discounter.catchUp(infoset)
+
+    res = {'utility': cfr_tree.root.getExpectedUtility(), 'graph_data': graph_data, 'tot_time': time.time() - start_time}
+
+    if regret_pruning:
+        res['skipped_nodes_fraction'] = 1 - visited_nodes / (nodes_per_traversal * player_count * iterations)
+
+    return res
+
+def SolveWithLinearCFR(cfr_tree, iterations, perc = 10, show_perc = False, checkEveryIteration = -1,
+                       check_callback = None, regret_pruning = False):
+    """
+    Find a Nash equilibrium (in the two-player zero-sum case) with Linear CFR, where iteration t is weighted by t
+    both in the regrets and in the average strategy.
+    """
+
+    return SolveWithDiscountedCFR(cfr_tree, iterations, 1, 1, 1, perc = perc, show_perc = show_perc,
+                                  checkEveryIteration = checkEveryIteration, check_callback = check_callback,
+                                  regret_pruning = regret_pruning)
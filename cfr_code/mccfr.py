@@ -0,0 +1,243 @@
+from data_structures.trees import useIterativeTraversals
+import random
+import time
+
+def externalSamplingCFR(node, player):
+    """
+    External sampling MCCFR traversal.
+    Chance outcomes and the actions of the other players are sampled (from the chance distributions and the
+    current strategies), while all the actions of the player are explored.
+    The regrets of the player are updated with the sampled counterfactual values (the sampling probabilities cancel
+    out the reach probabilities of chance and of the other players), and the current strategy of an information set
+    is recomputed as soon as its regrets change. The cumulative strategies of the other players are updated at the
+    sampled nodes (simple averaging).
+    node = the current node the algorithm is in.
+    player = the player for which the algorithm is being run.
+    """
+
+    if useIterativeTraversals():
+        return iterativeExternalSamplingCFR(node, player)
+    return recursiveExternalSamplingCFR(node, player)
+
+def recursiveExternalSamplingCFR(node, player):
+    """
+    Recursive implementation of externalSamplingCFR(), used when recursive traversals are selected.
+    """
+
+    if(node.isChance()):
+        return recursiveExternalSamplingCFR(node.children[node.sampleAction()], player)
+
+    if(node.isLeaf()):
+        return node.utility[player]
+
+    iset = node.information_set
+
+    if(iset.player != player):
+        for a in range(len(node.children)):
+            iset.cumulative_strategy[a] += iset.current_strategy[a]
+        return recursiveExternalSamplingCFR(node.children[iset.sampleAction()], player)
+
+    v_alt = [recursiveExternalSamplingCFR(child, player) for child in node.children]
+
+    v = 0
+    for a in range(len(node.children)):
+        v += v_alt[a] * iset.current_strategy[a]
+
+    for a in range(len(node.children)):
+        iset.cumulative_regret[a] += v_alt[a] - v
+    iset.updateCurrentStrategy()
+
+    return v
+
+def iterativeExternalSamplingCFR(root, player):
+    """
+    Explicit-stack version of externalSamplingCFR(), visiting the nodes (and sampling) in the same order.
+    """
+
+    # Parallel stacks (so that no frame is allocated per node) with the nodes of the player being visited and the
+    # values of the children visited so far.
+    # Chance nodes and nodes of the other players only follow one child, so they are not stacked.
+    nodes = []
+    children_values = []
+    node = root
+
+    while True:
+        if(node.isChance()):
+            node = node.children[node.sampleAction()]
+            continue
+
+        if(not node.isLeaf()):
+            iset = node.information_set
+            if(iset.player != player):
+                for a in range(len(node.children)):
+                    iset.cumulative_strategy[a] += iset.current_strategy[a]
+                node = node.children[iset.sampleAction()]
+                continue
+            nodes.append(node)
+            children_values.append([])
+        else:
+            value = node.utility[player]
+
+            # Go up, evaluating the nodes whose children have all been visited
+            while len(nodes) > 0:
+                node = nodes[-1]
+                values = children_values[-1]
+                values.append(value)
+                if len(values) < len(node.children):
+                    break
+                nodes.pop()
+                children_values.pop()
+
+                iset = node.information_set
+                value = 0
+                for a in range(len(node.children)):
+                    value += values[a] * iset.current_strategy[a]
+
+                for a in range(len(node.children)):
+                    iset.cumulative_regret[a] += values[a] - value
+                iset.updateCurrentStrategy()
+            else:
+                return value
+
+        # Go down into the next child of the node on top of the stack
+        node = nodes[-1].children[len(children_values[-1])]
+
+def outcomeSamplingCFR(root, player, exploration = 0.6):
+    """
+    Outcome sampling MCCFR traversal: a single terminal history is sampled, following the chance distributions,
+    the current strategies of the other players and, for the player, its current strategy mixed with the uniform one
+    (with weight exploration).
+    Along the sampled history the regrets of the player are updated with importance-weighted counterfactual values,
+    and its cumulative strategies with the reach probability of the player divided by the sampling probability
+    (stochastically-weighted averaging). The current strategy of an information set is recomputed as soon as its
+    regrets change.
+    As a single history is followed, this is never recursive.
+    root = the node the sampled history starts from.
+    player = the player for which the algorithm is being run.
+    Returns the sampled utility of the player, divided by the probability of sampling it.
+    """
+
+    # Sampled decision nodes, with the sampled action, the strategy used and the reach of the other players
+    path = []
+    pi_player = 1
+    pi_other = 1
+    sample_probability = 1
+    node = root
+
+    while not node.isLeaf():
+        if(node.isChance()):
+            node = node.children[node.sampleAction()]
+            continue
+
+        iset = node.information_set
+        strategy = list(iset.current_strategy)
+
+        if(iset.player == player):
+            for a in range(len(node.children)):
+                iset.cumulative_strategy[a] += pi_player * strategy[a] / sample_probability
+
+            uniform = 1 / len(node.children)
+            sampling_strategy = [exploration * uniform + (1 - exploration) * strategy[a] for a in range(len(node.children))]
+            a = sampleFromDistribution(sampling_strategy)
+            path.append((iset, a, strategy, pi_other))
+            pi_player *= strategy[a]
+            sample_probability *= sampling_strategy[a]
+        else:
+            a = sampleFromDistribution(strategy)
+            path.append((iset, a, strategy, pi_other))
+            pi_other *= strategy[a]
+            sample_probability *= strategy[a]
+
+        node = node.children[a]
+
+    value = node.utility[player] / sample_probability
+
+    # Probability (under the current strategies, without chance) to go from the child of the current node to the leaf
+    tail = 1
+
+    for (iset, a, strategy, pi_other) in reversed(path):
+        if(iset.player == player):
+            w = value * pi_other * tail
+            for b in range(iset.action_count):
+                if(b == a):
+                    iset.cumulative_regret[b] += w * (1 - strategy[a])
+                else:
+                    iset.cumulative_regret[b] -= w * strategy[a]
+            iset.updateCurrentStrategy()
+
+        tail *= strategy[a]
+
+    return value
+
+def sampleFromDistribution(distribution):
+    """
+    Sample an index from a given probability distribution.
+    """
+
+    r = random.random()
+    count = 0
+
+    for i in range(len(distribution)):
+        count += distribution[i]
+        if(r < count):
+            return i
+
+    # Rounding errors might leave r above the total probability
+    return max(i for i in range(len(distribution)) if distribution[i] > 0)
+
+def SolveWithExternalSamplingMCCFR(cfr_tree, iterations, perc = 10, show_perc = False, checkEveryIteration = -1,
+                                   check_callback = None):
+    """
+    Find a Nash equilibrium (in the two-player zero-sum case) with external sampling Monte Carlo CFR, run for a given
+    amount of iterations (each one made of a sampled traversal per player, see externalSamplingCFR).
+    Only the sampled information sets are updated, so apart from sampling them the cost of an iteration does not
+    depend on the number of chance outcomes (e.g. the deals at the root).
+    """
+
+    return solveWithMCCFR(cfr_tree, iterations, lambda p: externalSamplingCFR(cfr_tree.root, p), perc, show_perc,
+                          checkEveryIteration, check_callback)
+
+def SolveWithOutcomeSamplingMCCFR(cfr_tree, iterations, exploration = 0.6, perc = 10, show_perc = False,
+                                  checkEveryIteration = -1, check_callback = None):
+    """
+    Find a Nash equilibrium (in the two-player zero-sum case) with outcome sampling Monte Carlo CFR, run for a given
+    amount of iterations (each one made of a sampled history per player, see outcomeSamplingCFR).
+    Each iteration only visits as many nodes as the depth of the tree.
+    """
+
+    return solveWithMCCFR(cfr_tree, iterations, lambda p: outcomeSamplingCFR(cfr_tree.root, p, exploration), perc,
+                          show_perc, checkEveryIteration, check_callback)
+
+def solveWithMCCFR(cfr_tree, iterations, traversal, perc, show_perc, checkEveryIteration, check_callback):
+    """
+    Common loop of the MCCFR solvers: run the given traversal function for each player, iterations times.
+    """
+
+    # Graph data
+    graph_data = []
+
+    start_time = time.time()
+    last_checkpoint_time = start_time
+
+    player_count = cfr_tree.numOfPlayers
+
+    for i in range(1, iterations + 1):
+        if(show_perc and i % (iterations / 100 * perc) == 0):
+            print(str(i / (iterations / 100 * perc) * perc) + "%")
+
+        for p in range(player_count):
+            traversal(p)
+
+        if(checkEveryIteration > 0 and i % checkEveryIteration == 0):
+            data = {'epsilon': cfr_tree.checkMarginalsEpsilon(),
+                    'iteration_number': i,
+                    'duration': time.time() - last_checkpoint_time,
+                    'utility': cfr_tree.root.getExpectedUtility()}
+            graph_data.append(data)
+
+            if(check_callback != None):
+                check_callback(data)
+
+            last_checkpoint_time = time.time()
+
+    return {'utility': cfr_tree.root.getExpectedUtility(), 'graph_data': graph_data, 'tot_time': time.time() - start_time}
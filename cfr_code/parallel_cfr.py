@@ -0,0 +1,208 @@
+from cfr_code.cfr import CFR, MultiPlayerCFR
+from data_structures.shared_tables import SharedInformationSetTables
+import multiprocessing
+
+# State used by the worker processes: the tree, its information sets (by dense index) and the delta tables.
+# It is set before the pool is forked, so every worker inherits its own copy of the tree.
+worker_state = None
+
+class ParallelCFR:
+    """
+    Runs the CFR traversals of each iteration on a pool of worker processes, splitting the children of the root
+    chance node (e.g. the dealt hands) among them.
+    The information set vectors of the tree are kept in SharedInformationSetTables, so the workers read the current
+    strategies directly from shared memory. Within an iteration the subtrees of the root children only share the
+    information set accumulators, so each chunk of subtrees accumulates its regrets and strategies in its own shared
+    delta tables, which are then added to the tables of the tree once per iteration.
+    Results are the same as the sequential CFR traversals up to floating-point rounding (deltas are summed in a
+    different order), but node visits are not tracked.
+    With CFR+, the regrets of the frontier nodes (the decision nodes only preceded by chance nodes, the only ones
+    clipped by CFR(), see frontierNodes) are not added to the delta tables: each worker returns them, in the order the
+    sequential traversals would update them, and they are added and clipped one node at a time once the deltas are
+    added, as CFR() does.
+    Worker processes are forked, so this is only available where the 'fork' start method is (e.g. Linux).
+    """
+
+    def __init__(self, cfr_tree, processes, use_cfr_plus = False):
+        """
+        Create a pool of the given number of processes for the given tree, running CFR+ if use_cfr_plus is True.
+        CFR+ is not supported on trees where an information set has both frontier and non-frontier nodes (a
+        ValueError is raised), as its clipped and non-clipped updates could not be kept in order.
+        """
+
+        global worker_state
+
+        self.cfr_tree = cfr_tree
+        self.infosets = sorted(cfr_tree.information_sets.values(), key = lambda i: i.index)
+        self.use_cfr_plus = use_cfr_plus
+
+        if use_cfr_plus:
+            frontier = set(frontierNodes(cfr_tree.root))
+            for node in frontier:
+                if any(n not in frontier for n in node.information_set.nodes):
+                    raise ValueError("CFR+ is not supported in parallel on this tree: information set " +
+                                     str(node.information_set.id) + " has both frontier and non-frontier nodes")
+
+        subtree_count = len(cfr_tree.root.children) if cfr_tree.root.isChance() else 1
+        processes = min(processes, subtree_count)
+
+        # Split the subtrees in contiguous chunks, one per process
+        self.chunks = []
+        for p in range(processes):
+            self.chunks.append(list(range(p * subtree_count // processes, (p + 1) * subtree_count // processes)))
+
+        self.tables = SharedInformationSetTables(self.infosets)
+        self.tables.attach(self.infosets)
+        self.deltas = [SharedInformationSetTables(self.infosets, fields = ('cumulative_regret', 'cumulative_strategy'))
+                       for chunk in self.chunks]
+
+        worker_state = (cfr_tree, self.infosets, self.deltas)
+        self.pool = multiprocessing.get_context('fork').Pool(processes)
+
+    def iteration(self, single_pass_traversal = False):
+        """
+        Run the CFR traversals of one iteration for all the players (without updating the current strategies).
+        """
+
+        for delta in self.deltas:
+            delta.fill(0)
+
+        clipped_regrets = self.pool.map(runSubtrees, [(c, chunk, single_pass_traversal, self.use_cfr_plus)
+                                                      for (c, chunk) in enumerate(self.chunks)])
+
+        for delta in self.deltas:
+            for field in delta.fields:
+                self.tables.arrays[field] += delta.arrays[field]
+
+        # Chunks are contiguous and in order, so this is the order of the sequential traversals
+        for chunk_regrets in clipped_regrets:
+            for (index, regrets) in chunk_regrets:
+                cumulative_regret = self.infosets[index].cumulative_regret
+                for a in range(len(regrets)):
+                    cumulative_regret[a] += regrets[a]
+                    cumulative_regret[a] = max(cumulative_regret[a], 0)
+
+    def close(self):
+        """
+        Stop the worker processes and move the information set vectors back to plain lists.
+        """
+
+        if self.pool == None:
+            return
+
+        self.pool.close()
+        self.pool.join()
+        self.releaseTables()
+
+    def terminate(self):
+        """
+        Like close, but kill the worker processes instead of waiting for them (e.g. to clean up after an error in
+        the middle of an iteration). Does nothing if the pool was already closed.
+        """
+
+        if self.pool == None:
+            return
+
+        self.pool.terminate()
+        self.pool.join()
+        self.releaseTables()
+
+    def releaseTables(self):
+        """
+        Move the information set vectors back to plain lists and free the shared memory.
+        """
+
+        self.pool = None
+
+        self.tables.detach(self.infosets)
+        self.tables.close()
+        for delta in self.deltas:
+            delta.close()
+
+def runSubtrees(args):
+    """
+    Worker side of ParallelCFR.iteration: traverse the given chunk of subtrees of the root, accumulating regrets and
+    strategies in the delta tables of the chunk.
+    With CFR+, the regrets of the frontier nodes are returned instead (see frontierCFR), as a list of (dense index of
+    the information set, regrets) pairs in the order of the sequential traversals; otherwise an empty list is returned.
+    """
+
+    (chunk_index, subtrees, single_pass_traversal, use_cfr_plus) = args
+    (cfr_tree, infosets, deltas) = worker_state
+    player_count = cfr_tree.numOfPlayers
+
+    # Current strategies are still read from the shared tables of the tree
+    deltas[chunk_index].attach(infosets)
+
+    root = cfr_tree.root
+    nodes = root.children if root.isChance() else [ root ]
+
+    clipped_regrets = []
+
+    for s in subtrees:
+        if use_cfr_plus:
+            for node in frontierNodes(nodes[s]):
+                regrets = frontierCFR(node, player_count, single_pass_traversal)
+                clipped_regrets.append((node.information_set.index, regrets))
+        elif single_pass_traversal:
+            MultiPlayerCFR(nodes[s], [1] * player_count)
+        else:
+            for p in range(player_count):
+                CFR(nodes[s], p, [1] * player_count)
+
+    return clipped_regrets
+
+def frontierNodes(root):
+    """
+    Returns the frontier nodes of the subtree of root, i.e. its decision nodes only preceded by chance nodes (in the
+    subtree), in the order they are visited by CFR().
+    """
+
+    frontier = []
+    nodes_to_visit = [ root ]
+
+    while len(nodes_to_visit) > 0:
+        node = nodes_to_visit.pop()
+        if node.isChance():
+            nodes_to_visit.extend(reversed(node.children))
+        elif not node.isLeaf():
+            frontier.append(node)
+
+    return frontier
+
+def frontierCFR(node, player_count, single_pass_traversal):
+    """
+    Run the CFR traversals of the subtree of a frontier node for all the players (without CFR+ clipping, which
+    CFR() only applies to the frontier nodes), except for the regret update of the node itself: its regrets are
+    returned instead, computed as CFR() does (the reach probabilities of all the players are 1 in the node).
+    """
+
+    iset = node.information_set
+    player = iset.player
+    pi = [1] * player_count
+    v_alt = [0 for a in node.children]
+
+    if single_pass_traversal:
+        for a in range(len(node.children)):
+            pi[player] *= iset.current_strategy[a]
+            v_alt[a] = MultiPlayerCFR(node.children[a], pi)[player]
+            pi[player] = 1
+    else:
+        # The other players have no update in the node, so their traversals are the usual ones
+        for p in range(player_count):
+            if p != player:
+                CFR(node, p, pi)
+
+        for a in range(len(node.children)):
+            pi[player] *= iset.current_strategy[a]
+            v_alt[a] = CFR(node.children[a], player, pi)
+            pi[player] = 1
+
+    v = 0
+    for a in range(len(node.children)):
+        v += v_alt[a] * iset.current_strategy[a]
+
+    for a in range(len(node.children)):
+        iset.cumulative_strategy[a] += pi[player] * iset.current_strategy[a]
+
+    return [v_alt[a] - v for a in range(len(node.children))]
@@ -0,0 +1,96 @@
+from cfr_code.reconstruction_cfr import reconstructJoint, addReconstructedJoint
+from cfr_code.worker_results import putResult, getResult
+import multiprocessing
+import queue
+
+class PipelinedReconstruction:
+    """
+    Reconstructs joint distributions from the marginal strategies in a background process, so that the CFR
+    iterations can go on meanwhile.
+    Each submitted reconstruction works on a snapshot of the current strategies of all the information sets, and
+    the reconstructed joints are added to the joint strategy in the order they were submitted, so the joint
+    strategy is the same as if each one was reconstructed right away.
+    If a reconstruction fails in the worker process, its exception is raised by collect (as is a WorkerError if the
+    worker dies), so the solver never waits for a joint that will not come.
+    The worker process is forked, so this is only available where the 'fork' start method is (e.g. Linux).
+    """
+
+    def __init__(self, cfr_tree, reconstructPlayersTogether = False, reconstructWithOptimalPlan = True,
+                 factored_joint = False):
+        """
+        Start the worker process for the given tree and reconstruction options (see SolveWithReconstructionCFR).
+        """
+
+        self.infosets = sorted(cfr_tree.information_sets.values(), key = lambda i: i.index)
+        self.reconstructPlayersTogether = reconstructPlayersTogether
+        self.factored_joint = factored_joint
+
+        context = multiprocessing.get_context('fork')
+        self.requests = context.Queue()
+        self.results = context.Queue()
+        self.pending = 0
+
+        self.process = context.Process(target = reconstructionWorker, daemon = True,
+                                       args = (cfr_tree, self.infosets, self.requests, self.results,
+                                               reconstructPlayersTogether, reconstructWithOptimalPlan, factored_joint))
+        self.process.start()
+
+    def submit(self):
+        """
+        Submit a reconstruction of the current strategies.
+        """
+
+        self.requests.put([list(iset.current_strategy) for iset in self.infosets])
+        self.pending += 1
+
+    def collect(self, jointStrategy, wait = False):
+        """
+        Add to the joint strategy the reconstructed joints which are ready (or all of them, if wait is True).
+        """
+
+        while self.pending > 0:
+            try:
+                joint = getResult(self.results, self.process, block = wait)
+            except queue.Empty:
+                return
+
+            addReconstructedJoint(jointStrategy, joint, self.reconstructPlayersTogether, self.factored_joint)
+            self.pending -= 1
+
+    def close(self):
+        """
+        Stop the worker process (pending reconstructions are discarded).
+        """
+
+        self.requests.put(None)
+        self.process.join()
+
+    def terminate(self):
+        """
+        Kill the worker process without waiting for it (e.g. to clean up after an error). Does nothing if the worker
+        process already stopped.
+        """
+
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process.join()
+
+def reconstructionWorker(cfr_tree, infosets, requests, results, reconstructPlayersTogether, reconstructWithOptimalPlan,
+                         factored_joint):
+    """
+    Worker side of PipelinedReconstruction: reconstruct a joint for each snapshot of the strategies received (see
+    cfr_code.worker_results.putResult).
+    """
+
+    while True:
+        snapshot = requests.get()
+        if snapshot == None:
+            return
+
+        for (iset, strategy) in zip(infosets, snapshot):
+            iset.current_strategy = strategy
+
+        # After a failure no later joint could be added in order, so the worker stops
+        if not putResult(results, lambda: reconstructJoint(cfr_tree, reconstructPlayersTogether,
+                                                           reconstructWithOptimalPlan, factored_joint)):
+            return
@@ -1,4 +1,4 @@
-from cfr_code.cfr import CFR
+from cfr_code.cfr import CFR, MultiPlayerCFR, ChanceSampledCFR
 from data_structures.cfr_trees import CFRJointStrategy
 import time
 
@@ -6,54 +6,170 @@ def SolveWithReconstructionCFR(cfr_tree, iterations, perc = 10, show_perc = Fals
                                checkEveryIteration = -1, reconstructEveryIteration = 1,
                                check_callback = None, use_cfr_plus = False,
                                reconstructPlayersTogether = False,
-                               reconstructWithOptimalPlan = True):
-    
-    jointStrategy = CFRJointStrategy()
-
-    # Graph data
-    graph_data = []
-
-    start_time = time.time()
-    reconstruction_time = 0
-    last_checkpoint_time = start_time
-
-    player_count = cfr_tree.numOfPlayers
-
-    for i in range(1, iterations+1):
-        if(show_perc and i % (iterations / 100 * perc) == 0):
-            print(str(i / (iterations / 100 * perc) * perc) + "%")
-
-        # Run CFR for each player
-        for p in range(player_count):
-            CFR(cfr_tree.root, p, [1] * player_count, use_cfr_plus)
-            
-        # Update the current strategy for each information set
-        for infoset in cfr_tree.information_sets.values():
-            infoset.updateCurrentStrategy()
-
-        # Reconstruct a joint from the marginals and add it to the current joint strategy
-        if (i % reconstructEveryIteration == 0):
-            reconstruction_start_time = time.time()
-            if reconstructPlayersTogether:
-                jointStrategy.addJointDistribution(cfr_tree.buildJointFromMarginals_AllPlayersTogether())
+                               reconstructWithOptimalPlan = True, single_pass_traversal = False, processes = 1,
+                               chance_sampling_batch = 0, factored_joint = False, pipelined_reconstruction = False,
+                               incremental_check = False, async_checks = False):
+    """
+    Find a NFCCE in a given extensive-form tree with the CFR-Jr algorithm, run for a given amount of iterations.
+    Every reconstructEveryIteration iterations a joint distribution is reconstructed from the current marginal
+    strategies and added to the joint strategy.
+    If single_pass_traversal is True, all the players are updated with a single traversal per iteration.
+    If processes is greater than 1, the CFR traversals are split among that many worker processes (see
+    cfr_code.parallel_cfr.ParallelCFR).
+    If chance_sampling_batch is greater than 0, each iteration runs ChanceSampledCFR with that batch size instead
+    (single_pass_traversal and processes are ignored), and the effective iterations per second are reported as
+    effective_iterations_per_second (see SolveWithCFR).
+    If factored_joint is True, each reconstructed joint is added to the joint strategy as a product of the
+    distributions of each player (see CFRJointStrategy.addProductDistribution), without building the joint plans.
+    If pipelined_reconstruction is True, joints are reconstructed by a background process while the iterations go on
+    (see cfr_code.pipelined_reconstruction.PipelinedReconstruction): the joint strategy at each checkpoint is the same
+    as without it, and reconstruction_time only counts the time spent waiting for the reconstructions.
+    If incremental_check is True, the utility and the epsilons of the joint strategy are kept up to date as joints are
+    added to it (see CFRJointStrategy), so that each check does not depend on the number of plans.
+    If async_checks is True, the epsilons and the utility of each checkpoint are computed by a background process on
+    a copy of the joint strategy (see cfr_code.async_checks.AsyncChecker), so the datapoints may reach check_callback
+    some iterations later.
+    """
+
+    chance_sampling = chance_sampling_batch > 0
+    if chance_sampling:
+        processes = 1
+
+    parallel_cfr = None
+    pipeline = None
+    checker = None
+
+    try:
+        if processes > 1:
+            from cfr_code.parallel_cfr import ParallelCFR
+            parallel_cfr = ParallelCFR(cfr_tree, processes, use_cfr_plus)
+
+        if pipelined_reconstruction:
+            from cfr_code.pipelined_reconstruction import PipelinedReconstruction
+            pipeline = PipelinedReconstruction(cfr_tree, reconstructPlayersTogether, reconstructWithOptimalPlan, factored_joint)
+
+        jointStrategy = CFRJointStrategy(cfr_tree, incremental_evaluation = incremental_check)
+
+        # Graph data
+        graph_data = []
+
+        if async_checks:
+            from cfr_code.async_checks import AsyncChecker
+            checker = AsyncChecker(cfr_tree, graph_data, check_callback, marginal_epsilon = True)
+
+        start_time = time.time()
+        reconstruction_time = 0
+        last_checkpoint_time = start_time
+
+        player_count = cfr_tree.numOfPlayers
+
+        effective_iterations = 0
+        checkpoint_effective_iterations = 0
+
+        for i in range(1, iterations+1):
+            if(show_perc and i % (iterations / 100 * perc) == 0):
+                print(str(i / (iterations / 100 * perc) * perc) + "%")
+
+            if chance_sampling:
+                effective_iterations += ChanceSampledCFR(cfr_tree.root, player_count, chance_sampling_batch, use_cfr_plus)
+            elif processes > 1:
+                parallel_cfr.iteration(single_pass_traversal)
+            elif single_pass_traversal:
+                MultiPlayerCFR(cfr_tree.root, [1] * player_count, use_cfr_plus)
             else:
-                jointStrategy.addJointDistribution(cfr_tree.buildJointFromMarginals(select_optimal_plan = reconstructWithOptimalPlan))                
-            reconstruction_time += (time.time() - reconstruction_start_time)
-
-        if(checkEveryIteration > 0 and i % checkEveryIteration == 0):
-            data = {'epsilon': cfr_tree.checkEquilibrium(jointStrategy),
-                    'marginal_epsilon': cfr_tree.checkMarginalsEpsilon(),
-                    'joint_support_size': len(jointStrategy.plans),
-                    'iteration_number': i,
-                    'duration': time.time() - last_checkpoint_time,
-                    'reconstruction_time': reconstruction_time,
-                    'utility': cfr_tree.getUtility(jointStrategy)}
-            reconstruction_time = 0
-            graph_data.append(data)
-
-            if(check_callback != None):
-                check_callback(data)
-                
-            last_checkpoint_time = time.time()
+                # Run CFR for each player
+                for p in range(player_count):
+                    CFR(cfr_tree.root, p, [1] * player_count, use_cfr_plus)
+
+            # Update the current strategy for each information set
+            for infoset in cfr_tree.information_sets.values():
+                infoset.updateCurrentStrategy()
+
+            # Reconstruct a joint from the marginals and add it to the current joint strategy
+            if (i % reconstructEveryIteration == 0):
+                reconstruction_start_time = time.time()
+                if pipelined_reconstruction:
+                    pipeline.submit()
+                    pipeline.collect(jointStrategy)
+                else:
+                    addReconstructedJoint(jointStrategy, reconstructJoint(cfr_tree, reconstructPlayersTogether,
+                                                                          reconstructWithOptimalPlan, factored_joint),
+                                          reconstructPlayersTogether, factored_joint)
+                reconstruction_time += (time.time() - reconstruction_start_time)
+
+            if(checkEveryIteration > 0 and i % checkEveryIteration == 0):
+                if pipelined_reconstruction:
+                    reconstruction_start_time = time.time()
+                    pipeline.collect(jointStrategy, wait = True)
+                    reconstruction_time += (time.time() - reconstruction_start_time)
+
+                data = {'joint_support_size': jointStrategy.getSupportSize(),
+                        'iteration_number': i,
+                        'duration': time.time() - last_checkpoint_time,
+                        'reconstruction_time': reconstruction_time}
+                reconstruction_time = 0
+                if chance_sampling:
+                    data['effective_iterations_per_second'] = (effective_iterations - checkpoint_effective_iterations) / data['duration']
+                    checkpoint_effective_iterations = effective_iterations
+
+                if async_checks:
+                    checker.submit(data, jointStrategy)
+                    checker.collect()
+                else:
+                    data['epsilon'] = cfr_tree.checkEquilibrium(jointStrategy)
+                    data['marginal_epsilon'] = cfr_tree.checkMarginalsEpsilon()
+                    data['utility'] = cfr_tree.getUtility(jointStrategy)
+                    graph_data.append(data)
+
+                    if(check_callback != None):
+                        check_callback(data)
+
+                last_checkpoint_time = time.time()
+
+        if processes > 1:
+            parallel_cfr.close()
+
+        if pipelined_reconstruction:
+            pipeline.collect(jointStrategy, wait = True)
+            pipeline.close()
+
+        if async_checks:
+            checker.close()
+    finally:
+        # Release the worker processes and the shared memory also if the loop was interrupted (e.g. by Ctrl-C)
+        if parallel_cfr != None:
+            parallel_cfr.terminate()
+        if pipeline != None:
+            pipeline.terminate()
+        if checker != None:
+            checker.terminate()
         
-    return {'utility': cfr_tree.getUtility(jointStrategy), 'graph_data': graph_data, 'tot_time': time.time() - start_time, 'joint': jointStrategy}
\ No newline at end of file
+    res = {'utility': cfr_tree.getUtility(jointStrategy), 'graph_data': graph_data, 'tot_time': time.time() - start_time, 'joint': jointStrategy}
+
+    if chance_sampling:
+        res['effective_iterations_per_second'] = effective_iterations / res['tot_time']
+
+    return res
+
+def reconstructJoint(cfr_tree, reconstructPlayersTogether, reconstructWithOptimalPlan, factored_joint):
+    """
+    Reconstruct a joint distribution from the current marginal strategies of the tree, as selected by the options
+    of SolveWithReconstructionCFR.
+    """
+
+    if factored_joint and not reconstructPlayersTogether:
+        return cfr_tree.buildFactoredJointFromMarginals(select_optimal_plan = reconstructWithOptimalPlan)
+    elif reconstructPlayersTogether:
+        return cfr_tree.buildJointFromMarginals_AllPlayersTogether()
+    else:
+        return cfr_tree.buildJointFromMarginals(select_optimal_plan = reconstructWithOptimalPlan)
+
+def addReconstructedJoint(jointStrategy, joint, reconstructPlayersTogether, factored_joint):
+    """
+    Add a joint distribution built by reconstructJoint to the joint strategy.
+    """
+
+    if factored_joint and not reconstructPlayersTogether:
+        jointStrategy.addProductDistribution(joint)
+    else:
+        jointStrategy.addJointDistribution(joint)
@@ -1,5 +1,7 @@
 from data_structures.cfr_trees import CFRJointStrategy
+from data_structures.trees import useIterativeTraversals
 from functools import reduce
+from math import prod
 import time
 
 def sampleCFR(node, player, pi, action_plan):
@@ -11,11 +13,20 @@ def sampleCFR(node, player, pi, action_plan):
     action_plan = the sampled action plan.
     """
 
+    if useIterativeTraversals():
+        return iterativeSampleCFR(node, player, pi, action_plan)
+    return recursiveSampleCFR(node, player, pi, action_plan)
+
+def recursiveSampleCFR(node, player, pi, action_plan):
+    """
+    Recursive implementation of sampleCFR(), used when recursive traversals are selected.
+    """
+
     n_players = len(pi)
     node.visits += reduce(lambda x, y: x * y, pi, 1)
     
     if(node.isChance()):
-        return sampleCFR(node.children[node.sampleAction()], player, pi, action_plan)
+        return recursiveSampleCFR(node.children[node.sampleAction()], player, pi, action_plan)
     
     if(node.isLeaf()):
         return node.utility[player]        
@@ -27,15 +38,15 @@ def sampleCFR(node, player, pi, action_plan):
     sampled_action = action_plan[iset.id]
     
     if(max(pi) == 0):
-        return sampleCFR(node.children[sampled_action], player, pi, action_plan)
+        return recursiveSampleCFR(node.children[sampled_action], player, pi, action_plan)
     
     for a in range(len(node.children)):
         if(a == sampled_action):
-            v_alt[a] = sampleCFR(node.children[a], player, pi, action_plan)
+            v_alt[a] = recursiveSampleCFR(node.children[a], player, pi, action_plan)
         else:
             old_pi = pi[iset.player]
             pi[iset.player] = 0
-            v_alt[a] = sampleCFR(node.children[a], player, pi, action_plan)
+            v_alt[a] = recursiveSampleCFR(node.children[a], player, pi, action_plan)
             pi[iset.player] = old_pi
         
     v = v_alt[sampled_action]
@@ -55,65 +66,312 @@ def sampleCFR(node, player, pi, action_plan):
     
     return v
 
+def multiPlayerSampleCFR(node, pi, action_plan):
+    """
+    SCFR algorithm, updating the regrets of all the players in a single traversal (simultaneous updates).
+    Chance outcomes are sampled once and shared by all the players.
+    Returns the vector of values of the node, one per player.
+    node = the current node the algorithm is in.
+    pi = a probability vector containing, for each player, the probability to reach the current node.
+    action_plan = the sampled action plan.
+    """
+
+    if useIterativeTraversals():
+        return iterativeMultiPlayerSampleCFR(node, pi, action_plan)
+    return recursiveMultiPlayerSampleCFR(node, pi, action_plan)
+
+def recursiveMultiPlayerSampleCFR(node, pi, action_plan):
+    """
+    Recursive implementation of multiPlayerSampleCFR(), used when recursive traversals are selected.
+    """
+
+    n_players = len(pi)
+    node.visits += reduce(lambda x, y: x * y, pi, 1)
+
+    if(node.isChance()):
+        return recursiveMultiPlayerSampleCFR(node.children[node.sampleAction()], pi, action_plan)
+
+    if(node.isLeaf()):
+        return node.utility
+
+    iset = node.information_set
+    player = iset.player
+    v_alt = [None for a in node.children]
+
+    sampled_action = action_plan[iset.id]
+
+    if(max(pi) == 0):
+        return recursiveMultiPlayerSampleCFR(node.children[sampled_action], pi, action_plan)
+
+    for a in range(len(node.children)):
+        if(a == sampled_action):
+            v_alt[a] = recursiveMultiPlayerSampleCFR(node.children[a], pi, action_plan)
+        else:
+            old_pi = pi[player]
+            pi[player] = 0
+            v_alt[a] = recursiveMultiPlayerSampleCFR(node.children[a], pi, action_plan)
+            pi[player] = old_pi
+
+    v = v_alt[sampled_action]
+
+    pi_other = 1
+    for i in range(n_players):
+        if(i != player):
+            pi_other *= pi[i]
+
+    for a in range(len(node.children)):
+        ##### CFR+ #####
+        iset.cumulative_regret[a] = max(iset.cumulative_regret[a] + pi_other * (v_alt[a][player] - v[player]), 0)
+
+        ##### This is useless for NFCCE #####
+        iset.cumulative_strategy[a] += pi[player] * iset.current_strategy[a]
+
+    return v
+
+def iterativeSampleCFR(root, player, pi, action_plan):
+    """
+    Explicit-stack version of sampleCFR(), visiting the nodes (and sampling chance) in the same order.
+    As in sampleCFR(), pi is updated in place while going down the tree and restored while going up.
+    """
+
+    # Parallel stacks (so that no frame is allocated per node) with the internal nodes being visited, the values of
+    # the children visited so far and the reach probability of the player playing in each node.
+    # Chance nodes and nodes reached with probability zero only follow one child, so they are not stacked.
+    nodes = []
+    children_values = []
+    reaches = []
+    node = root
+
+    while True:
+        node.visits += prod(pi)
+
+        if(node.isChance()):
+            node = node.children[node.sampleAction()]
+            continue
+
+        if(not node.is_leaf):
+            if(max(pi) == 0):
+                node = node.children[action_plan[node.information_set.id]]
+                continue
+            nodes.append(node)
+            children_values.append([])
+            reaches.append(pi[node.information_set.player])
+        else:
+            value = node.utility[player]
+
+            # Go up, evaluating the nodes whose children have all been visited
+            while len(nodes) > 0:
+                node = nodes[-1]
+                values = children_values[-1]
+                values.append(value)
+                if len(values) < len(node.children):
+                    break
+                nodes.pop()
+                children_values.pop()
+
+                iset = node.information_set
+                pi[iset.player] = reaches.pop()
+                value = values[action_plan[iset.id]]
+
+                if(iset.player == player):
+                    pi_other = 1
+                    for i in range(len(pi)):
+                        if(i != player):
+                            pi_other *= pi[i]
+
+                    for a in range(len(node.children)):
+                        ##### CFR+ #####
+                        iset.cumulative_regret[a] = max(iset.cumulative_regret[a] + pi_other * (values[a] - value), 0)
+
+                        ##### This is useless for NFCCE #####
+                        iset.cumulative_strategy[a] += pi[player] * iset.current_strategy[a]
+            else:
+                return value
+
+        # Go down into the next child of the node on top of the stack
+        node = nodes[-1]
+        node = sampledChild(node, pi, reaches[-1], len(children_values[-1]), action_plan)
+
+def iterativeMultiPlayerSampleCFR(root, pi, action_plan):
+    """
+    Explicit-stack version of multiPlayerSampleCFR(), visiting the nodes (and sampling chance) in the same order.
+    As in multiPlayerSampleCFR(), pi is updated in place while going down the tree and restored while going up.
+    """
+
+    n_players = len(pi)
+
+    # Parallel stacks (so that no frame is allocated per node) with the internal nodes being visited, the values of
+    # the children visited so far and the reach probability of the player playing in each node.
+    # Chance nodes and nodes reached with probability zero only follow one child, so they are not stacked.
+    nodes = []
+    children_values = []
+    reaches = []
+    node = root
+
+    while True:
+        node.visits += prod(pi)
+
+        if(node.isChance()):
+            node = node.children[node.sampleAction()]
+            continue
+
+        if(not node.is_leaf):
+            if(max(pi) == 0):
+                node = node.children[action_plan[node.information_set.id]]
+                continue
+            nodes.append(node)
+            children_values.append([])
+            reaches.append(pi[node.information_set.player])
+        else:
+            value = node.utility
+
+            # Go up, evaluating the nodes whose children have all been visited
+            while len(nodes) > 0:
+                node = nodes[-1]
+                values = children_values[-1]
+                values.append(value)
+                if len(values) < len(node.children):
+                    break
+                nodes.pop()
+                children_values.pop()
+
+                iset = node.information_set
+                player = iset.player
+                pi[player] = reaches.pop()
+                value = values[action_plan[iset.id]]
+
+                pi_other = 1
+                for i in range(n_players):
+                    if(i != player):
+                        pi_other *= pi[i]
+
+                for a in range(len(node.children)):
+                    ##### CFR+ #####
+                    iset.cumulative_regret[a] = max(iset.cumulative_regret[a] + pi_other * (values[a][player] - value[player]), 0)
+
+                    ##### This is useless for NFCCE #####
+                    iset.cumulative_strategy[a] += pi[player] * iset.current_strategy[a]
+            else:
+                return value
+
+        # Go down into the next child of the node on top of the stack
+        node = nodes[-1]
+        node = sampledChild(node, pi, reaches[-1], len(children_values[-1]), action_plan)
+
+def sampledChild(node, pi, reach, a, action_plan):
+    """
+    Returns the a-th child of node, setting in pi the reach probability of the player playing in node (whose reach
+    probability in node is reach) to the one of the child: the player reaches it only if a is the action sampled in
+    the action plan.
+    """
+
+    iset = node.information_set
+    pi[iset.player] = reach if a == action_plan[iset.id] else 0
+    return node.children[a]
+
 def SolveWithSampleCFR(cfr_tree, iterations, perc = 10, show_perc = False, checkEveryIteration = -1,
-                       bootstrap_iterations = 0, bound_joint_size = True, check_callback = None):
+                       bootstrap_iterations = 0, bound_joint_size = True, check_callback = None,
+                       single_pass_traversal = False, incremental_check = False, async_checks = False,
+                       batched_sampling = False):
     """
     Find a NFCCE in a given extensive-form tree with the SCFR algorithm, run for a given amount of iterations.
     If show_perc is True, every perc% of the target iterations are done a message is shown on the console.
     checkEveryIteration is the frequency to collect convergence data, such as the epsilon or the elapsed time.
     If bound_joint_size is True the joint strategy is created with space for at most 2 * |A| plans, otherwise it is
     created with an unbounded space.
+    If single_pass_traversal is True, all the players are updated with a single traversal per iteration.
+    If incremental_check is True, the utility and the epsilons of the joint strategy are kept up to date as plans are
+    added to it (see CFRJointStrategy), so that each check does not depend on the number of plans.
+    If async_checks is True, the epsilon and the utility of each checkpoint are computed by a background process on a
+    copy of the joint strategy (see cfr_code.async_checks.AsyncChecker), so the datapoints may reach check_callback
+    some iterations later.
+    If batched_sampling is True, the action plans are sampled with array operations over all the information sets (see
+    data_structures.plan_sampling.ActionPlanSampler), from a NumPy generator seeded by the random module.
     """
 
     if(bound_joint_size):
-        jointStrategy = CFRJointStrategy(cfr_tree.numOfActions * 2)
+        jointStrategy = CFRJointStrategy(cfr_tree, cfr_tree.numOfActions * 2, incremental_evaluation = incremental_check)
     else:
-        jointStrategy = CFRJointStrategy(-1)
+        jointStrategy = CFRJointStrategy(cfr_tree, -1, incremental_evaluation = incremental_check)
     player_count = cfr_tree.numOfPlayers
+
+    if batched_sampling:
+        from data_structures.plan_sampling import ActionPlanSampler
+        sampler = ActionPlanSampler(cfr_tree)
     
     # Graph data
     graph_data = []
 
-    start_time = time.time()
-    last_checkpoint_time = start_time
-    
-    for i in range(1, iterations+bootstrap_iterations+1):
-        t = i - bootstrap_iterations
+    checker = None
 
-        if((t+1) > 0 and show_perc and (t+1) % (iterations / 100 * perc) == 0):
-            print(str((t+1) / (iterations / 100 * perc) * perc) + "%")
-            
-        # Sample a joint action plan from the current strategies
-        action_plan = cfr_tree.sampleActionPlan()
-            
-        # Run CFR for each player
-        for p in range(player_count):
-            sampleCFR(cfr_tree.root, p, [1] * player_count, action_plan)
-            
-        # Update the current strategy for each information set
-        for infoset in cfr_tree.information_sets.values():
-            infoset.updateCurrentStrategy()
-            
-        if(i <= bootstrap_iterations):
-            continue # Neither update the joint, nor check the equilibrium
+    try:
+        if async_checks:
+            from cfr_code.async_checks import AsyncChecker
+            checker = AsyncChecker(cfr_tree, graph_data, check_callback)
 
-        jointStrategy.addActionPlan(CFRJointStrategy.reduceActionPlan(action_plan, cfr_tree))
-        
-        if(checkEveryIteration > 0 and t % checkEveryIteration == 0):
-            data = {'epsilon': cfr_tree.checkEquilibrium(jointStrategy),
-                    'absolute_joint_size': jointStrategy.frequencyCount,
-                    'joint_support_size': len(jointStrategy.plans),
-                    'relative_joint_size': jointStrategy.frequencyCount / t,
-                    'max_plan_frequency': max(jointStrategy.plans.values()),
-                    'iteration_number': t,
-                    'duration': time.time() - last_checkpoint_time,
-                    'utility': cfr_tree.getUtility(jointStrategy)}
-            graph_data.append(data)
-
-            if(check_callback != None):
-                check_callback(data)
-
-            last_checkpoint_time = time.time()
+        start_time = time.time()
+        last_checkpoint_time = start_time
+
+        for i in range(1, iterations+bootstrap_iterations+1):
+            t = i - bootstrap_iterations
+
+            if((t+1) > 0 and show_perc and (t+1) % (iterations / 100 * perc) == 0):
+                print(str((t+1) / (iterations / 100 * perc) * perc) + "%")
+
+            # Sample a joint action plan from the current strategies
+            if batched_sampling:
+                sampler.loadStrategies()
+                actions = sampler.sample()[0]
+                action_plan = sampler.toActionPlan(actions)
+            else:
+                action_plan = cfr_tree.sampleActionPlan()
+
+            if single_pass_traversal:
+                multiPlayerSampleCFR(cfr_tree.root, [1] * player_count, action_plan)
+            else:
+                # Run CFR for each player
+                for p in range(player_count):
+                    sampleCFR(cfr_tree.root, p, [1] * player_count, action_plan)
+
+            # Update the current strategy for each information set
+            for infoset in cfr_tree.information_sets.values():
+                infoset.updateCurrentStrategy()
+
+            if(i <= bootstrap_iterations):
+                continue # Neither update the joint, nor check the equilibrium
+
+            if batched_sampling:
+                jointStrategy.addCompactActionPlan(cfr_tree.getPlanReduction().reduce(actions))
+            else:
+                jointStrategy.addActionPlan(CFRJointStrategy.reduceActionPlan(action_plan, cfr_tree))
+
+            if(checkEveryIteration > 0 and t % checkEveryIteration == 0):
+                data = {'absolute_joint_size': jointStrategy.frequencyCount,
+                        'joint_support_size': len(jointStrategy.plans),
+                        'relative_joint_size': jointStrategy.frequencyCount / t,
+                        'max_plan_frequency': max(jointStrategy.plans.values()),
+                        'iteration_number': t,
+                        'duration': time.time() - last_checkpoint_time}
+
+                if async_checks:
+                    checker.submit(data, jointStrategy)
+                    checker.collect()
+                else:
+                    data['epsilon'] = cfr_tree.checkEquilibrium(jointStrategy)
+                    data['utility'] = cfr_tree.getUtility(jointStrategy)
+                    graph_data.append(data)
+
+                    if(check_callback != None):
+                        check_callback(data)
+
+                last_checkpoint_time = time.time()
+
+        if async_checks:
+            checker.close()
+    finally:
+        # Stop the worker process also if the loop was interrupted (e.g. by Ctrl-C)
+        if checker != None:
+            checker.terminate()
         
     return {'utility': cfr_tree.getUtility(jointStrategy), 'joint': jointStrategy, 'graph_data': graph_data,
             'tot_time': time.time() - start_time}
\ No newline at end of file
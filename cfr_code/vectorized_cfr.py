@@ -0,0 +1,160 @@
+from data_structures.compiled_trees import CompiledCFRTree, NodeType
+import numpy as np
+
+class VectorizedCFR:
+    """
+    Level-synchronous CFR engine working on a CompiledCFRTree.
+    Each iteration does a top-down pass computing the reach probabilities of every node (for all the players at once)
+    and a bottom-up pass computing the values of every node, one depth level at a time; regrets are then
+    scatter-added into flat per-infoset arrays.
+    The engine computes the same updates as running CFR() once per player (chance probabilities are not included
+    in the reach probabilities, as in CFR()), but it does not track node visits.
+    Updates only differ from the recursive ones by floating-point rounding; on games where some regrets are exactly
+    zero (e.g. Goofspiel) this rounding can change their sign, so long runs may follow a different trajectory.
+    With CFR+, regret matching+ is applied to the whole information sets (see updateCurrentStrategy), instead of the
+    per node clipping of CFR().
+    """
+
+    def __init__(self, tree, use_cfr_plus = False):
+        """
+        Create an engine for a given tree (a CompiledCFRTree, a CFRTree or a base Tree).
+        The regrets and strategies are initialized from the information sets of the tree.
+        """
+
+        if not isinstance(tree, CompiledCFRTree):
+            tree = CompiledCFRTree(tree)
+
+        self.tree = tree
+        self.use_cfr_plus = use_cfr_plus
+
+        self.cumulative_regret = tree.getCumulativeRegret()
+        self.cumulative_strategy = tree.getCumulativeStrategy()
+        self.current_strategy = tree.getCurrentStrategy()
+
+        num_players = tree.numOfPlayers
+        offsets = tree.infoset_action_offset
+
+        # Per action tables (used for regret matching)
+        self.action_infoset = np.repeat(np.arange(tree.num_infosets), tree.infoset_action_count)
+        self.uniform_strategy = 1 / tree.infoset_action_count[self.action_infoset]
+
+        # Per node tables: each non-root node is the endpoint of an edge coming from its parent
+        parent = tree.node_parent.astype(np.int64)
+        parent_type = np.full(tree.num_nodes, -1, dtype = np.int8)
+        parent_type[1:] = tree.node_type[parent[1:]]
+        self.decision_edges = np.flatnonzero(parent_type == NodeType.Decision)
+        self.decision_edge_parent = parent[self.decision_edges]
+        self.decision_edge_player = tree.node_player[self.decision_edge_parent].astype(np.int64)
+        self.decision_edge_action = offsets[tree.node_infoset[self.decision_edge_parent]] + \
+                                    tree.node_incoming_action[self.decision_edges]
+        self.chance_edges = np.flatnonzero(parent_type == NodeType.Chance)
+        self.chance_edge_probability = tree.chance_probability[self.chance_edges]
+
+        self.leaves = np.flatnonzero(tree.node_type == NodeType.Leaf)
+        self.leaf_utility = tree.utility[tree.node_leaf[self.leaves]]
+
+        # Per level tables
+        self.levels = []
+        for d in range(tree.num_levels):
+            start = tree.level_start[d]
+            end = tree.level_start[d + 1]
+            level_edges = (self.decision_edges >= start) & (self.decision_edges < end)
+            internal = start + np.flatnonzero(tree.node_type[start:end] != NodeType.Leaf)
+            self.levels.append({
+                'start': start,
+                'end': end,
+                'parent': parent[start:end],
+                'decision_edges': np.flatnonzero(level_edges),
+                'internal': internal,
+                'next_end': tree.level_start[min(d + 2, tree.num_levels)],
+                'child_start': (tree.child_start[internal] - end).astype(np.int64)
+            })
+
+        self.edge_weight = np.ones(tree.num_nodes)
+        self.edge_weight[self.chance_edges] = self.chance_edge_probability
+        self.reach = np.ones((tree.num_nodes, num_players))
+        self.values = np.zeros((tree.num_nodes, num_players))
+
+    def iteration(self):
+        """
+        Run one CFR iteration for all the players and update the current strategy of every information set.
+        """
+
+        tree = self.tree
+        reach = self.reach
+        values = self.values
+        strategy = self.current_strategy
+
+        edge_weight = self.edge_weight
+        edge_weight[self.decision_edges] = strategy[self.decision_edge_action]
+
+        # Top-down pass: reach probabilities of every player
+        reach[0] = 1
+        for level in self.levels[1:]:
+            start = level['start']
+            end = level['end']
+            reach[start:end] = reach[level['parent']]
+            edges = self.decision_edges[level['decision_edges']]
+            players = self.decision_edge_player[level['decision_edges']]
+            reach[edges, players] *= edge_weight[edges]
+
+        # Bottom-up pass: expected value of every node, for all the players
+        values[self.leaves] = self.leaf_utility
+        for level in reversed(self.levels[:-1]):
+            internal = level['internal']
+            if len(internal) == 0:
+                continue
+            next_start = level['end']
+            next_end = level['next_end']
+            weighted = values[next_start:next_end] * edge_weight[next_start:next_end, None]
+            values[internal] = np.add.reduceat(weighted, level['child_start'], axis = 0)
+
+        # Regret and cumulative strategy updates
+        parents = self.decision_edge_parent
+        players = self.decision_edge_player
+        edges = self.decision_edges
+
+        reach_other = self.reachOfOthers(reach[parents], players)
+        regret_increments = reach_other * (values[edges, players] - values[parents, players])
+        strategy_increments = reach[parents, players] * edge_weight[edges]
+
+        num_actions = tree.num_infoset_actions
+        self.cumulative_regret += np.bincount(self.decision_edge_action, weights = regret_increments, minlength = num_actions)
+        self.cumulative_strategy += np.bincount(self.decision_edge_action, weights = strategy_increments, minlength = num_actions)
+
+        self.updateCurrentStrategy()
+
+        return values[0]
+
+    def reachOfOthers(self, reach, players):
+        """
+        Given a matrix of reach probabilities (one row per node) and, for each row, a player, compute the
+        product of the reach probabilities of all the other players.
+        """
+
+        num_players = reach.shape[1]
+        res = np.ones(reach.shape[0])
+        for p in range(num_players):
+            res *= np.where(players == p, 1, reach[:, p])
+        return res
+
+    def updateCurrentStrategy(self):
+        """
+        Recalculate the current strategy of every information set with regret matching (regret matching+ if
+        the engine uses CFR+).
+        """
+
+        if self.use_cfr_plus:
+            np.maximum(self.cumulative_regret, 0, out = self.cumulative_regret)
+
+        positive_regret = np.maximum(self.cumulative_regret, 0)
+        norm = np.add.reduceat(positive_regret, self.tree.infoset_action_offset[:-1])[self.action_infoset]
+        np.divide(positive_regret, norm, out = self.current_strategy, where = norm > 0)
+        self.current_strategy[norm <= 0] = self.uniform_strategy[norm <= 0]
+
+    def writeBack(self):
+        """
+        Copy the regrets and strategies computed by the engine back into the information sets of the tree.
+        """
+
+        self.tree.setInfosetTables(self.cumulative_regret, self.cumulative_strategy, self.current_strategy)
@@ -0,0 +1,55 @@
+import queue
+import traceback
+
+# How often (in seconds) a blocking wait for a result checks that the worker process is still alive
+LIVENESS_CHECK_INTERVAL = 1
+
+class WorkerError(Exception):
+    """
+    A failure of a background worker process, carrying the traceback of the worker (if it could report one).
+    """
+
+def putResult(results, compute):
+    """
+    Worker side of getResult: put on the results queue the value returned by compute(), or the exception it raised
+    together with its traceback. Returns whether compute() succeeded.
+    """
+
+    try:
+        result = compute()
+    except Exception as e:
+        results.put((e, traceback.format_exc()))
+        return False
+
+    results.put((None, result))
+    return True
+
+def getResult(results, process, block = True):
+    """
+    Get the next result put on the results queue by the worker process (see putResult).
+    If block is False and no result is ready, queue.Empty is raised. If the worker failed, its exception is re-raised
+    (caused by a WorkerError with the traceback of the worker), and if the worker died without reporting (e.g. it was
+    killed) a WorkerError is raised instead of waiting forever.
+    """
+
+    while True:
+        try:
+            (error, result) = results.get(block = block, timeout = LIVENESS_CHECK_INTERVAL)
+            break
+        except queue.Empty:
+            if not block:
+                raise
+            if process.is_alive():
+                continue
+
+        # The worker is gone: whatever it put on the queue before exiting is already there
+        try:
+            (error, result) = results.get(block = False)
+            break
+        except queue.Empty:
+            raise WorkerError("The worker process exited (with code " + str(process.exitcode) + ") without a result")
+
+    if error != None:
+        raise error from WorkerError(result)
+
+    return result
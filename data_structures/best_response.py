@@ -0,0 +1,165 @@
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+class BestResponse:
+    """
+    Best response values of the players of a CFRTree, computed from the marginalized utilities of the leaves (see
+    CFRTree.checkEquilibrium) with a single bottom-up pass over the information sets of the player.
+    For each player the (information set, action) pairs are laid out in flat tables, with the information sets
+    grouped by the length of their sequence, so that each group only has children in the following one. The leaves
+    and the children information sets under each pair are summed in the same order as CFRInformationSet.V(), so the
+    values are exactly the same as the ones it computes.
+    When NumPy is available each group is processed with array operations, otherwise with plain lists.
+    """
+
+    def __init__(self, cfr_tree):
+        """
+        Precompute the tables of all the players of the given tree.
+        """
+
+        self.cfr_tree = cfr_tree
+
+        # Dense index of the leaves under some information set, in the tables of the leaf values
+        self.leaves = []
+        self.leaf_index = {}
+        for iset in cfr_tree.information_sets.values():
+            for leaves in iset.children_leaves:
+                for leaf in leaves:
+                    if leaf not in self.leaf_index:
+                        self.leaf_index[leaf] = len(self.leaves)
+                        self.leaves.append(leaf)
+
+        self.player_tables = [ self.buildPlayerTables(p) for p in range(cfr_tree.numOfPlayers) ]
+
+    def buildPlayerTables(self, player):
+        infosets = self.cfr_tree.infosets_by_player[player]
+
+        level_count = 1 + max([ len(iset.sequence) for iset in infosets ], default = -1)
+        levels = [ [] for l in range(level_count) ]
+        for iset in infosets:
+            levels[len(iset.sequence)].append(iset)
+
+        # Position of each information set in its level, and flat index of its first action
+        position = {}
+        slot_offset = {}
+        slot_count = 0
+        for level in levels:
+            for (i, iset) in enumerate(level):
+                position[iset] = i
+                slot_offset[iset] = slot_count
+                slot_count += iset.action_count
+
+        # Leaves under each slot, in the order of children_leaves
+        leaf_slots = []
+        leaf_indices = []
+        for level in levels:
+            for iset in level:
+                for a in range(iset.action_count):
+                    for leaf in iset.children_leaves[a]:
+                        leaf_slots.append(slot_offset[iset] + a)
+                        leaf_indices.append(self.leaf_index[leaf])
+
+        level_tables = []
+        for (l, level) in enumerate(levels):
+            slot_start = slot_offset[level[0]] if len(level) > 0 else slot_count
+            action_starts = [ slot_offset[iset] - slot_start for iset in level ]
+            slot_end = slot_start + sum(iset.action_count for iset in level)
+
+            # Children (in the next level) under each slot, in the order of children_infoset
+            child_positions = []
+            child_parent_slots = []
+            if l + 1 < len(levels):
+                for iset in level:
+                    for a in range(iset.action_count):
+                        for child in iset.children_infoset[a]:
+                            child_positions.append(position[child])
+                            child_parent_slots.append(slot_offset[iset] + a - slot_start)
+
+            level_tables.append({'slot_start': slot_start, 'slot_end': slot_end, 'action_starts': action_starts,
+                                 'child_positions': child_positions, 'child_parent_slots': child_parent_slots})
+
+        root_positions = [ position[iset] for iset in infosets if iset.sequence == {} ]
+
+        if np != None:
+            leaf_slots = np.array(leaf_slots, dtype = np.int64)
+            leaf_indices = np.array(leaf_indices, dtype = np.int64)
+            for table in level_tables:
+                for key in ('action_starts', 'child_positions', 'child_parent_slots'):
+                    table[key] = np.array(table[key], dtype = np.int64)
+
+        return {'slot_count': slot_count, 'leaf_slots': leaf_slots, 'leaf_indices': leaf_indices,
+                'levels': level_tables, 'root_positions': root_positions}
+
+    def getLeafValues(self):
+        """
+        Get the table of the current marginalized utilities of the leaves.
+        """
+
+        values = [ leaf.marginalized_utility for leaf in self.leaves ]
+        return np.array(values) if np != None else values
+
+    def newLeafValues(self):
+        """
+        Get a table of leaf values (all zeros), to be filled by position in self.leaf_index.
+        """
+
+        return np.zeros(len(self.leaves)) if np != None else [0] * len(self.leaves)
+
+    def value(self, player, leaf_values = None):
+        """
+        Get the value of the best response of the given player, i.e. the sum of the values V() of its root
+        information sets, for the given leaf values (or the current marginalized utilities of the leaves).
+        """
+
+        if leaf_values is None:
+            leaf_values = self.getLeafValues()
+
+        tables = self.player_tables[player]
+        if len(tables['levels']) == 0:
+            return 0
+
+        if np != None:
+            root_values = self.rootValues(tables, np.asarray(leaf_values, dtype = np.float64))
+        else:
+            root_values = self.listRootValues(tables, leaf_values)
+
+        return sum(root_values[i] for i in tables['root_positions'])
+
+    def rootValues(self, tables, leaf_values):
+        slot_values = np.bincount(tables['leaf_slots'], weights = leaf_values[tables['leaf_indices']],
+                                  minlength = tables['slot_count'])
+
+        values = None
+        for table in reversed(tables['levels']):
+            level_slot_values = slot_values[table['slot_start']:table['slot_end']]
+
+            if values is not None and len(table['child_positions']) > 0:
+                level_slot_values += np.bincount(table['child_parent_slots'], weights = values[table['child_positions']],
+                                                 minlength = len(level_slot_values))
+
+            values = np.maximum.reduceat(level_slot_values, table['action_starts'])
+
+        return values.tolist()
+
+    def listRootValues(self, tables, leaf_values):
+        slot_values = [0] * tables['slot_count']
+        for (slot, leaf) in zip(tables['leaf_slots'], tables['leaf_indices']):
+            slot_values[slot] += leaf_values[leaf]
+
+        values = None
+        for table in reversed(tables['levels']):
+            start = table['slot_start']
+
+            if values is not None:
+                child_values = [0] * (table['slot_end'] - start)
+                for (child, slot) in zip(table['child_positions'], table['child_parent_slots']):
+                    child_values[slot] += values[child]
+                for slot in range(len(child_values)):
+                    slot_values[start + slot] += child_values[slot]
+
+            ends = list(table['action_starts'][1:]) + [ table['slot_end'] - start ]
+            values = [ max(slot_values[start + s:start + e]) for (s, e) in zip(table['action_starts'], ends) ]
+
+        return values
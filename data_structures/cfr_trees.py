@@ -1,5 +1,12 @@
 from functools import reduce
-from data_structures.trees import Tree, Node, Leaf, randomTree
+from data_structures.trees import Tree, Node, Leaf, randomTree, useIterativeTraversals
+from data_structures.reconstruction import PlayerPlanReconstruction
+from data_structures.joint_evaluation import IncrementalJointEvaluation
+from data_structures.best_response import BestResponse
+from data_structures.plan_reduction import ActionPlanReduction
+from array import array
+from itertools import compress
+import heapq
 import random
 import math
 import re
@@ -10,67 +17,156 @@ class CFRTree:
     Wrapper around an extensive-form tree for holding additional CFR-related code and data.
     """
 
-    def __init__(self, base_tree):
+    def __init__(self, base_tree, release_base_tree = False):
         """
         Create a CFRTree starting from a base Tree.
+        If release_base_tree is True, the nodes do not keep a reference to their base Node once the tree is built
+        (see releaseBaseTree), so that the base Tree can be freed if it is not referenced anywhere else.
         """
 
+        # Time spent in each phase of the construction, in seconds
+        self.build_times = {}
+        phase_start = time.time()
+
         self.root = CFRChanceNode(base_tree.root) if base_tree.root.isChance() else CFRNode(base_tree.root)
         self.information_sets = {}
         self.numOfActions = 0
         self.numOfPlayers = base_tree.numOfPlayers
 
-        nodes_to_expand = [ self.root ]
+        self.build_times['nodes'] = time.time() - phase_start
+        phase_start = time.time()
+
+        self.sequence_table = base_tree.getSequenceTable().forTree(self.root)
+
+        self.build_times['sequences'] = time.time() - phase_start
+        phase_start = time.time()
+
+        # Each node is visited with, for each player, the last (information set, action) of that player on its path
+        # (or None), so that the children information sets and leaves of each information set are found in this pass
+        nodes_to_expand = [ (self.root, (None,) * self.numOfPlayers) ]
 
         while(len(nodes_to_expand) > 0):
-            node = nodes_to_expand.pop()
+            (node, last_actions) = nodes_to_expand.pop()
+            node.sequence_ids = node.base_node.sequence_ids
 
             if(node.isChance()):
                 for child in node.children:
-                    nodes_to_expand.append(child)
+                    nodes_to_expand.append((child, last_actions))
                 continue
 
             iset_id = node.base_node.information_set
             if(iset_id < 0):
                 # This is a leaf (or an error has occurred)
+                for last_action in last_actions:
+                    if(last_action != None):
+                        last_action[0].children_leaves[last_action[1]].append(node)
                 continue
 
-            for child in node.children:
-                nodes_to_expand.append(child)
-                self.numOfActions += 1
-
             if(iset_id in self.information_sets):
-                node.information_set = self.information_sets[iset_id]
-                node.information_set.addNode(node)
+                iset = self.information_sets[iset_id]
+                iset.addNode(node)
             else:
-                iset = CFRInformationSet(iset_id, node.player, len(node.children), node.base_node.getSequence(node.player), self)
+                iset = CFRInformationSet(iset_id, node.player, len(node.children),
+                                         self.sequence_table.getSequence(node, node.player), self)
                 iset.addNode(node)
+                iset.children_infoset = [ {} for a in range(iset.action_count) ]
+                iset.children_leaves = [ [] for a in range(iset.action_count) ]
                 self.information_sets[iset_id] = iset
-                node.information_set = iset
+            node.information_set = iset
 
-        self.infosets_by_player = []
-        for p in range(self.numOfPlayers):
-            p_isets = list(filter(lambda i: i.player == p, self.information_sets.values()))
-            self.infosets_by_player.append(p_isets)
+            parent_action = last_actions[node.player]
+            if(parent_action != None):
+                parent_action[0].children_infoset[parent_action[1]][iset] = None
+
+            for (a, child) in enumerate(node.children):
+                child_last_actions = last_actions[:node.player] + ((iset, a),) + last_actions[node.player + 1:]
+                nodes_to_expand.append((child, child_last_actions))
+                self.numOfActions += 1
+
+        # The children information sets were collected in dictionaries (to keep each one once, in order)
+        for iset in self.information_sets.values():
+            iset.children_infoset = [ list(children) for children in iset.children_infoset ]
+
+        self.build_times['information_sets'] = time.time() - phase_start
+        phase_start = time.time()
+
+        # Assign a dense index to each information set (used by the array-based representations of the tree)
+        for (index, iset) in enumerate(self.information_sets.values()):
+            iset.index = index
+        self.infoset_ids_by_index = list(self.information_sets.keys())
+
+        # Smallest signed integer type able to hold the actions of any information set (see CFRJointStrategy)
+        max_action_count = max([iset.action_count for iset in self.information_sets.values()], default = 0)
+        self.action_plan_typecode = 'b' if max_action_count <= 127 else ('h' if max_action_count <= 32767 else 'i')
+
+        self.infosets_by_player = [ [] for p in range(self.numOfPlayers) ]
+        for iset in self.information_sets.values():
+            self.infosets_by_player[iset.player].append(iset)
 
         for iset in self.information_sets.values():
-            seq = iset.sequence
+            sequence_id = self.sequence_table.getSequenceId(iset.nodes[0], iset.player)
 
             for n in iset.nodes:
-                if(n.base_node.getSequence(iset.player) != seq):
+                if(self.sequence_table.getSequenceId(n, iset.player) != sequence_id):
                     print("Sequences = ")
                     for node in iset.nodes:
-                        print(node.base_node.getSequence(iset.player))
+                        print(self.sequence_table.getSequence(node, iset.player))
                     raise Exception("ERROR: This tree is not a game with perfect recall. Nodes of information set "
-                                    + str(iset.id) + " (" + reduce(lambda acc, el: str(el.base_node.id) + ', ' + acc, iset.nodes, "") + \
+                                    + str(iset.id) + " (" + reduce(lambda acc, el: str(el.id) + ', ' + acc, iset.nodes, "") + \
                                     ") have different sequences.")
 
-            # Setup children leaves and children infosets for this information set
-            iset.children_infoset = []
-            iset.children_leaves = []
-            for a in range(iset.action_count):
-                iset.children_infoset.append(list(iset.getChildrenInformationSets(a)))
-                iset.children_leaves.append(list(iset.getChildrenLeaves(a)))
+        self.build_times['tables'] = time.time() - phase_start
+
+        self.leaves_count = None
+        self.plan_reconstructions = None
+        self.best_response = None
+        self.plan_reduction = None
+
+        if(release_base_tree):
+            self.releaseBaseTree()
+
+    def releaseBaseTree(self):
+        """
+        Drop the references of the nodes to their base Node. Everything the CFR code needs (ids, players, utilities,
+        chance distributions and sequences) is held by the nodes of this tree, while the action names and the other
+        data of the base Tree are not available anymore (e.g. in CFRNode.getLeafDistribution).
+        """
+
+        nodes_to_visit = [ self.root ]
+
+        while(len(nodes_to_visit) > 0):
+            node = nodes_to_visit.pop()
+            node.base_node = None
+            nodes_to_visit.extend(node.children)
+
+    def getBestResponse(self):
+        """
+        Get the BestResponse evaluator of the tree (built on the first call).
+        """
+
+        if self.best_response == None:
+            self.best_response = BestResponse(self)
+        return self.best_response
+
+    def getPlanReduction(self):
+        """
+        Get the ActionPlanReduction structure of the tree (built on the first call).
+        """
+
+        if self.plan_reduction == None:
+            self.plan_reduction = ActionPlanReduction(self)
+        return self.plan_reduction
+
+    def getLeavesCount(self):
+        """
+        Get the number of leaves of the tree.
+        """
+
+        if self.leaves_count == None:
+            leaves = set()
+            self.root.find_terminals(leaves)
+            self.leaves_count = len(leaves)
+        return self.leaves_count
 
     def sampleActionPlan(self):
         """
@@ -87,32 +183,46 @@ class CFRTree:
         Get the utility obtained by the players when playing a given joint strategy over this tree.
         """
 
+        if(joint.evaluation != None):
+            return joint.evaluation.getUtility(joint.frequencyCount)
+
         utility = [0] * self.numOfPlayers
 
-        for actionPlanString in joint.plans:
-            actionPlan = CFRJointStrategy.stringToActionPlan(actionPlanString)
-            frequency = joint.plans[actionPlanString] / joint.frequencyCount
+        for (actionPlan, weight) in joint.getActionPlans():
+            frequency = weight / joint.frequencyCount
 
             leafUtility = self.root.utilityFromActionPlan(actionPlan, default = [0] * self.numOfPlayers)
             for i in range(len(utility)):
                 utility[i] += leafUtility[i] * frequency
 
+        for (weight, playerDistributions) in joint.product_components:
+            componentUtility = self.root.getExpectedUtility(self.getProductStrategies(playerDistributions))
+            for i in range(len(utility)):
+                utility[i] += componentUtility[i] * weight / joint.frequencyCount
+
         return utility
 
     def checkEquilibrium(self, joint):
 
+        if(joint.evaluation != None):
+            return joint.evaluation.checkEquilibrium(joint.frequencyCount)
+
         epsilons = self.getUtility(joint)
 
+        # Decode the plans once for all the players
+        action_plans = list(joint.getActionPlans())
+
         for p in range(self.numOfPlayers):
             self.root.clearMarginalizedUtility()
 
-            for (actionPlanString, frequency) in joint.plans.items():
-                self.root.marginalizePlayer(CFRJointStrategy.stringToActionPlan(actionPlanString),
-                                            frequency / joint.frequencyCount, p)
+            for (actionPlan, frequency) in action_plans:
+                self.root.marginalizePlayer(actionPlan, frequency / joint.frequencyCount, p)
 
-            root_infosets = list(filter(lambda i: i.sequence == {}, self.infosets_by_player[p]))
+            for (weight, playerDistributions) in joint.product_components:
+                self.root.marginalizePlayerFromBehaviourals(weight / joint.frequencyCount, p,
+                                                            self.getProductStrategies(playerDistributions))
 
-            epsilons[p] -= sum(map(lambda i: i.V(), root_infosets))
+            epsilons[p] -= self.getBestResponse().value(p)
 
         return epsilons
 
@@ -124,62 +234,17 @@ class CFRTree:
             self.root.clearMarginalizedUtility()
             self.root.marginalizePlayerFromBehaviourals(1, p)
 
-            root_infosets = list(filter(lambda i: i.sequence == {}, self.infosets_by_player[p]))
-
-            epsilons[p] -= sum(map(lambda i: i.V(), root_infosets))
+            epsilons[p] -= self.getBestResponse().value(p)
 
         return epsilons
 
     def buildJointFromMarginals(self, select_optimal_plan = True):
+        """
+        Build a joint distribution over reduced action plans, which is the product of distributions over the plans
+        of each player equivalent to their current marginal strategies (see PlayerPlanReconstruction).
+        """
 
-        leaves = set()
-        self.root.find_terminals(leaves)
-
-        all_players_plan_distributions = []
-
-        for p in range(self.numOfPlayers):
-            self.root.buildRealizationForm(p, 1)
-            player_plan_distribution = []
-
-            nonZeroLeaf = True
-            while nonZeroLeaf:
-                # for l in leaves:
-                #     print((l.id, l.base_node.getSequence(p), l.omega))
-
-                best_plan = None
-                best_plan_value = 0
-                best_plan_leaf = None
-
-                for l in leaves:
-                    if l.omega == 0:
-                        continue
-
-                    (plan, val) = self.builSupportingPlan(l, p)
-                    if val > best_plan_value:
-                        best_plan = plan
-                        best_plan_value = val
-                        best_plan_leaf = l
-
-                        if not select_optimal_plan:
-                            break
-
-                if best_plan == None:
-                    for l in leaves:
-                        print((l.id, l.base_node.getSequence(p), l.omega))
-                    raise Exception("ERROR")
-
-                for t in self.root.terminalsUnderPlan(p, best_plan):
-                    t.omega -= best_plan_value
-
-                nonZeroLeaf = False
-                for l in leaves:
-                    if l.omega > 0.001:
-                        nonZeroLeaf = True
-                        break
-
-                player_plan_distribution.append((best_plan, best_plan_value))
-
-            all_players_plan_distributions.append(player_plan_distribution)
+        all_players_plan_distributions = self.buildFactoredJointFromMarginals(select_optimal_plan)
 
         # Merge plans of all players into a single joint distribution (cross product)
         joint_distribution = all_players_plan_distributions[0]
@@ -201,6 +266,42 @@ class CFRTree:
 
         return reduced_joint_distribution
 
+    def buildFactoredJointFromMarginals(self, select_optimal_plan = True):
+        """
+        Same as buildJointFromMarginals, but the distributions over the reduced plans of each player are returned
+        separately, as a list of (plan, probability) pairs per player, instead of their product (see
+        CFRJointStrategy.addProductDistribution).
+        """
+
+        if self.plan_reconstructions == None:
+            self.plan_reconstructions = [PlayerPlanReconstruction(self, p) for p in range(self.numOfPlayers)]
+
+        return [self.plan_reconstructions[p].reconstruct(select_optimal_plan) for p in range(self.numOfPlayers)]
+
+    def getProductStrategies(self, playerDistributions):
+        """
+        Get the behavioural strategies (as a dictionary from information set id to strategy) equivalent to the
+        product of the given distributions over the reduced plans of each player, normalized to one.
+        Since reduced plans only hold the information sets they reach, the probability of an action in an
+        information set is the probability of the plans choosing it, over that of the plans holding the information
+        set. Information sets not reached by any plan get a strategy of zeros.
+        """
+
+        realization = { id: [0] * iset.action_count for (id, iset) in self.information_sets.items() }
+
+        for distribution in playerDistributions:
+            for (plan, prob) in distribution:
+                for (id, action) in plan.items():
+                    realization[id][action] += prob
+
+        for r in realization.values():
+            norm = sum(r)
+            if norm > 0:
+                for a in range(len(r)):
+                    r[a] /= norm
+
+        return realization
+
     def buildJointFromMarginals_AllPlayersTogether(self):
 
         leaves = set()
@@ -229,7 +330,7 @@ class CFRTree:
 
             if best_plan == None:
                 for l in leaves:
-                    print((l.id, l.base_node.getSequence(None), l.omega))
+                    print((l.id, self.sequence_table.getSequence(l, None), l.omega))
                 raise Exception("ERROR")
 
             for t in self.root.terminalsUnderPlan(None, best_plan):
@@ -256,7 +357,7 @@ class CFRTree:
         for iset in player_infosets:
             iset.supportingPlanInfo = None   
 
-        plan = leaf.base_node.getSequence(targetPlayer)
+        plan = self.sequence_table.getSequence(leaf, targetPlayer)
         weight = leaf.omega
 
         for (iset_id, action) in plan.items():
@@ -272,15 +373,53 @@ class CFRTree:
 
         return (plan, weight)
 
+    def computeSubtreeUtilityBounds(self):
+        """
+        Store in each node (as max_utility and min_utility) the maximum and minimum utility that each player
+        can get in the subtree rooted at that node.
+        """
+
+        for node in reversed(self.root.iterativeSubtree()):
+            if node.isLeaf():
+                node.max_utility = node.utility
+                node.min_utility = node.utility
+            else:
+                node.max_utility = [max(child.max_utility[p] for child in node.children) for p in range(self.numOfPlayers)]
+                node.min_utility = [min(child.min_utility[p] for child in node.children) for p in range(self.numOfPlayers)]
+
 class CFRNode:
     """
     Wrapper around an extensive-form node for holding additional CFR-related code and data.
     """
 
+    __slots__ = ('id', 'parent', 'player', 'children', 'incoming_action', 'visits', 'base_node', 'is_leaf', 'utility',
+                 'information_set', 'sequence_ids', 'joint_sequence_id', 'marginalized_utility', 'omega',
+                 'max_utility', 'min_utility')
+
     def __init__(self, base_node, parent = None):
         """
         Create a CFRNode starting from a base Node.
-        It recursively creates also all the CFRNodes from the children of the base Node, up to the leaves.
+        It creates also all the CFRNodes from the descendants of the base Node, up to the leaves.
+        """
+
+        self.setupFromBaseNode(base_node, parent)
+
+        # Descendants are created with an explicit stack, so that trees of any depth can be wrapped
+        nodes_to_expand = [ self ]
+
+        while(len(nodes_to_expand) > 0):
+            node = nodes_to_expand.pop()
+
+            for child in node.base_node.children:
+                node_class = CFRChanceNode if child.isChance() else CFRNode
+                n = node_class.__new__(node_class)
+                n.setupFromBaseNode(child, node)
+                node.children.append(n)
+                nodes_to_expand.append(n)
+
+    def setupFromBaseNode(self, base_node, parent):
+        """
+        Initialize the data of this node (but not its children) from a base Node.
         """
 
         self.id = base_node.id
@@ -289,14 +428,10 @@ class CFRNode:
         self.children = []
         self.incoming_action = base_node.incoming_action
 
-        for child in base_node.children:
-            n = CFRChanceNode(child, self) if child.isChance() else CFRNode(child, self)
-            self.children.append(n)
-
         self.visits = 0
         self.base_node = base_node
 
-        self.is_leaf = len(self.children) == 0
+        self.is_leaf = len(base_node.children) == 0
 
         if(self.isLeaf()):
             self.utility = base_node.utility
@@ -320,7 +455,8 @@ class CFRNode:
         """
 
         if(self.isLeaf()):
-            return str(self.visits / norm_factor) + ":" + str(self.base_node) + "\n"
+            description = str(self.base_node) if self.base_node != None else "Leaf" + str(self.id) + " - utility is " + str(self.utility)
+            return str(self.visits / norm_factor) + ":" + description + "\n"
         else:
             return reduce(lambda x, y: x + y,
                           map(lambda i: i.getLeafDistribution(norm_factor), self.children))
@@ -331,12 +467,17 @@ class CFRNode:
         If no leaf is reached, return the default value.
         """
 
+        if useIterativeTraversals():
+            return self.iterativeUtilityFromActionPlan(actionPlan, default)
+        return self.recursiveUtilityFromActionPlan(actionPlan, default)
+
+    def recursiveUtilityFromActionPlan(self, actionPlan, default = None):
         if(self.isLeaf()):
             return self.utility
         elif(self.information_set.id not in actionPlan):
             return default
         else:
-            return self.children[actionPlan[self.information_set.id]].utilityFromActionPlan(actionPlan, default)
+            return self.children[actionPlan[self.information_set.id]].recursiveUtilityFromActionPlan(actionPlan, default)
 
     def utilityFromJointSequence(self, js):
         """
@@ -354,11 +495,16 @@ class CFRNode:
             return self.children[new_action].utilityFromJointSequence(js)
 
     def find_terminals(self, terminals):
+        if useIterativeTraversals():
+            return self.iterativeFindTerminals(terminals)
+        return self.recursiveFindTerminals(terminals)
+
+    def recursiveFindTerminals(self, terminals):
         if(self.isLeaf()):
             terminals.add(self)
         else:
             for child in self.children:
-                child.find_terminals(terminals)
+                child.recursiveFindTerminals(terminals)
 
     def reachableTerminals(self, js):
         """
@@ -423,20 +569,30 @@ class CFRNode:
         equivalent to the current marginal strategy of targetPlayer.
         """
 
+        if useIterativeTraversals():
+            return self.iterativeBuildRealizationForm(targetPlayer, p)
+        return self.recursiveBuildRealizationForm(targetPlayer, p)
+
+    def recursiveBuildRealizationForm(self, targetPlayer, p):
         if self.isLeaf():
             self.omega = p
             return
 
         if self.player != targetPlayer and targetPlayer != None:
             for node in self.children:
-                node.buildRealizationForm(targetPlayer, p)
+                node.recursiveBuildRealizationForm(targetPlayer, p)
             return
 
         for a in range(len(self.children)):
             a_prob = self.information_set.current_strategy[a]
-            self.children[a].buildRealizationForm(targetPlayer, p * a_prob)
+            self.children[a].recursiveBuildRealizationForm(targetPlayer, p * a_prob)
 
     def terminalsUnderPlan(self, targetPlayer, plan):
+        if useIterativeTraversals():
+            return self.iterativeTerminalsUnderPlan(targetPlayer, plan)
+        return self.recursiveTerminalsUnderPlan(targetPlayer, plan)
+
+    def recursiveTerminalsUnderPlan(self, targetPlayer, plan):
         if self.isLeaf():
             return [ self ]
 
@@ -444,10 +600,10 @@ class CFRNode:
 
         if targetPlayer == None or self.player == targetPlayer:
             action = plan[self.information_set.id]
-            terminals = self.children[action].terminalsUnderPlan(targetPlayer, plan)
+            terminals = self.children[action].recursiveTerminalsUnderPlan(targetPlayer, plan)
         else:
             for node in self.children:
-                terminals += node.terminalsUnderPlan(targetPlayer, plan)
+                terminals += node.recursiveTerminalsUnderPlan(targetPlayer, plan)
 
         return terminals
 
@@ -474,11 +630,16 @@ class CFRNode:
         Clear the marginalized utility in the leaves.
         """
 
+        if useIterativeTraversals():
+            return self.iterativeClearMarginalizedUtility()
+        return self.recursiveClearMarginalizedUtility()
+
+    def recursiveClearMarginalizedUtility(self):
         if self.isLeaf():
             self.marginalized_utility = 0
         else:
             for child in self.children:
-                child.clearMarginalizedUtility()
+                child.recursiveClearMarginalizedUtility()
 
     def marginalizePlayer(self, actionPlan, frequency, marginalized_player):
         """
@@ -486,29 +647,52 @@ class CFRNode:
         of the player to be marginalized (as he is the one for which we are searching a best reponse).
         """
 
+        if useIterativeTraversals():
+            return self.iterativeMarginalizePlayer(actionPlan, frequency, marginalized_player)
+        return self.recursiveMarginalizePlayer(actionPlan, frequency, marginalized_player)
+
+    def recursiveMarginalizePlayer(self, actionPlan, frequency, marginalized_player):
         if self.isLeaf():
             self.marginalized_utility += frequency * self.utility[marginalized_player]
         elif self.player == marginalized_player:
             for child in self.children:
-                child.marginalizePlayer(actionPlan, frequency, marginalized_player)
+                child.recursiveMarginalizePlayer(actionPlan, frequency, marginalized_player)
         else:
-            self.children[actionPlan[self.information_set.id]].marginalizePlayer(actionPlan, frequency, marginalized_player)
+            self.children[actionPlan[self.information_set.id]].recursiveMarginalizePlayer(actionPlan, frequency, marginalized_player)
 
-    def marginalizePlayerFromBehaviourals(self, p, marginalized_player):
+    def marginalizePlayerFromBehaviourals(self, p, marginalized_player, strategies = None):
         """
-        Propagate up to the leaves the current average behavioural strategies, ignoring the actions
-        of the player to be marginalized (as he is the one for which we are searching a best reponse).
+        Propagate up to the leaves the current average behavioural strategies (or the given ones, see
+        getExpectedUtility), ignoring the actions of the player to be marginalized (as he is the one for which we
+        are searching a best reponse).
         """
 
+        if useIterativeTraversals():
+            return self.iterativeMarginalizePlayerFromBehaviourals(p, marginalized_player, strategies)
+        return self.recursiveMarginalizePlayerFromBehaviourals(p, marginalized_player, strategies)
+
+    def recursiveMarginalizePlayerFromBehaviourals(self, p, marginalized_player, strategies = None):
         if self.isLeaf():
             self.marginalized_utility += p * self.utility[marginalized_player]
         elif self.player == marginalized_player:
             for child in self.children:
-                child.marginalizePlayerFromBehaviourals(p, marginalized_player)
+                child.recursiveMarginalizePlayerFromBehaviourals(p, marginalized_player, strategies)
         else:
-            s = self.distribution if self.isChance() else self.information_set.getAverageStrategy()
+            s = self.getBehaviouralStrategy(strategies)
             for a in range(len(self.children)):
-                self.children[a].marginalizePlayerFromBehaviourals(p * s[a], marginalized_player)
+                self.children[a].recursiveMarginalizePlayerFromBehaviourals(p * s[a], marginalized_player, strategies)
+
+    def getBehaviouralStrategy(self, strategies = None):
+        """
+        Get the distribution over the children of this node: the chance distribution, or the current average
+        strategy of its information set, or its strategy in the given strategies (see getExpectedUtility).
+        """
+
+        if self.isChance():
+            return self.distribution
+        if strategies == None:
+            return self.information_set.getAverageStrategy()
+        return strategies[self.information_set.id]
 
     def getChildrenInformationSets(self, action, player):
         """
@@ -516,6 +700,11 @@ class CFRNode:
         by here when the given action was played in the parent information set of the given player.
         """
 
+        if useIterativeTraversals():
+            return self.iterativeGetChildren(action, player)[0]
+        return self.recursiveGetChildrenInformationSets(action, player)
+
+    def recursiveGetChildrenInformationSets(self, action, player):
         if self.isLeaf():
             return set()
 
@@ -523,11 +712,11 @@ class CFRNode:
             return set([self.information_set])
         
         if self.player == player:
-            return self.children[action].getChildrenInformationSets(-1, player)
+            return self.children[action].recursiveGetChildrenInformationSets(-1, player)
         else:
             res = set()
             for child in self.children:
-                res.update(child.getChildrenInformationSets(action, player))
+                res.update(child.recursiveGetChildrenInformationSets(action, player))
             return res
 
     def getChildrenLeaves(self, action, player):
@@ -536,6 +725,11 @@ class CFRNode:
         by here when the given action was played in the parent information set of the given player.
         """
 
+        if useIterativeTraversals():
+            return self.iterativeGetChildren(action, player)[1]
+        return self.recursiveGetChildrenLeaves(action, player)
+
+    def recursiveGetChildrenLeaves(self, action, player):
         if self.isLeaf():
             return set([self])
 
@@ -543,26 +737,32 @@ class CFRNode:
             return set()
 
         if self.player == player:
-            return self.children[action].getChildrenLeaves(-1, player)
+            return self.children[action].recursiveGetChildrenLeaves(-1, player)
         else:
             res = set()
             for child in self.children:
-                res.update(child.getChildrenLeaves(action, player))
+                res.update(child.recursiveGetChildrenLeaves(action, player))
             return res
 
-    def getExpectedUtility(self):
+    def getExpectedUtility(self, strategies = None):
         """
-        Get the expected utility from this node on under the current average behavioural strategies.
+        Get the expected utility from this node on under the current average behavioural strategies, or under the
+        given behavioural strategies (a dictionary from information set id to strategy) if strategies is not None.
         """
 
+        if useIterativeTraversals():
+            return self.iterativeGetExpectedUtility(strategies)
+        return self.recursiveGetExpectedUtility(strategies)
+
+    def recursiveGetExpectedUtility(self, strategies = None):
         if self.isLeaf():
             return self.utility
 
         u = None
-        s = self.distribution if self.isChance() else self.information_set.getAverageStrategy()
+        s = self.getBehaviouralStrategy(strategies)
 
         for a in range(len(self.children)):
-            child_u = self.children[a].getExpectedUtility()
+            child_u = self.children[a].recursiveGetExpectedUtility(strategies)
 
             if u == None:
                 u = [cu * s[a] for cu in child_u]
@@ -572,14 +772,219 @@ class CFRNode:
 
         return u
 
+    # Explicit-stack versions of the traversals above, used when iterative traversals are selected
+    # (see data_structures.trees.setTraversalMode). They handle both decision and chance nodes and
+    # visit the nodes in the same order as the recursive versions.
+
+    def iterativeSubtree(self, follow_children = None):
+        """
+        Returns the nodes of the subtree rooted here, with every node preceding its descendants.
+        follow_children(node) can restrict the children that are visited (by default all are visited).
+        """
+
+        nodes = []
+        nodes_to_visit = [ self ]
+
+        while(len(nodes_to_visit) > 0):
+            node = nodes_to_visit.pop()
+            nodes.append(node)
+            if follow_children == None:
+                nodes_to_visit.extend(node.children)
+            else:
+                nodes_to_visit.extend(follow_children(node))
+
+        return nodes
+
+    def iterativeUtilityFromActionPlan(self, actionPlan, default = None):
+        # Parallel stacks of the chance nodes being visited and of the utilities of their children visited so far.
+        # Decision nodes only lead to the child in the plan, so they are not stacked.
+        nodes = []
+        children_utilities = []
+        node = self
+
+        while True:
+            while not node.is_leaf and not node.isChance() and node.information_set.id in actionPlan:
+                node = node.children[actionPlan[node.information_set.id]]
+
+            if node.isChance():
+                nodes.append(node)
+                children_utilities.append([])
+                node = node.children[0]
+                continue
+
+            u = node.utility if node.is_leaf else default
+
+            # Go up, combining the utilities of the chance nodes whose children have all been visited
+            while len(nodes) > 0:
+                node = nodes[-1]
+                utilities = children_utilities[-1]
+                utilities.append(u)
+                if len(utilities) < len(node.children):
+                    break
+                nodes.pop()
+                children_utilities.pop()
+
+                u = default
+                for i in range(len(node.children)):
+                    childUtility = utilities[i]
+
+                    if(u == default):
+                        u = childUtility.copy()
+                        for p in range(len(childUtility)):
+                            u[p] *= node.distribution[i]
+                    else:
+                        for p in range(len(childUtility)):
+                            u[p] += childUtility[p] * node.distribution[i]
+            else:
+                return u
+
+            node = nodes[-1].children[len(children_utilities[-1])]
+
+    def iterativeFindTerminals(self, terminals):
+        for node in self.iterativeSubtree():
+            if node.isLeaf():
+                terminals.add(node)
+
+    def iterativeBuildRealizationForm(self, targetPlayer, p):
+        # Parallel stacks of nodes and of their realization probabilities, so that no frame is allocated per node
+        nodes_to_visit = [ self ]
+        probabilities = [ p ]
+
+        while(len(nodes_to_visit) > 0):
+            node = nodes_to_visit.pop()
+            p = probabilities.pop()
+
+            if node.isLeaf():
+                node.omega = p
+            elif node.isChance() or (node.player != targetPlayer and targetPlayer != None):
+                nodes_to_visit.extend(node.children)
+                probabilities.extend([p] * len(node.children))
+            else:
+                nodes_to_visit.extend(node.children)
+                probabilities.extend([p * s for s in node.information_set.current_strategy])
+
+    def iterativeTerminalsUnderPlan(self, targetPlayer, plan):
+        def followPlan(node):
+            if node.isLeaf():
+                return []
+            if targetPlayer == None or node.player == targetPlayer:
+                return [ node.children[plan[node.information_set.id]] ]
+            # Reversed, so that the children are popped (and the leaves found) in order
+            return reversed(node.children)
+
+        return [node for node in self.iterativeSubtree(followPlan) if node.isLeaf()]
+
+    def iterativeClearMarginalizedUtility(self):
+        for node in self.iterativeSubtree():
+            if node.isLeaf():
+                node.marginalized_utility = 0
+
+    def iterativeMarginalizePlayer(self, actionPlan, frequency, marginalized_player):
+        # Parallel stacks of nodes and of their frequencies, so that no frame is allocated per node
+        nodes_to_visit = [ self ]
+        frequencies = [ frequency ]
+
+        while(len(nodes_to_visit) > 0):
+            node = nodes_to_visit.pop()
+            frequency = frequencies.pop()
+
+            # The nodes of the other players only lead to the child in the plan, so they are not stacked
+            while not node.is_leaf and not node.isChance() and node.player != marginalized_player:
+                node = node.children[actionPlan[node.information_set.id]]
+
+            if node.is_leaf:
+                node.marginalized_utility += frequency * node.utility[marginalized_player]
+            elif node.isChance():
+                nodes_to_visit.extend(node.children)
+                frequencies.extend([frequency * p for p in node.distribution])
+            else:
+                nodes_to_visit.extend(node.children)
+                frequencies.extend([frequency] * len(node.children))
+
+    def iterativeMarginalizePlayerFromBehaviourals(self, p, marginalized_player, strategies = None):
+        # Parallel stacks of nodes and of their reach probabilities, so that no frame is allocated per node
+        nodes_to_visit = [ self ]
+        probabilities = [ p ]
+
+        while(len(nodes_to_visit) > 0):
+            node = nodes_to_visit.pop()
+            p = probabilities.pop()
+
+            if node.isLeaf():
+                node.marginalized_utility += p * node.utility[marginalized_player]
+            elif node.player == marginalized_player:
+                nodes_to_visit.extend(node.children)
+                probabilities.extend([p] * len(node.children))
+            else:
+                nodes_to_visit.extend(node.children)
+                probabilities.extend([p * s_a for s_a in node.getBehaviouralStrategy(strategies)])
+
+    def iterativeGetChildren(self, action, player):
+        """
+        Returns both the children information sets and the children leaves (see getChildrenInformationSets
+        and getChildrenLeaves) for the given action and player.
+        """
+
+        information_sets = set()
+        leaves = set()
+
+        # Parallel stacks of nodes and of the action still to be followed at a node of the player (-1 once it has
+        # been followed), so that no frame is allocated per node
+        nodes_to_visit = [ self ]
+        actions = [ action ]
+
+        while(len(nodes_to_visit) > 0):
+            node = nodes_to_visit.pop()
+            action = actions.pop()
+
+            if node.isLeaf():
+                leaves.add(node)
+            elif action < 0 and node.player == player:
+                information_sets.add(node.information_set)
+            elif node.player == player:
+                nodes_to_visit.append(node.children[action])
+                actions.append(-1)
+            else:
+                nodes_to_visit.extend(node.children)
+                actions.extend([action] * len(node.children))
+
+        return (information_sets, leaves)
+
+    def iterativeGetExpectedUtility(self, strategies = None):
+        utilities = {}
+
+        for node in reversed(self.iterativeSubtree()):
+            if node.isLeaf():
+                utilities[node] = node.utility
+                continue
+
+            u = None
+            s = node.getBehaviouralStrategy(strategies)
+
+            for a in range(len(node.children)):
+                child_u = utilities.pop(node.children[a])
+
+                if u == None:
+                    u = [cu * s[a] for cu in child_u]
+                else:
+                    for p in range(len(child_u)):
+                        u[p] += child_u[p] * s[a]
+
+            utilities[node] = u
+
+        return utilities[self]
+
 class CFRChanceNode(CFRNode):
     """
     Wrapper around an extensive-form chance node for holding additional CFR-related code and data.
     """
 
-    def __init__(self, base_node, parent = None):
-        CFRNode.__init__(self, base_node, parent)
+    __slots__ = ('distribution',)
+
+    def setupFromBaseNode(self, base_node, parent):
+        CFRNode.setupFromBaseNode(self, base_node, parent)
         self.distribution = base_node.distribution
+        self.information_set = base_node.information_set
 
     def isChance(self):
         return True
@@ -606,16 +1011,16 @@ class CFRChanceNode(CFRNode):
         for a in range(len(self.children)):
             self.children[a].computeReachability(actionPlan, pi)
 
-    def buildRealizationForm(self, targetPlayer, p):
+    def recursiveBuildRealizationForm(self, targetPlayer, p):
         """
         Builds the realization form, i.e. a distribution over the leaves of the tree that is
         equivalent to the current marginal strategy of targetPlayer.
         """
 
         for a in range(len(self.children)):
-            self.children[a].buildRealizationForm(targetPlayer, p)  # Do not factorize chance in
+            self.children[a].recursiveBuildRealizationForm(targetPlayer, p)  # Do not factorize chance in
 
-    def utilityFromActionPlan(self, actionPlan, default = None):
+    def recursiveUtilityFromActionPlan(self, actionPlan, default = None):
         """
         Return the utility from the leaf reached following actionPlan and starting from this node.
         If no leaf is reached, return the default value.
@@ -624,7 +1029,7 @@ class CFRChanceNode(CFRNode):
         u = default
 
         for i in range(len(self.children)):
-            childUtility = self.children[i].utilityFromActionPlan(actionPlan, default)
+            childUtility = self.children[i].recursiveUtilityFromActionPlan(actionPlan, default)
 
             if(u == default):
                 u = childUtility.copy()
@@ -649,9 +1054,9 @@ class CFRChanceNode(CFRNode):
 
         return tuple(expected_utility)
 
-    def find_terminals(self, terminals):
+    def recursiveFindTerminals(self, terminals):
         for child_id in range(len(self.children)):
-            self.children[child_id].find_terminals(terminals)
+            self.children[child_id].recursiveFindTerminals(terminals)
 
     def reachableTerminals(self, js):
         """
@@ -695,28 +1100,33 @@ class CFRChanceNode(CFRNode):
             res = res or child.isActionPlanLeadingToInfoset(actionPlan, targetInfoset)
         return res
 
-    def clearMarginalizedUtility(self):
+    def recursiveClearMarginalizedUtility(self):
         """
         Clear the marginalized utility in the leaves.
         """
 
         for child in self.children:
-            child.clearMarginalizedUtility()
+            child.recursiveClearMarginalizedUtility()
 
-    def marginalizePlayer(self, actionPlan, frequency, marginalized_player):
+    def recursiveMarginalizePlayer(self, actionPlan, frequency, marginalized_player):
         """
         Propagate up to the leaves the frequency of an action plan, ignoring the actions
         of the player to be marginalized (as he is the one for which we are searching a best reponse)
         """
 
         for (p, child) in zip(self.distribution, self.children):
-            child.marginalizePlayer(actionPlan, frequency * p, marginalized_player)
+            child.recursiveMarginalizePlayer(actionPlan, frequency * p, marginalized_player)
 
 class CFRInformationSet:
     """
     Represents an information set and all the code and data related to it when used for the CFR algorithm.
     """
 
+    __slots__ = ('id', 'index', 'player', 'action_count', 'sequence', 'nodes', 'cfr_tree', 'cumulative_regret',
+                 'cumulative_strategy', 'current_strategy', 'cached_V', 'children_infoset', 'children_leaves',
+                 'supportingPlanInfo', 'reachability', 'discount_timestamp', 'pruned_until',
+                 'pruning_recheck_iteration', 'max_regret_growth')
+
     def __init__(self, id, player, action_count, sequence, cfr_tree, random_initial_strategy = False):
         """
         Create an information set with a given id, player, action_count (i.e. number of actions available in its nodes),
@@ -726,6 +1136,7 @@ class CFRInformationSet:
         """
 
         self.id = id
+        self.index = -1 # Dense index, assigned by the CFRTree once all the information sets are known
         self.player = player
         self.action_count = action_count
         self.sequence = sequence
@@ -752,11 +1163,16 @@ class CFRInformationSet:
     def addNode(self, node):
         self.nodes.append(node)
 
-    def updateCurrentStrategy(self):
+    def updateCurrentStrategy(self, use_cfr_plus = False):
         """
         Recalculate the current strategy based on the cumulative regret.
+        If use_cfr_plus is True, negative cumulative regrets are reset to zero first (regret matching+).
         """
 
+        if(use_cfr_plus):
+            for a in range(0, self.action_count):
+                self.cumulative_regret[a] = max(0, self.cumulative_regret[a])
+
         sum = reduce(lambda x, y: x + max(0, y), self.cumulative_regret, 0)
 
         for a in range(0, self.action_count):
@@ -793,10 +1209,15 @@ class CFRInformationSet:
                 return i
 
     def V(self):
+        if useIterativeTraversals():
+            return self.iterativeV()
+        return self.recursiveV()
+
+    def recursiveV(self):
         v = [0 for a in range(self.action_count)]
 
         for a in range(self.action_count):
-            v[a] += sum(map(lambda i: i.V(), self.children_infoset[a]))
+            v[a] += sum(map(lambda i: i.recursiveV(), self.children_infoset[a]))
             v[a] += sum(map(lambda l: l.marginalized_utility, self.children_leaves[a]))
 
         return max(v)
@@ -843,29 +1264,23 @@ class CFRInformationSet:
         if self.supportingPlanInfo != None:
             return
 
-        action = -1
+        if useIterativeTraversals():
+            return self.iterativeUpdateSupportingPlan(targetPlayer)
+        return self.recursiveUpdateSupportingPlan(targetPlayer)
 
-        for a in range(self.action_count):
+    def recursiveUpdateSupportingPlan(self, targetPlayer):
+        if self.supportingPlanInfo != None:
+            return
 
-            if targetPlayer != None:
-                children_infosets = self.children_infoset[a]
-                children_leaves = self.children_leaves[a]
-            else:
-                children_infosets = set()
-                children_leaves = []
+        action = -1
 
-                for node in self.nodes:
-                    child = node.children[a]
-                    if child.isLeaf():
-                        children_leaves.append(child)
-                    else:
-                        children_infosets.add(child.information_set)
+        for a in range(self.action_count):
 
-                children_infosets = list(children_infosets)
+            (children_infosets, children_leaves) = self.getSupportingPlanChildren(targetPlayer, a)
 
             a_omega = 1
             for iset in children_infosets:
-                iset.updateSupportingPlan(targetPlayer)
+                iset.recursiveUpdateSupportingPlan(targetPlayer)
                 (_, w) = iset.supportingPlanInfo
                 a_omega = min(a_omega, w)
             for leaf in children_leaves:
@@ -879,52 +1294,204 @@ class CFRInformationSet:
 
     def computeReachability(self, actionPlan):
 
+        if useIterativeTraversals():
+            return self.iterativeComputeReachability(actionPlan)
+        return self.recursiveComputeReachability(actionPlan)
+
+    def recursiveComputeReachability(self, actionPlan):
         self.reachability = 1
         sampled_action = actionPlan[self.id]
 
         for iset in self.children_infoset[sampled_action]:
-            iset.computeReachability(actionPlan)
+            iset.recursiveComputeReachability(actionPlan)
+
+    # Explicit-stack versions of the information set traversals above, used when iterative traversals are selected
+
+    def iterativeV(self):
+        # Information sets in pre-order, so that in reverse each one comes after all of its children
+        infosets = []
+        infosets_to_visit = [ self ]
+
+        while(len(infosets_to_visit) > 0):
+            iset = infosets_to_visit.pop()
+            infosets.append(iset)
+            for a in range(iset.action_count):
+                infosets_to_visit.extend(iset.children_infoset[a])
+
+        values = {}
+
+        for iset in reversed(infosets):
+            v = [0 for a in range(iset.action_count)]
+
+            for a in range(iset.action_count):
+                v[a] += sum(map(lambda i: values[i], iset.children_infoset[a]))
+                v[a] += sum(map(lambda l: l.marginalized_utility, iset.children_leaves[a]))
+
+            values[iset] = max(v)
+
+        return values[self]
+
+    def getSupportingPlanChildren(self, targetPlayer, action):
+        """
+        Get the children information sets and leaves considered by updateSupportingPlan for the given action.
+        """
+
+        if targetPlayer != None:
+            return (self.children_infoset[action], self.children_leaves[action])
+
+        children_infosets = set()
+        children_leaves = []
+
+        for node in self.nodes:
+            child = node.children[action]
+            if child.isLeaf():
+                children_leaves.append(child)
+            else:
+                children_infosets.add(child.information_set)
+
+        return (list(children_infosets), children_leaves)
+
+    def iterativeUpdateSupportingPlan(self, targetPlayer):
+        # Information sets still to be solved in pre-order, so that in reverse each one comes after all of its children
+        infosets = []
+        infosets_to_visit = [ self ]
+
+        while(len(infosets_to_visit) > 0):
+            iset = infosets_to_visit.pop()
+            infosets.append(iset)
+            for a in range(iset.action_count):
+                (children_infosets, _) = iset.getSupportingPlanChildren(targetPlayer, a)
+                infosets_to_visit.extend(filter(lambda i: i.supportingPlanInfo == None, children_infosets))
+
+        for iset in reversed(infosets):
+            if iset.supportingPlanInfo != None:
+                continue
+
+            action = -1
+
+            for a in range(iset.action_count):
+                (children_infosets, children_leaves) = iset.getSupportingPlanChildren(targetPlayer, a)
+
+                a_omega = 1
+                for child in children_infosets:
+                    (_, w) = child.supportingPlanInfo
+                    a_omega = min(a_omega, w)
+                for leaf in children_leaves:
+                    a_omega = min(a_omega, leaf.omega)
+
+                if action == -1 or a_omega > omega:
+                    action = a
+                    omega = a_omega
+
+            iset.supportingPlanInfo = (action, omega)
+
+    def iterativeComputeReachability(self, actionPlan):
+        infosets_to_visit = [ self ]
+
+        while(len(infosets_to_visit) > 0):
+            iset = infosets_to_visit.pop()
+            iset.reachability = 1
+            infosets_to_visit.extend(iset.children_infoset[actionPlan[iset.id]])
 
 class CFRJointStrategy:
     """
     A joint strategy progressively built by the SCFR algorithm.
     """
 
-    def __init__(self, maxPlanCount = -1):
+    def __init__(self, cfr_tree, maxPlanCount = -1, incremental_evaluation = False):
         """
-        Create a joint strategy able to hold a maximum of maxPlanCount plans.
+        Create a joint strategy over the action plans of the given tree, able to hold a maximum of maxPlanCount plans.
         If the value is not given, it is able to hold an arbitrary number of plans.
+        If incremental_evaluation is True, its utility and epsilons are kept up to date as plans are added (see
+        IncrementalJointEvaluation), so that checking them does not depend on the number of plans.
+        Plans are stored (as keys of plans) in a compact form: the bytes of an array holding the action of each
+        information set at its dense index, or -1 for the information sets not in the plan (see encodeActionPlan).
         """
 
+        self.cfr_tree = cfr_tree
         self.maxPlanCount = maxPlanCount
         self.frequencyCount = 0
         self.plans = {}
 
-        CFRJointStrategy.action_plans_cache = {}
+        # When the number of plans is bounded, a min-heap of (frequency, insertion number, plan) entries finds the
+        # plan to evict. Entries are not removed when a plan changes frequency or is evicted: they are just skipped
+        # when they reach the top and no longer match the plan (see evictLeastFrequentPlan).
+        self.plan_heap = []
+        self.plan_insertion_number = {}
+        self.insertions = 0
+
+        # Product-form components, as (weight, list of per-player distributions over reduced plans) pairs
+        self.product_components = []
+
+        self.evaluation = IncrementalJointEvaluation(cfr_tree) if incremental_evaluation else None
 
     def addActionPlan(self, actionPlan, weight = 1):
         """
         Add an action plan (a dictionary from information set id to action) to the joint strategy.
         Optionally a weight can be provided, to insert non-uniformly sampled plans.
+        If the joint strategy is full, the least frequent plan (the first inserted one among those with the same
+        frequency) is removed to make room for a new one.
         """
 
-        string = CFRJointStrategy.actionPlanToString(actionPlan)
+        self.addPlanKey(self.encodeActionPlan(actionPlan), weight, actionPlan)
 
-        if(string in self.plans):
-            self.plans[string] += weight
-            self.frequencyCount += weight
-        elif(self.maxPlanCount == -1 or len(self.plans) < self.maxPlanCount):
-            self.plans[string] = weight
-            self.frequencyCount += weight
-        else:
-            # Remove the least frequent plan
-            plan = min(self.plans, key = lambda p: self.plans[p])
-            self.frequencyCount -= self.plans[plan]
-            del self.plans[plan]
+    def addCompactActionPlan(self, actions, weight = 1):
+        """
+        Add an action plan in compact form (an array with the action of each information set at its dense index, or
+        -1 for the information sets not in the plan, with the type of the tree's action_plan_typecode) to the joint
+        strategy, as addActionPlan.
+        """
+
+        self.addPlanKey(actions.tobytes(), weight)
+
+    def addPlanKey(self, key, weight, actionPlan = None):
+        if(self.evaluation != None):
+            self.evaluation.addActionPlan(actionPlan if actionPlan != None else self.decodeActionPlan(key), weight)
 
-            # Add the new one
-            self.plans[string] = weight
+        if(key in self.plans):
+            self.plans[key] += weight
             self.frequencyCount += weight
+            if(self.maxPlanCount != -1):
+                self.pushPlan(key)
+            return
+
+        if(self.maxPlanCount != -1 and len(self.plans) >= self.maxPlanCount):
+            self.evictLeastFrequentPlan()
+
+        self.plans[key] = weight
+        self.frequencyCount += weight
+        if(self.maxPlanCount != -1):
+            self.plan_insertion_number[key] = self.insertions
+            self.insertions += 1
+            self.pushPlan(key)
+
+    def pushPlan(self, key):
+        """
+        Push the current frequency of a plan on the heap of the plans, rebuilding it when most of its entries are stale.
+        """
+
+        heapq.heappush(self.plan_heap, (self.plans[key], self.plan_insertion_number[key], key))
+
+        if(len(self.plan_heap) > 2 * len(self.plans) + 16):
+            self.plan_heap = [(frequency, self.plan_insertion_number[key], key) for (key, frequency) in self.plans.items()]
+            heapq.heapify(self.plan_heap)
+
+    def evictLeastFrequentPlan(self):
+        """
+        Remove the least frequent plan (the first inserted one among those with the same frequency).
+        """
+
+        while True:
+            (frequency, insertion_number, key) = heapq.heappop(self.plan_heap)
+            if(self.plan_insertion_number.get(key) == insertion_number and self.plans[key] == frequency):
+                break
+
+        self.frequencyCount -= frequency
+        del self.plans[key]
+        del self.plan_insertion_number[key]
+
+        if(self.evaluation != None):
+            self.evaluation.addActionPlan(self.decodeActionPlan(key), -frequency)
 
     def addJointDistribution(self, jointDistribution):
         """
@@ -934,58 +1501,72 @@ class CFRJointStrategy:
         for (plan, prob) in jointDistribution:
             self.addActionPlan(plan, prob)
 
-    def actionPlanToString(actionPlan):
+    def addProductDistribution(self, playerDistributions):
         """
-        Transform an action plan in dictionary representation to the corresponding string representation.
+        Add the product of independent distributions over the (reduced) plans of each player, as a list of
+        (plan, probability) pairs per player, without building the joint plans (see CFRTree.buildFactoredJointFromMarginals).
+        Its weight is the sum of the probabilities of the joint plans of the product.
         """
 
-        string = ""
-
-        for infoset in actionPlan:
-            string += "a" + str(infoset) + "." + str(actionPlan[infoset])
+        weight = 1
+        for distribution in playerDistributions:
+            weight *= sum(prob for (plan, prob) in distribution)
 
-        return string
+        self.product_components.append((weight, playerDistributions))
+        self.frequencyCount += weight
 
-    action_plans_cache = {}
+        if(self.evaluation != None):
+            self.evaluation.addBehaviourals(weight, self.cfr_tree.getProductStrategies(playerDistributions))
 
-    def stringToActionPlan(string):
+    def getSupportSize(self):
         """
-        Transform an action plan in string representation to the corresponding dictionary representation.
+        Get the number of plans in the joint strategy (the plans of the product components are not merged with
+        equal ones).
         """
 
-        if(string in CFRJointStrategy.action_plans_cache):
-            return CFRJointStrategy.action_plans_cache[string]
+        size = len(self.plans)
+        for (weight, playerDistributions) in self.product_components:
+            component_size = 1
+            for distribution in playerDistributions:
+                component_size *= len(distribution)
+            size += component_size
+        return size
 
-        actions = string.split("a")[1:]
-        actionPlan = {}
+    def encodeActionPlan(self, actionPlan):
+        """
+        Transform an action plan in dictionary representation to the corresponding compact representation.
+        """
 
-        for a in actions:
-            (infoset, action) = a.split(".")
-            actionPlan[int(infoset)] = int(action)
+        information_sets = self.cfr_tree.information_sets
+        actions = array(self.cfr_tree.action_plan_typecode, [-1]) * len(information_sets)
 
-        CFRJointStrategy.action_plans_cache[string] = actionPlan
+        for (id, action) in actionPlan.items():
+            actions[information_sets[id].index] = action
 
-        return actionPlan
+        return actions.tobytes()
 
-    def reduceActionPlan(actionPlan, tree):
+    def decodeActionPlan(self, key):
         """
-        Transform an action plan into a reduced one, in the given tree.
+        Transform an action plan in compact representation to the corresponding dictionary representation.
         """
 
-        reducedActionPlan = {}
+        actions = memoryview(key).cast(self.cfr_tree.action_plan_typecode)
 
-        for iset in tree.information_sets.values():
-            iset.reachability = 0
+        # Pairs (id, action) of the information sets whose action is not negative
+        return dict(compress(zip(self.cfr_tree.infoset_ids_by_index, actions), map((0).__le__, actions)))
 
-        #tree.root.computeReachability(actionPlan, [1 for _ in range(tree.numOfPlayers)])
+    def getActionPlans(self):
+        """
+        Iterate over the plans of the joint strategy (not including the product components), as pairs of dictionary
+        representation and frequency. Plans are decoded on the fly, so they are not kept in memory.
+        """
 
-        for iset in tree.information_sets.values():
-            if len(iset.sequence) == 0:
-                iset.computeReachability(actionPlan)
+        for (key, frequency) in self.plans.items():
+            yield (self.decodeActionPlan(key), frequency)
 
-        for (id, iset) in tree.information_sets.items():
-            # reachability = max(map(lambda n: n.reachability, iset.nodes))
-            if(iset.reachability > 0):
-                reducedActionPlan[id] = actionPlan[id]
+    def reduceActionPlan(actionPlan, tree):
+        """
+        Transform an action plan into a reduced one, in the given tree (see ActionPlanReduction).
+        """
 
-        return reducedActionPlan
+        return tree.getPlanReduction().reduceActionPlan(actionPlan)
@@ -0,0 +1,148 @@
+from enum import IntEnum
+from data_structures.cfr_trees import CFRTree
+import numpy as np
+
+class NodeType(IntEnum):
+    Decision = 0
+    Chance = 1
+    Leaf = 2
+
+class CompiledCFRTree:
+    """
+    Array-backed representation of a CFRTree.
+    Nodes are stored in breadth-first order, so that all the nodes at a given depth are contiguous and all the
+    children of a node are contiguous as well. Information sets are identified by their dense index.
+    Every attribute or method which is not defined here is looked up in the underlying CFRTree, so that a
+    CompiledCFRTree can be passed to any solver expecting a CFRTree.
+    """
+
+    def __init__(self, tree):
+        """
+        Create a CompiledCFRTree starting from a CFRTree (or from a base Tree, in which case the CFRTree is built first).
+        """
+
+        if not isinstance(tree, CFRTree):
+            tree = CFRTree(tree)
+
+        self.cfr_tree = tree
+        self.numOfPlayers = tree.numOfPlayers
+
+        # Information set tables
+        self.infosets = sorted(tree.information_sets.values(), key = lambda i: i.index)
+        self.num_infosets = len(self.infosets)
+        self.infoset_player = np.array([i.player for i in self.infosets], dtype = np.int32)
+        self.infoset_action_count = np.array([i.action_count for i in self.infosets], dtype = np.int32)
+        self.infoset_action_offset = np.zeros(self.num_infosets + 1, dtype = np.int64)
+        np.cumsum(self.infoset_action_count, out = self.infoset_action_offset[1:])
+        self.num_infoset_actions = int(self.infoset_action_offset[-1])
+
+        # Visit the tree in breadth-first order
+        nodes = [ tree.root ]
+        parents = [ -1 ]
+        i = 0
+        while i < len(nodes):
+            node = nodes[i]
+            for child in node.children:
+                nodes.append(child)
+                parents.append(i)
+            i += 1
+
+        self.num_nodes = len(nodes)
+        self.node_type = np.empty(self.num_nodes, dtype = np.int8)
+        self.node_player = np.empty(self.num_nodes, dtype = np.int32)
+        self.node_infoset = np.full(self.num_nodes, -1, dtype = np.int32)
+        self.node_parent = np.array(parents, dtype = np.int32)
+        self.node_incoming_action = np.zeros(self.num_nodes, dtype = np.int32)
+        self.node_depth = np.zeros(self.num_nodes, dtype = np.int32)
+        self.node_leaf = np.full(self.num_nodes, -1, dtype = np.int32)
+        self.child_start = np.zeros(self.num_nodes, dtype = np.int32)
+        self.child_count = np.zeros(self.num_nodes, dtype = np.int32)
+        self.chance_probability = np.ones(self.num_nodes, dtype = np.float64)
+
+        utilities = []
+        next_child = 1
+
+        for (n, node) in enumerate(nodes):
+            parent = parents[n]
+            if parent >= 0:
+                self.node_depth[n] = self.node_depth[parent] + 1
+                self.node_incoming_action[n] = n - self.child_start[parent]
+
+            self.child_start[n] = next_child
+            self.child_count[n] = len(node.children)
+            next_child += len(node.children)
+
+            if node.isChance():
+                self.node_type[n] = NodeType.Chance
+                self.node_player[n] = node.player
+                for (c, p) in enumerate(node.distribution):
+                    self.chance_probability[self.child_start[n] + c] = p
+            elif node.isLeaf():
+                self.node_type[n] = NodeType.Leaf
+                self.node_player[n] = node.player
+                self.node_leaf[n] = len(utilities)
+                utilities.append(node.utility)
+            else:
+                self.node_type[n] = NodeType.Decision
+                self.node_player[n] = node.player
+                self.node_infoset[n] = node.information_set.index
+
+        self.num_leaves = len(utilities)
+        self.utility = np.array(utilities, dtype = np.float64).reshape(self.num_leaves, self.numOfPlayers)
+
+        # Nodes are in breadth-first order, so each depth level is a contiguous range [level_start[d], level_start[d+1])
+        self.num_levels = int(self.node_depth[-1]) + 1
+        self.level_start = np.searchsorted(self.node_depth, np.arange(self.num_levels + 1)).astype(np.int64)
+
+    def __getattr__(self, name):
+        # Only called when the attribute is not found on the compiled tree itself
+        if name == 'cfr_tree':
+            raise AttributeError(name)
+        return getattr(self.cfr_tree, name)
+
+    def levelNodes(self, depth):
+        """
+        Get the range of (compiled) node indices at the given depth.
+        """
+
+        return range(self.level_start[depth], self.level_start[depth + 1])
+
+    def getCurrentStrategy(self):
+        """
+        Get the current strategies of all the information sets as a single flat array, indexed by
+        infoset_action_offset[infoset] + action.
+        """
+
+        return np.fromiter((s for iset in self.infosets for s in iset.current_strategy),
+                           dtype = np.float64, count = self.num_infoset_actions)
+
+    def getCumulativeRegret(self):
+        """
+        Get the cumulative regrets of all the information sets as a single flat array.
+        """
+
+        return np.fromiter((r for iset in self.infosets for r in iset.cumulative_regret),
+                           dtype = np.float64, count = self.num_infoset_actions)
+
+    def getCumulativeStrategy(self):
+        """
+        Get the cumulative strategies of all the information sets as a single flat array.
+        """
+
+        return np.fromiter((s for iset in self.infosets for s in iset.cumulative_strategy),
+                           dtype = np.float64, count = self.num_infoset_actions)
+
+    def setInfosetTables(self, cumulative_regret = None, cumulative_strategy = None, current_strategy = None):
+        """
+        Write back flat arrays (in the same layout returned by getCurrentStrategy) into the information sets.
+        """
+
+        for iset in self.infosets:
+            start = self.infoset_action_offset[iset.index]
+            end = self.infoset_action_offset[iset.index + 1]
+            if cumulative_regret is not None:
+                iset.cumulative_regret = cumulative_regret[start:end].tolist()
+            if cumulative_strategy is not None:
+                iset.cumulative_strategy = cumulative_strategy[start:end].tolist()
+            if current_strategy is not None:
+                iset.current_strategy = current_strategy[start:end].tolist()
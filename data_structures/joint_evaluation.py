@@ -0,0 +1,99 @@
+class IncrementalJointEvaluation:
+    """
+    Running evaluation of a CFRJointStrategy, kept up to date as plans are added to it, incremented or evicted.
+    For each player p, each leaf keeps the total frequency (times the chance reach) with which the plans of the joint
+    reach it when p deviates, i.e. the leaf weights of CFRTree.checkEquilibrium before the normalization; the total
+    utility of the joint (before the normalization) is kept in the same way.
+    Checking the equilibrium then only needs a best response pass per player (see BestResponse), instead of a visit of
+    the tree for each plan of the joint and each player.
+    """
+
+    def __init__(self, cfr_tree):
+        self.cfr_tree = cfr_tree
+
+        self.utility = [0] * cfr_tree.numOfPlayers
+        self.marginalized_weights = [ {} for p in range(cfr_tree.numOfPlayers) ]
+
+    def addActionPlan(self, actionPlan, weight):
+        """
+        Account for an action plan (a dictionary from information set id to action) added to the joint with the given
+        weight (a negative weight removes it).
+        """
+
+        self.addLeafWeights(weight, actionPlan = actionPlan)
+
+    def addBehaviourals(self, weight, strategies):
+        """
+        Account for the behavioural strategies (a dictionary from information set id to strategy, see
+        CFRNode.getExpectedUtility) added to the joint with the given weight.
+        """
+
+        self.addLeafWeights(weight, strategies = strategies)
+
+    def addLeafWeights(self, weight, actionPlan = None, strategies = None):
+        for (leaf, reach) in self.reachedLeaves(None, actionPlan, strategies):
+            for i in range(len(self.utility)):
+                self.utility[i] += weight * reach * leaf.utility[i]
+
+        for p in range(len(self.marginalized_weights)):
+            weights = self.marginalized_weights[p]
+            for (leaf, reach) in self.reachedLeaves(p, actionPlan, strategies):
+                weights[leaf] = weights.get(leaf, 0) + weight * reach
+
+    def reachedLeaves(self, marginalized_player, actionPlan = None, strategies = None):
+        """
+        Get the (leaf, reach probability) pairs of the leaves reached following the given action plan (or the given
+        behavioural strategies) and the chance distributions, with all the actions of the marginalized player (if it is
+        not None) being followed.
+        """
+
+        leaves = []
+        nodes_to_visit = [ (self.cfr_tree.root, 1) ]
+
+        while(len(nodes_to_visit) > 0):
+            (node, reach) = nodes_to_visit.pop()
+
+            if node.isLeaf():
+                leaves.append((node, reach))
+            elif node.isChance():
+                for (p, child) in zip(node.distribution, node.children):
+                    nodes_to_visit.append((child, reach * p))
+            elif node.player == marginalized_player:
+                for child in node.children:
+                    nodes_to_visit.append((child, reach))
+            elif actionPlan != None:
+                if node.information_set.id in actionPlan:
+                    nodes_to_visit.append((node.children[actionPlan[node.information_set.id]], reach))
+            else:
+                s = node.getBehaviouralStrategy(strategies)
+                for a in range(len(node.children)):
+                    if s[a] > 0:
+                        nodes_to_visit.append((node.children[a], reach * s[a]))
+
+        return leaves
+
+    def getUtility(self, frequencyCount):
+        """
+        Get the utility of the players under the joint, whose total frequency is frequencyCount.
+        """
+
+        return [ u / frequencyCount for u in self.utility ]
+
+    def checkEquilibrium(self, frequencyCount):
+        """
+        Get the epsilons of the joint (see CFRTree.checkEquilibrium), whose total frequency is frequencyCount.
+        """
+
+        epsilons = self.getUtility(frequencyCount)
+        best_response = self.cfr_tree.getBestResponse()
+
+        for p in range(len(epsilons)):
+            leaf_values = best_response.newLeafValues()
+
+            for (leaf, weight) in self.marginalized_weights[p].items():
+                if leaf in best_response.leaf_index:
+                    leaf_values[best_response.leaf_index[leaf]] = weight / frequencyCount * leaf.utility[p]
+
+            epsilons[p] -= best_response.value(p, leaf_values)
+
+        return epsilons
@@ -0,0 +1,76 @@
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+class ActionPlanReduction:
+    """
+    Precomputed structure to reduce action plans (see CFRJointStrategy.reduceActionPlan) on a CFRTree.
+    Each information set has a parent, i.e. the last information set of its player on its sequence, and the action
+    played there (or no parent, for the root information sets of each player); an information set is reached by a
+    plan if it has no parent, or if its parent is reached and the plan plays the action leading to it there.
+    Information sets are grouped by the length of their sequence, so that each group only depends on the previous one:
+    plans in compact form (see CFRJointStrategy), alone or in batches, are reduced with one array operation per group.
+    """
+
+    def __init__(self, cfr_tree):
+        self.cfr_tree = cfr_tree
+
+        infosets = sorted(cfr_tree.information_sets.values(), key = lambda i: i.index)
+        self.ids = [iset.id for iset in infosets]
+
+        self.parent_index = [-1] * len(infosets)
+        self.parent_action = [-1] * len(infosets)
+        for iset in infosets:
+            for a in range(iset.action_count):
+                for child in iset.children_infoset[a]:
+                    self.parent_index[child.index] = iset.index
+                    self.parent_action[child.index] = a
+
+        level_count = 1 + max([len(iset.sequence) for iset in infosets], default = -1)
+        self.levels = [[] for l in range(level_count)]
+        for iset in infosets:
+            self.levels[len(iset.sequence)].append(iset.index)
+
+        # Dense indices in an order where each information set comes after its parent
+        self.order = [i for level in self.levels for i in level]
+
+        if np != None:
+            self.dtype = np.dtype(cfr_tree.action_plan_typecode)
+            self.level_indices = [np.array(level, dtype = np.int64) for level in self.levels]
+            self.level_parents = [np.array([self.parent_index[i] for i in level], dtype = np.int64) for level in self.levels]
+            self.level_actions = [np.array([self.parent_action[i] for i in level], dtype = self.dtype) for level in self.levels]
+
+    def reduceActionPlan(self, actionPlan):
+        """
+        Reduce an action plan in dictionary representation. Only the actions of the reached information sets are
+        needed, and the reduced plan lists them in the order of the information sets of the tree.
+        """
+
+        reached = [False] * len(self.ids)
+
+        for i in self.order:
+            parent = self.parent_index[i]
+            if(parent < 0 or (reached[parent] and actionPlan[self.ids[parent]] == self.parent_action[i])):
+                reached[i] = True
+
+        return { self.ids[i]: actionPlan[self.ids[i]] for i in range(len(self.ids)) if reached[i] }
+
+    def reduce(self, actions):
+        """
+        Reduce plans in compact form, given as an array of actions by dense index (or a batch of them, one per row).
+        The action of the information sets not reached by a plan is set to -1.
+        """
+
+        actions = np.asarray(actions, dtype = self.dtype)
+        reached = np.zeros(actions.shape, dtype = bool)
+
+        # The information sets with an empty sequence are the ones without a parent
+        if len(self.levels) > 0:
+            reached[..., self.level_indices[0]] = True
+
+        for l in range(1, len(self.levels)):
+            parents = self.level_parents[l]
+            reached[..., self.level_indices[l]] = reached[..., parents] & (actions[..., parents] == self.level_actions[l])
+
+        return np.where(reached, actions, np.array(-1, dtype = self.dtype))
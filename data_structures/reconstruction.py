@@ -0,0 +1,227 @@
+class PlayerPlanReconstruction:
+    """
+    Decomposition of the marginal strategy of a player into a distribution over its (reduced) action plans, as done
+    by CFRTree.buildJointFromMarginals.
+    The omega of a leaf is the probability of the sequence of the player leading to it, so it is the same for all the
+    leaves under the same sequence and it is kept once per sequence. Each information set I keeps, for each action a,
+    the minimum omega under a (the minimum among the omegas of its leaves under a and the values of its children
+    information sets under a) and its value, i.e. the maximum of these minimums.
+    The supporting plan of a leaf follows the sequence of the leaf and the action with the maximum value in every
+    other information set, and its value is the minimum among the values of what it reaches outside of the sequence
+    and the omegas under the sequence. After subtracting a plan, only the information sets reached by it need to be
+    updated, so each step costs as much as the size of the plans considered instead of a visit of the whole tree per
+    leaf.
+    As in CFRTree.buildJointFromMarginals, the plan selected at each step is the supporting plan of the first leaf (in
+    the order of the tree) with the maximum value, so ties between plans are broken in the same way.
+    """
+
+    def __init__(self, cfr_tree, player):
+        """
+        Precompute the structure of the information sets of the given player in the given tree.
+        """
+
+        self.player = player
+
+        infosets = cfr_tree.infosets_by_player[player]
+
+        # Information sets sorted so that each one comes after its parent
+        self.ordered_infosets = sorted(infosets, key = lambda i: len(i.sequence))
+        self.root_infosets = list(filter(lambda i: i.sequence == {}, self.ordered_infosets))
+
+        # Parent information set and action of each information set (None for the root ones)
+        self.parent = { iset: None for iset in infosets }
+        for iset in infosets:
+            for a in range(iset.action_count):
+                for child in iset.children_infoset[a]:
+                    self.parent[child] = (iset, a)
+
+        # Sequences of the player leading to the leaves, as (information set, action) pairs, in the order of their
+        # first leaf in the tree (None is the empty sequence, of the leaves reached without any action of the player)
+        self.leaf_sequences = []
+        found_sequences = set()
+        nodes_to_visit = [ (cfr_tree.root, None) ]
+
+        while len(nodes_to_visit) > 0:
+            (node, sequence) = nodes_to_visit.pop()
+            if node.isLeaf():
+                if not sequence in found_sequences:
+                    found_sequences.add(sequence)
+                    self.leaf_sequences.append(sequence)
+            elif node.isChance() or node.player != player:
+                nodes_to_visit.extend((child, sequence) for child in reversed(node.children))
+            else:
+                nodes_to_visit.extend((node.children[a], (node.information_set, a))
+                                      for a in reversed(range(len(node.children))))
+
+        # Whether there are leaves reached without any action of the player (their omega is always 1 at the start)
+        self.has_empty_sequence_leaves = None in found_sequences
+
+    def reconstruct(self, select_optimal_plan = True, threshold = 0.001):
+        """
+        Build the distribution over action plans equivalent to the current strategy of the player, as a list of
+        (plan, probability) pairs. Each plan only contains the information sets it reaches.
+        If select_optimal_plan is False, each plan is the first (in the order of the leaves) supporting plan with a
+        positive value, instead of the first one with the maximum value.
+        Plans are added until the omega of every leaf is not greater than threshold.
+        """
+
+        # Omega of the leaves of each sequence (None if no leaf is under it)
+        self.omega = {}
+        self.empty_sequence_omega = 1 if self.has_empty_sequence_leaves else None
+        self.positive_count = 1 if self.has_empty_sequence_leaves else 0
+
+        reach = {}
+        for iset in self.ordered_infosets:
+            parent = self.parent[iset]
+            reach[iset] = 1 if parent == None else reach[parent[0]] * parent[0].current_strategy[parent[1]]
+
+            self.omega[iset] = [None] * iset.action_count
+            for a in range(iset.action_count):
+                if len(iset.children_leaves[a]) > 0:
+                    self.omega[iset][a] = reach[iset] * iset.current_strategy[a]
+                    if self.omega[iset][a] > threshold:
+                        self.positive_count += 1
+
+        self.action_value = {}
+        self.value = {}
+        self.best_action = {}
+        for iset in reversed(self.ordered_infosets):
+            self.updateInfoset(iset, range(iset.action_count))
+
+        plan_distribution = []
+
+        while self.positive_count > 0:
+            (forced_path, plan_value) = self.firstSupportingPlan(self.optimalPlanValue() if select_optimal_plan else 0)
+
+            if plan_value <= 0:
+                raise Exception("ERROR: no supporting plan with a positive value, but some leaves have omega > " + str(threshold))
+
+            plan_infosets = self.planInfosets(forced_path)
+            plan = { iset.id: action for (iset, action) in plan_infosets }
+
+            # Subtract the plan from all the leaves under it, then update the information sets it reaches
+            if self.empty_sequence_omega != None:
+                self.empty_sequence_omega = self.subtract(self.empty_sequence_omega, plan_value, threshold)
+            for (iset, action) in plan_infosets:
+                if self.omega[iset][action] != None:
+                    self.omega[iset][action] = self.subtract(self.omega[iset][action], plan_value, threshold)
+
+            for (iset, action) in reversed(plan_infosets):
+                self.updateInfoset(iset, [ action ])
+
+            plan_distribution.append((plan, plan_value))
+
+        return plan_distribution
+
+    def subtract(self, omega, value, threshold):
+        new_omega = omega - value
+        if omega > threshold and new_omega <= threshold:
+            self.positive_count -= 1
+        return new_omega
+
+    def actionValue(self, iset, action, excluded_child = None):
+        """
+        Minimum omega under the given action of an information set (ignoring excluded_child).
+        """
+
+        value = 1
+        if self.omega[iset][action] != None:
+            value = min(value, self.omega[iset][action])
+        for child in iset.children_infoset[action]:
+            if child != excluded_child:
+                value = min(value, self.value[child])
+        return value
+
+    def updateInfoset(self, iset, actions):
+        """
+        Recompute the values of the given actions of an information set (whose children are up to date), and then
+        its value and best action (the first one with the maximum value).
+        """
+
+        if not iset in self.action_value:
+            self.action_value[iset] = [0] * iset.action_count
+
+        action_value = self.action_value[iset]
+        for a in actions:
+            action_value[a] = self.actionValue(iset, a)
+
+        best_action = 0
+        for a in range(1, iset.action_count):
+            if action_value[a] > action_value[best_action]:
+                best_action = a
+
+        self.best_action[iset] = best_action
+        self.value[iset] = action_value[best_action]
+
+    def optimalPlanValue(self):
+        value = 1 if self.empty_sequence_omega == None else min(1, self.empty_sequence_omega)
+        for iset in self.root_infosets:
+            value = min(value, self.value[iset])
+        return value
+
+    def firstSupportingPlan(self, min_value):
+        """
+        Find the first sequence (with a non-zero omega, in the order of the leaves) whose supporting plan, i.e. the
+        plan following the sequence and the best actions elsewhere, has a value greater than min_value (or equal to
+        it, if min_value is positive: no plan has a value greater than the optimal one).
+        Returns the actions forced by the sequence and the value of the plan (0 if there is no such sequence).
+        """
+
+        for sequence in self.leaf_sequences:
+            if sequence == None:
+                if self.empty_sequence_omega == 0:
+                    continue
+
+                # The supporting plan of the leaves where the player never plays is the optimal one
+                (forced_path, value) = ({}, self.optimalPlanValue())
+            else:
+                (iset, a) = sequence
+                if self.omega[iset][a] == 0:
+                    continue
+
+                (forced_path, value) = self.supportingPlanValue(iset, a)
+
+            if value > min_value or (min_value > 0 and value == min_value):
+                return (forced_path, value)
+
+        return ({}, 0)
+
+    def supportingPlanValue(self, iset, action):
+        """
+        Get the actions forced by the sequence ending with the given action of an information set, and the value of
+        its supporting plan.
+        """
+
+        forced_path = { iset: action }
+        value = 1 if self.empty_sequence_omega == None else min(1, self.empty_sequence_omega)
+        value = min(value, self.actionValue(iset, action))
+
+        # Go up to the root, taking the minimum with everything the plan reaches outside of the path
+        child = iset
+        while self.parent[child] != None:
+            (parent, parent_action) = self.parent[child]
+            forced_path[parent] = parent_action
+            value = min(value, self.actionValue(parent, parent_action, child))
+            child = parent
+        for root_infoset in self.root_infosets:
+            if root_infoset != child:
+                value = min(value, self.value[root_infoset])
+
+        return (forced_path, value)
+
+    def planInfosets(self, forced_path):
+        """
+        Get the (information set, action) pairs of the plan following forced_path and the best actions elsewhere,
+        for all the information sets reached by the plan, each one after its parent.
+        """
+
+        plan_infosets = []
+        infosets_to_visit = list(reversed(self.root_infosets))
+
+        while len(infosets_to_visit) > 0:
+            iset = infosets_to_visit.pop()
+            action = forced_path[iset] if iset in forced_path else self.best_action[iset]
+            plan_infosets.append((iset, action))
+            infosets_to_visit.extend(iset.children_infoset[action])
+
+        return plan_infosets
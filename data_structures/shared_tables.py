@@ -0,0 +1,107 @@
+from multiprocessing import shared_memory
+import numpy as np
+
+# Per-information set vectors that can be kept in the shared tables
+INFOSET_TABLE_FIELDS = ('cumulative_regret', 'cumulative_strategy', 'current_strategy')
+
+class SharedInformationSetTables:
+    """
+    Storage for the per-information set vectors of a CFRTree (cumulative regrets, cumulative strategies and current
+    strategies) in multiprocessing.shared_memory buffers.
+    Each field is a single flat table of doubles, where the actions of the information set with dense index i are
+    stored contiguously after those of the information sets with a smaller index.
+    Once attached, each information set holds memoryviews into the tables instead of its own lists, so the CFR code
+    keeps working unchanged while other processes (forked after attach, or connected by name) read and update the
+    same memory without any copy.
+    """
+
+    def __init__(self, infosets, fields = INFOSET_TABLE_FIELDS, names = None):
+        """
+        Create the tables for the given information sets (which must have their dense index assigned), initialized
+        with their current values; or, if names (a dict from field to shared memory name) is given, connect to the
+        tables created by another process for the same information sets.
+        """
+
+        self.fields = tuple(fields)
+        self.owner = (names == None)
+
+        self.offsets = [0] * (len(infosets) + 1)
+        for iset in infosets:
+            self.offsets[iset.index + 1] = iset.action_count
+        for i in range(len(infosets)):
+            self.offsets[i + 1] += self.offsets[i]
+        size = max(1, self.offsets[-1]) * 8
+
+        self.blocks = {}
+        self.views = {}
+        self.arrays = {}
+        for field in self.fields:
+            if self.owner:
+                block = shared_memory.SharedMemory(create = True, size = size)
+            else:
+                block = shared_memory.SharedMemory(name = names[field])
+            self.blocks[field] = block
+            self.views[field] = block.buf.cast('d')
+            self.arrays[field] = np.ndarray(self.offsets[-1], dtype = np.float64, buffer = block.buf)
+
+        if self.owner:
+            for field in self.fields:
+                for iset in infosets:
+                    self.arrays[field][self.offsets[iset.index]:self.offsets[iset.index + 1]] = getattr(iset, field)
+
+    def names(self):
+        """
+        Get the names of the shared memory blocks, to connect to the tables from another process.
+        """
+
+        return { field: self.blocks[field].name for field in self.fields }
+
+    def getView(self, field, iset):
+        """
+        Get a memoryview (of doubles) on the given field of an information set.
+        """
+
+        return self.views[field][self.offsets[iset.index]:self.offsets[iset.index + 1]]
+
+    def fill(self, value = 0):
+        """
+        Set all the entries of all the tables to the given value.
+        """
+
+        for field in self.fields:
+            self.arrays[field].fill(value)
+
+    def attach(self, infosets):
+        """
+        Make the given information sets use views into the tables for their vectors.
+        """
+
+        for iset in infosets:
+            for field in self.fields:
+                setattr(iset, field, self.getView(field, iset))
+
+    def detach(self, infosets):
+        """
+        Give back to the given information sets their own lists, holding the current content of the tables.
+        """
+
+        for iset in infosets:
+            for field in self.fields:
+                setattr(iset, field, self.getView(field, iset).tolist())
+
+    def close(self):
+        """
+        Release the tables (and free them, if they were created by this object). All the information sets which are
+        attached must be detached first.
+        """
+
+        self.arrays = {}
+        for view in self.views.values():
+            view.release()
+        self.views = {}
+
+        for block in self.blocks.values():
+            block.close()
+            if self.owner:
+                block.unlink()
+        self.blocks = {}
@@ -1,6 +1,27 @@
 import random
+import copy
+import sys
 from enum import Enum
 
+class TraversalMode(Enum):
+    Recursive = 0
+    Iterative = 1
+
+traversal_mode = TraversalMode.Recursive
+
+def setTraversalMode(mode):
+    """
+    Select globally how the hot traversal routines (CFR, marginalization, reconstruction...) visit the trees.
+    TraversalMode.Recursive uses recursive routines, while TraversalMode.Iterative uses explicit-stack routines,
+    that have no frame allocation per node and handle trees of arbitrary depth.
+    """
+
+    global traversal_mode
+    traversal_mode = mode
+
+def useIterativeTraversals():
+    return traversal_mode == TraversalMode.Iterative
+
 class Tree:
     """
     Tree representation of an extensive-form game.
@@ -20,6 +41,7 @@ class Tree:
         self.max_infoset = 0
         self.numOfPlayers = numOfPlayers
         self.max_depth = 0
+        self.sequence_table = None
         
     def addNode(self, player, information_set = -1, parent = None, probability = -1, actionName = None):
         """
@@ -90,6 +112,15 @@ class Tree:
         
         return chanceNode
     
+    def getSequenceTable(self):
+        """
+        Get the SequenceTable of the tree (built on the first call, so only once the tree is complete).
+        """
+
+        if self.sequence_table == None:
+            self.sequence_table = SequenceTable(self)
+        return self.sequence_table
+
     def display(self):
         print(self.root)
         self.root.displayChildren()
@@ -97,8 +128,12 @@ class Tree:
 class Node:
     """
     Represents a decision node for a given player in an extensive-form tree.
+    Nodes are slotted, and the default action names are only generated when asked for (see getActionName).
     """
 
+    __slots__ = ('id', 'parent', 'player', 'depth', 'children', 'action_names', 'information_set', 'incoming_action',
+                 'sequence_ids', 'joint_sequence_id')
+
     def __init__(self, player, id, information_set, parent = None):
         """
         Create a decision node for a given player, with a given id and a given information set.
@@ -111,10 +146,9 @@ class Node:
         if parent != None:
             self.depth = parent.depth + 1
         self.children = []
-        self.actionNames = []
+        self.action_names = None # Only holds the names given explicitly (None if there are none)
         self.information_set = information_set
         self.incoming_action = None
-        self.incoming_action_name = None
 
     def __str__(self):
         return self.__repr__()
@@ -122,7 +156,7 @@ class Node:
     def __repr__(self):
         s = "Player " + str(self.player) +             " - Infoset " + str(self.information_set) +             " - Node " + str(self.id) 
         if(self.parent != None):
-            s += " (children of Node" + str(self.parent.id) + " via Action " +                    str(self.incoming_action_name) + ")"
+            s += " (children of Node" + str(self.parent.id) + " via Action " +                    str(self.getIncomingActionName()) + ")"
         return s
         
     def addChild(self, child, actionName = None):
@@ -133,11 +167,56 @@ class Node:
 
         self.children.append(child)
         child.parent = self
-        if(actionName == None):
-            actionName = str(self.information_set) + "." + str(len(self.children) - 1)
-        self.actionNames.append(actionName)
         child.incoming_action = len(self.children) - 1
-        child.incoming_action_name = actionName
+        self.setActionName(child.incoming_action, actionName)
+
+    def setActionName(self, action, actionName):
+        if(actionName == None and self.action_names == None):
+            return
+
+        if(self.action_names == None):
+            self.action_names = [None] * len(self.children)
+        while(len(self.action_names) <= action):
+            self.action_names.append(None)
+
+        # Names are interned, since the same ones are usually given to the actions of many nodes
+        self.action_names[action] = sys.intern(actionName) if isinstance(actionName, str) else actionName
+
+    def getDefaultActionName(self, action):
+        return str(self.information_set) + "." + str(action)
+
+    def getActionName(self, action):
+        """
+        Get the name of an action of this node (the given one, or a default one if no name was given).
+        """
+
+        if(self.action_names != None and action < len(self.action_names) and self.action_names[action] != None):
+            return self.action_names[action]
+        return self.getDefaultActionName(action)
+
+    def getActionNames(self):
+        return [self.getActionName(a) for a in range(len(self.children))]
+
+    def getIncomingActionName(self):
+        if(self.parent == None or self.incoming_action == None):
+            return None
+        return self.parent.getActionName(self.incoming_action)
+
+    @property
+    def actionNames(self):
+        """
+        The names of the actions of this node (read only, kept for compatibility: see getActionNames).
+        """
+
+        return self.getActionNames()
+
+    @property
+    def incoming_action_name(self):
+        """
+        The name of the action leading to this node (read only, kept for compatibility: see getIncomingActionName).
+        """
+
+        return self.getIncomingActionName()
             
     def getChild(self, action):
         return self.action_to_child_dict[action]
@@ -153,13 +232,16 @@ class Node:
         Returns the sequence of actions (for a given player) that leads to this node.
         """
 
-        if(self.parent == None):
-            return {}
-        if(self.parent.player != player and player != None):
-            return self.parent.getSequence(player)
-        
-        sequence = self.parent.getSequence(player) 
-        sequence[self.parent.information_set] = self.incoming_action
+        path = []
+        node = self
+        while(node.parent != None):
+            if(node.parent.player == player or player == None):
+                path.append((node.parent.information_set, node.incoming_action))
+            node = node.parent
+
+        sequence = {}
+        for (information_set, action) in reversed(path):
+            sequence[information_set] = action
         return sequence
     
     def displayChildren(self):
@@ -201,6 +283,8 @@ class Leaf(Node):
     Represents a leaf node in an extensive-form tree.
     """
 
+    __slots__ = ('utility',)
+
     def __init__(self, id, utility, parent):
         Node.__init__(self, -1, id, -1 , parent)
         self.utility = utility
@@ -208,7 +292,7 @@ class Leaf(Node):
     def __repr__(self):
         s = "Leaf" + str(self.id) 
         if(self.parent != None):
-            s += " (children of Node" + str(self.parent.id) + " via Action " + str(self.incoming_action_name) + ") - " +                    " utility is " + str(self.utility)
+            s += " (children of Node" + str(self.parent.id) + " via Action " + str(self.getIncomingActionName()) + ") - " +                    " utility is " + str(self.utility)
         return s
     
     def isLeaf(self):
@@ -219,6 +303,8 @@ class ChanceNode(Node):
     Represents a chance node in an extensive-form tree.
     """
 
+    __slots__ = ('distribution',)
+
     def __init__(self, id, parent = None):
         Node.__init__(self, -42, id, -42, parent)
         self.distribution = []
@@ -236,11 +322,127 @@ class ChanceNode(Node):
         self.distribution.append(probability)
         child.parent = self
         child.incoming_action = len(self.children) - 1
-        if(actionName == None):
-            actionName = "c." + str(len(self.children) - 1)
-        self.actionNames.append(actionName)
-        child.incoming_action_name = actionName
+        self.setActionName(child.incoming_action, actionName)
+
+    def getDefaultActionName(self, action):
+        return "c." + str(action)
         
+class SequenceTable:
+    """
+    The sequences of a tree, computed with a single top-down pass (see Node.getSequence).
+    Sequences are interned: each one is stored once, as its parent sequence (the one without its last action), the
+    information set and the action of its last action; the empty sequence has id 0.
+    Each node holds, in sequence_ids, the id of the sequence leading to it for each player. The ids of the sequences
+    of all the players (including chance), i.e. the ones returned by getSequence(None), are only computed (as
+    joint_sequence_id) when first needed.
+    """
+
+    def __init__(self, tree):
+        self.root = tree.root
+        self.numOfPlayers = tree.numOfPlayers
+        self.has_joint_sequences = False
+
+        # (parent sequence, information set, action) of each sequence, and the id of each one of them
+        self.sequences = [ (None, None, None) ]
+        self.sequence_index = {}
+
+        tree.root.sequence_ids = [ 0 ] * tree.numOfPlayers
+        nodes_to_visit = [ tree.root ]
+
+        while(len(nodes_to_visit) > 0):
+            node = nodes_to_visit.pop()
+            nodes_to_visit.extend(node.children)
+
+            if(node.player < 0 or node.player >= self.numOfPlayers):
+                # Chance nodes do not change the sequences of the players (and the lists are never modified)
+                for child in node.children:
+                    child.sequence_ids = node.sequence_ids
+                continue
+
+            parent_sequence = node.sequence_ids[node.player]
+            for (action, child) in enumerate(node.children):
+                child.sequence_ids = list(node.sequence_ids)
+                child.sequence_ids[node.player] = self.intern(parent_sequence, node.information_set, action)
+
+    def buildJointSequences(self):
+        self.root.joint_sequence_id = 0
+        nodes_to_visit = [ self.root ]
+
+        while(len(nodes_to_visit) > 0):
+            node = nodes_to_visit.pop()
+            nodes_to_visit.extend(node.children)
+            if(len(node.children) == 0):
+                continue
+
+            information_set = self.getInformationSetId(node)
+            for (action, child) in enumerate(node.children):
+                child.joint_sequence_id = self.intern(node.joint_sequence_id, information_set, action)
+
+        self.has_joint_sequences = True
+
+    def getInformationSetId(self, node):
+        # The nodes of a CFRTree hold their CFRInformationSet, instead of its id
+        information_set = node.information_set
+        return information_set if isinstance(information_set, int) else information_set.id
+
+    def forTree(self, root):
+        """
+        Get a table for another tree with the same structure as this one (e.g. the CFRTree wrapping it), whose nodes
+        hold the same sequence_ids. The interned sequences are shared, so the ids are the same in both tables.
+        """
+
+        table = copy.copy(self)
+        table.root = root
+        table.has_joint_sequences = False
+        return table
+
+    def intern(self, parent, information_set, action):
+        key = (parent, information_set, action)
+        sequence_id = self.sequence_index.get(key)
+        if sequence_id == None:
+            sequence_id = len(self.sequences)
+            self.sequence_index[key] = sequence_id
+            self.sequences.append(key)
+        return sequence_id
+
+    def getSequenceId(self, node, player):
+        """
+        Get the id of the sequence of the given player (or of all the players, if player is None) leading to a node.
+        """
+
+        if player != None:
+            return node.sequence_ids[player]
+
+        if not self.has_joint_sequences:
+            self.buildJointSequences()
+        return node.joint_sequence_id
+
+    def getSequence(self, node, player):
+        """
+        Same as node.getSequence(player), without visiting the path to the root.
+        """
+
+        return self.sequenceToDict(self.getSequenceId(node, player))
+
+    def sequenceToDict(self, sequence_id):
+        """
+        Get a sequence as a (new) dictionary from information set to action.
+        """
+
+        return dict(self.getSequenceItems(sequence_id))
+
+    def getSequenceItems(self, sequence_id):
+        """
+        Get the (information set, action) pairs of a sequence, from the root.
+        """
+
+        items = []
+        while sequence_id != 0:
+            (sequence_id, information_set, action) = self.sequences[sequence_id]
+            items.append((information_set, action))
+        items.reverse()
+        return items
+
 # --------------------------------------------------------------------------------
 
 class PlayerSwapMethod(Enum):
@@ -44,34 +44,63 @@ def build_goofspiel_tree(num_players, rank, tie_solver = TieSolver.Accumulate):
 def build_goofspiel_hand_tree(hand, remaining_cards, played_cards, current_round, current_player, current_node, tree, tie_solver,
                               information_sets):
     """
-    Recursively build the subtree for the Kuhn game where the hand is fixed.
+    Build the subtree for the Goofspiel game where the hand is fixed.
+    Nodes are expanded depth-first with an explicit stack (instead of recursion), in the same order as a recursive visit.
     """
 
     num_players = tree.numOfPlayers
-    if(current_player == num_players-1):
-        next_player = 0
-        next_round = current_round + 1
-    else:
-        next_player = current_player + 1
-        next_round = current_round
-        
-    current_player_cards = remaining_cards[current_player].copy()
-
-    # Create a leaf as a children of the last effective decision node (there is no decision for players that
-    # have only their last card in hand)
-    if(len(remaining_cards[current_player]) == 2 and len(remaining_cards[next_player]) == 1):
-        for card in current_player_cards:
-            actionName = "p" + str(current_node.player) + "c" + str(card)
-            remaining_cards[current_player].remove(card)
-            played_cards[current_player].append(card)
-            final_played_cards = [played_cards[i] + remaining_cards[i] for i in range(len(played_cards))]
-            l = tree.addLeaf(parent = current_node, utility = goofspiel_utility(hand, final_played_cards, tie_solver),
-                             actionName = actionName)
-            remaining_cards[current_player].append(card)
-            played_cards[current_player].remove(card)
-        return
-
-    for card in current_player_cards:
+
+    # Each frame is [current_round, current_player, current_node, cards to play, index of the next card, card being played]
+    nodes_to_expand = []
+
+    def expand(current_round, current_player, current_node):
+        if(current_player == num_players-1):
+            next_player = 0
+        else:
+            next_player = current_player + 1
+            
+        current_player_cards = remaining_cards[current_player].copy()
+
+        # Create a leaf as a children of the last effective decision node (there is no decision for players that
+        # have only their last card in hand)
+        if(len(remaining_cards[current_player]) == 2 and len(remaining_cards[next_player]) == 1):
+            for card in current_player_cards:
+                actionName = "p" + str(current_node.player) + "c" + str(card)
+                remaining_cards[current_player].remove(card)
+                played_cards[current_player].append(card)
+                final_played_cards = [played_cards[i] + remaining_cards[i] for i in range(len(played_cards))]
+                l = tree.addLeaf(parent = current_node, utility = goofspiel_utility(hand, final_played_cards, tie_solver),
+                                 actionName = actionName)
+                remaining_cards[current_player].append(card)
+                played_cards[current_player].remove(card)
+            return
+
+        nodes_to_expand.append([current_round, current_player, current_node, current_player_cards, 0, None])
+
+    expand(current_round, current_player, current_node)
+
+    while len(nodes_to_expand) > 0:
+        frame = nodes_to_expand[-1]
+        (current_round, current_player, current_node, current_player_cards, card_index, played_card) = frame
+
+        if played_card != None:
+            # The subtree of played_card is complete
+            remaining_cards[current_player].append(played_card)
+            played_cards[current_player].remove(played_card)
+            frame[5] = None
+
+        if card_index == len(current_player_cards):
+            nodes_to_expand.pop()
+            continue
+
+        if(current_player == num_players-1):
+            next_player = 0
+            next_round = current_round + 1
+        else:
+            next_player = current_player + 1
+            next_round = current_round
+
+        card = current_player_cards[card_index]
         actionName = "p" + str(current_node.player) + "c" + str(card)
 
         node_known_info = (next_player, next_round, tuple(hand[:next_round+1]), tuple([tuple(c[:next_round]) for c in played_cards]))
@@ -87,10 +116,9 @@ def build_goofspiel_hand_tree(hand, remaining_cards, played_cards, current_round
 
         remaining_cards[current_player].remove(card)
         played_cards[current_player].append(card)
-        build_goofspiel_hand_tree(hand, remaining_cards, played_cards, next_round, next_player, n, tree, tie_solver,
-                                           information_sets)
-        remaining_cards[current_player].append(card)
-        played_cards[current_player].remove(card)
+        frame[4] = card_index + 1
+        frame[5] = card
+        expand(next_round, next_player, n)
 
 def build_all_possible_hands(num_players, ranks):
     """
@@ -283,10 +283,23 @@ def build_hanabi_tree(num_players, num_colors, color_distribution, num_cards_per
     return tree
 
 def build_hanabi_state_tree(hanabiState, tree, information_sets, parent_node, current_player, utility_splitter):
-    actions = hanabiState.getLegalActions(current_player)
-    next_player = (current_player + 1) % tree.numOfPlayers
+    """
+    Build the subtree of the given state depth-first, using an explicit stack instead of recursion (the depth of
+    Hanabi trees grows with the size of the deck).
+    """
+
+    # Each frame holds a state, its node, the player acting in it and an iterator over the actions still to expand
+    states_to_expand = [ (hanabiState, parent_node, current_player, iter(hanabiState.getLegalActions(current_player))) ]
+
+    while len(states_to_expand) > 0:
+        (hanabiState, parent_node, current_player, actions) = states_to_expand[-1]
+        action = next(actions, None)
+
+        if action == None:
+            states_to_expand.pop()
+            continue
 
-    for action in actions:
+        next_player = (current_player + 1) % tree.numOfPlayers
         childState = hanabiState.getChildState(action)
 
         if type(childState) != HanabiState: # The game has ended, create a leaf
@@ -307,7 +320,7 @@ def build_hanabi_state_tree(hanabiState, tree, information_sets, parent_node, cu
         if information_set == -1:
             information_sets[node_known_infos] = node.information_set
 
-        build_hanabi_state_tree(childState, tree, information_sets, node, next_player, utility_splitter)
+        states_to_expand.append((childState, node, next_player, iter(childState.getLegalActions(next_player))))
 
 def build_hanabi_utility(num_players, utility_splitter, cards_in_play, action_history):
     if utility_splitter == UtilitySplitter.Uniform:
@@ -16,32 +16,31 @@ def build_kuhn_tree(num_players, rank):
         n = tree.addNode(0, parent = root, probability = hand_probability, actionName = str(hand))
         build_kuhn_hand_tree(hand, ['n'] * num_players, 0, n, tree)
         
-    for i in range(len(hands)):
-        for j in range(i+1, len(hands)):
-            players_to_merge = []
-            for p in range(num_players):
-                if(hands[i][p] == hands[j][p]):
-                    players_to_merge.append(p)
-            create_information_sets(root.children[i], root.children[j], players_to_merge)
+    create_information_sets(hands, root.children)
             
     return tree
 
-def create_information_sets(node1, node2, players_to_merge):
+def create_information_sets(hands, hand_nodes):
     """
-    Takes two identically shaped trees (rooted at node1 and node2) and put all the nodes
-    belonging to players in players_to_merge in pairwise information sets.
+    Takes the identically shaped trees of the given hands (rooted at hand_nodes) and put in the same information set
+    all the nodes reached by the same actions whose player has the same card.
+    Nodes are grouped with a single visit of each tree, by the corresponding node in the tree of the first hand and the
+    card of their player; each information set keeps the id of its node in the tree of the first of its hands.
     """
 
-    if(node1.isLeaf()):
-        return
-    
-    if(node1.player in players_to_merge):
-        iset_id = min(node1.information_set, node2.information_set)
-        node1.information_set = iset_id
-        node2.information_set = iset_id
-    
-    for i in range(len(node1.children)):
-        create_information_sets(node1.children[i], node2.children[i], players_to_merge)
+    information_sets = {}
+
+    for (hand, hand_node) in zip(hands, hand_nodes):
+        nodes_to_visit = [ (hand_node, hand_nodes[0]) ]
+
+        while(len(nodes_to_visit) > 0):
+            (node, reference_node) = nodes_to_visit.pop()
+            if(node.isLeaf()):
+                continue
+
+            key = (reference_node.id, hand[node.player])
+            node.information_set = information_sets.setdefault(key, node.information_set)
+            nodes_to_visit.extend(zip(node.children, reference_node.children))
 
 def build_kuhn_hand_tree(hand, previous_moves, current_player, current_node, tree):
     """
@@ -4,6 +4,8 @@ import copy
 def build_leduc_tree(num_players, num_of_suits, num_of_ranks, betting_parameters):
     """
     Build a tree for the game of Leduc with a given number of players, suits, ranks and betting parameters.
+    Deals are enumerated by rank only (see build_all_possible_hands), so there are no subtrees differing only by the
+    suits of the cards.
     """
 
     root = ChanceNode(0)
@@ -14,28 +16,31 @@ def build_leduc_tree(num_players, num_of_suits, num_of_ranks, betting_parameters
     hand_probability = 1 / len(hands)
     all_nodes = []
 
+    # Information available to the player of each node (by node id), only needed to build the information sets
+    known_information = {}
+
     for hand in hands:
         n = tree.addNode(0, parent = root, probability = hand_probability, actionName = str(hand))
         all_nodes.append(n)
         empty_previous_moves = [['n' for _ in range(num_players)], ['n' for _ in range(num_players)]]
-        all_nodes += build_leduc_hand_tree(hand, empty_previous_moves, 0, 0, n, betting_parameters, tree)
+        all_nodes += build_leduc_hand_tree(hand, empty_previous_moves, 0, 0, n, betting_parameters, tree, known_information)
         
     # Merge nodes into infosets based on the available information at each node
-    for i in range(len(hands)):
-        for j in range(i+1, len(hands)):
-            create_information_sets(root.children[i], root.children[j])
+    create_information_sets(root.children, known_information)
             
     return tree
 
-def build_leduc_hand_tree(hand, previous_moves, current_player, current_round, current_node, betting_parameters, tree):
+def build_leduc_hand_tree(hand, previous_moves, current_player, current_round, current_node, betting_parameters, tree,
+                          known_information):
     """
     Recursively build the subtree for the Leduc game where the hand is fixed.
+    The information known by the player of each decision node is stored in known_information, by node id.
     """
 
     if(current_round == 0):
-        current_node.known_information = (hand[current_player], -1)
+        known_information[current_node.id] = (hand[current_player], -1)
     else:
-        current_node.known_information = (hand[current_player], hand[len(hand) - 1])
+        known_information[current_node.id] = (hand[current_player], hand[len(hand) - 1])
 
     actionPrefix = 'p' + str(current_player)
     num_players = len(hand)-1
@@ -65,18 +70,18 @@ def build_leduc_hand_tree(hand, previous_moves, current_player, current_round, c
 
                 previous_moves[0][last_player] = 'b'
                 lastCallNode = tree.addNode(current_player, parent = current_node, actionName = actionPrefix + 'b')
-                lastCallNode.known_information = (hand[current_player], hand[len(hand) - 1])
+                known_information[lastCallNode.id] = (hand[current_player], hand[len(hand) - 1])
                 nodes.append(lastCallNode)
 
                 previous_moves[current_round][current_player] = 'c'  
                 checkNode1 = tree.addNode(next_player, parent = lastCallNode, actionName = actionPrefix + 'c')
                 nodes.append(checkNode1)
-                nodes += build_leduc_hand_tree(hand, copy.deepcopy(previous_moves), next_player, current_round, checkNode1, betting_parameters, tree)
+                nodes += build_leduc_hand_tree(hand, copy.deepcopy(previous_moves), next_player, current_round, checkNode1, betting_parameters, tree, known_information)
 
                 previous_moves[current_round][current_player] = 'b'
                 betNode1 = tree.addNode(next_player, parent = lastCallNode, actionName = actionPrefix + 'b')
                 nodes.append(betNode1)
-                nodes += build_leduc_hand_tree(hand, copy.deepcopy(previous_moves), next_player, current_round, betNode1, betting_parameters, tree)
+                nodes += build_leduc_hand_tree(hand, copy.deepcopy(previous_moves), next_player, current_round, betNode1, betting_parameters, tree, known_information)
 
                 # ---------------------------------------------
                 # CASE 2: the last player of round 1 folds
@@ -96,18 +101,18 @@ def build_leduc_hand_tree(hand, previous_moves, current_player, current_round, c
 
                     previous_moves[0][last_player] = 'f'
                     lastFoldNode = tree.addNode(current_player, parent = current_node, actionName = actionPrefix + 'f')
-                    lastFoldNode.known_information = (hand[current_player], hand[len(hand) - 1])
+                    known_information[lastFoldNode.id] = (hand[current_player], hand[len(hand) - 1])
                     nodes.append(lastFoldNode)
 
                     previous_moves[current_round][current_player] = 'c'
                     checkNode2 = tree.addNode(next_player, parent = lastFoldNode, actionName = actionPrefix + 'c')
                     nodes.append(checkNode2)
-                    nodes += build_leduc_hand_tree(hand, copy.deepcopy(previous_moves), next_player, current_round, checkNode2, betting_parameters, tree)
+                    nodes += build_leduc_hand_tree(hand, copy.deepcopy(previous_moves), next_player, current_round, checkNode2, betting_parameters, tree, known_information)
                     
                     previous_moves[current_round][current_player] = 'b'
                     betNode2 = tree.addNode(next_player, parent = lastFoldNode, actionName = actionPrefix + 'b')
                     nodes.append(betNode2)
-                    nodes += build_leduc_hand_tree(hand, copy.deepcopy(previous_moves), next_player, current_round, betNode2, betting_parameters, tree)
+                    nodes += build_leduc_hand_tree(hand, copy.deepcopy(previous_moves), next_player, current_round, betNode2, betting_parameters, tree, known_information)
 
             else:
                 # We are at the last move of the last round, so generate leaves
@@ -124,12 +129,12 @@ def build_leduc_hand_tree(hand, previous_moves, current_player, current_round, c
         callNode = tree.addNode(next_player, parent = current_node, actionName = actionPrefix + 'b')
         nodes.append(callNode)
         previous_moves[current_round][current_player] = 'b'
-        nodes += build_leduc_hand_tree(hand, copy.deepcopy(previous_moves), next_player, current_round, callNode, betting_parameters, tree)
+        nodes += build_leduc_hand_tree(hand, copy.deepcopy(previous_moves), next_player, current_round, callNode, betting_parameters, tree, known_information)
         
         foldNode = tree.addNode(next_player, parent = current_node, actionName = actionPrefix + 'f')
         nodes.append(foldNode)
         previous_moves[current_round][current_player] = 'f'
-        nodes += build_leduc_hand_tree(hand, copy.deepcopy(previous_moves), next_player, current_round, foldNode, betting_parameters, tree)
+        nodes += build_leduc_hand_tree(hand, copy.deepcopy(previous_moves), next_player, current_round, foldNode, betting_parameters, tree, known_information)
     
     else: # No bet yet, so I can check or bet
         previous_moves[current_round][current_player] = 'c'
@@ -139,7 +144,7 @@ def build_leduc_hand_tree(hand, previous_moves, current_player, current_round, c
             if(current_round == 0):
 
                 lastCheckNode = tree.addNode(0, parent = current_node, actionName = actionPrefix + 'c')
-                lastCheckNode.known_information = (hand[0], hand[len(hand) - 1])
+                known_information[lastCheckNode.id] = (hand[0], hand[len(hand) - 1])
                 nodes.append(lastCheckNode)
 
                 # This is the start of the second betting round, so we restart from the check/bet choice of the first player
@@ -150,12 +155,12 @@ def build_leduc_hand_tree(hand, previous_moves, current_player, current_round, c
                 previous_moves[new_current_round][new_current_player] = 'c'  
                 checkNode = tree.addNode(new_next_player, parent = lastCheckNode, actionName = new_actionPrefix + 'c')
                 nodes.append(checkNode)
-                nodes += build_leduc_hand_tree(hand, copy.deepcopy(previous_moves), new_next_player, new_current_round, checkNode, betting_parameters, tree)
+                nodes += build_leduc_hand_tree(hand, copy.deepcopy(previous_moves), new_next_player, new_current_round, checkNode, betting_parameters, tree, known_information)
                     
                 previous_moves[new_current_round][new_current_player] = 'b'
                 betNode = tree.addNode(new_next_player, parent = lastCheckNode, actionName = new_actionPrefix + 'b')
                 nodes.append(betNode)
-                nodes += build_leduc_hand_tree(hand, copy.deepcopy(previous_moves), new_next_player, new_current_round, betNode, betting_parameters, tree)
+                nodes += build_leduc_hand_tree(hand, copy.deepcopy(previous_moves), new_next_player, new_current_round, betNode, betting_parameters, tree, known_information)
 
                 previous_moves[new_current_round][new_current_player] = 'n' # Cleanup for the code after the end of the if
             else:
@@ -163,37 +168,46 @@ def build_leduc_hand_tree(hand, previous_moves, current_player, current_round, c
                 nodes.append(l)
         else:        
             checkNode = tree.addNode(next_player, parent = current_node, actionName = actionPrefix + 'c')
-            nodes += build_leduc_hand_tree(hand, copy.deepcopy(previous_moves), next_player, current_round, checkNode, betting_parameters, tree)
+            nodes += build_leduc_hand_tree(hand, copy.deepcopy(previous_moves), next_player, current_round, checkNode, betting_parameters, tree, known_information)
             nodes.append(checkNode)
             
         betNode = tree.addNode(next_player, parent = current_node, actionName = actionPrefix + 'b')
         nodes.append(betNode)
         previous_moves[current_round][current_player] = 'b'
-        nodes += build_leduc_hand_tree(hand, copy.deepcopy(previous_moves), next_player, current_round, betNode, betting_parameters, tree)
+        nodes += build_leduc_hand_tree(hand, copy.deepcopy(previous_moves), next_player, current_round, betNode, betting_parameters, tree, known_information)
 
     return nodes
 
-def create_information_sets(node1, node2):
+def create_information_sets(hand_nodes, known_information):
     """
-    Takes two identically shaped trees (rooted at node1 and node2) and put all the nodes
-    belonging to the same player and having access to the same information in pairwise information sets.
+    Takes the identically shaped trees of all the hands (rooted at hand_nodes) and put in the same information set all
+    the nodes reached by the same actions, belonging to the same player and having access to the same information
+    (given by node id in known_information).
+    Nodes are grouped with a single visit of each tree, by the corresponding node in the tree of the first hand, their
+    player and their known information; each information set keeps the id of its node in the tree of the first of its
+    hands.
     """
 
-    if(node1.isLeaf()):
-        return
-    
-    if(node1.player == node2.player and node1.known_information == node2.known_information):
-        iset_id = min(node1.information_set, node2.information_set)
-        node1.information_set = iset_id
-        node2.information_set = iset_id
-    
-    for i in range(len(node1.children)):
-        create_information_sets(node1.children[i], node2.children[i])
+    information_sets = {}
+
+    for hand_node in hand_nodes:
+        nodes_to_visit = [ (hand_node, hand_nodes[0]) ]
+
+        while(len(nodes_to_visit) > 0):
+            (node, reference_node) = nodes_to_visit.pop()
+            if(node.isLeaf()):
+                continue
+
+            key = (reference_node.id, node.player, known_information[node.id])
+            node.information_set = information_sets.setdefault(key, node.information_set)
+            nodes_to_visit.extend(zip(node.children, reference_node.children))
 
 def build_all_possible_hands(num_players, cards):
     """
     Build all the possible hands for the game of Leduc with a given number of players and a given set of cards.
     Returns a list of lists, where each inner list has one card per player plus one public card.
+    Cards are identified by their rank: the suits only bound how many times each rank can appear in a hand, and each
+    distinct hand is returned once.
     """
 
     unique_cards = list(set(cards))
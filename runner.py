@@ -3,11 +3,13 @@ from games.leduc import build_leduc_tree
 from games.goofspiel import build_goofspiel_tree, TieSolver
 from games.hanabi import build_hanabi_tree, UtilitySplitter
 
-from data_structures.trees import randomTree
+from data_structures.trees import randomTree, setTraversalMode, TraversalMode
 from data_structures.cfr_trees import CFRTree
 from cfr_code.sample_cfr import SolveWithSampleCFR
-from cfr_code.cfr import SolveWithCFR
+from cfr_code.cfr import SolveWithCFR, CFREngine
 from cfr_code.reconstruction_cfr import SolveWithReconstructionCFR
+from cfr_code.discounted_cfr import SolveWithDiscountedCFR, SolveWithLinearCFR
+from cfr_code.mccfr import SolveWithExternalSamplingMCCFR, SolveWithOutcomeSamplingMCCFR
 from utilities.serialization import tree_to_colgen_dat_file
 
 import time
@@ -40,10 +42,24 @@ parser.add_argument('--number_iterations', '-t', type=int, default=100000, help=
 parser.add_argument('--bootstrap_iterations', '-bt', type=int, default=0, help='number of iterations to run without sampling')
 parser.add_argument('--check_every_iteration', '-ct', type=int, default=-1, help='every how many iterations to check the epsilon')
 parser.add_argument('--bound_joint_size', '-bjs', const=True, nargs='?', help='bound or not the limit of the resulting joint strategy')
+parser.add_argument('--batched_sampling', '-bs', const=True, nargs='?', help='sample the action plans with array operations over all the information sets (only for cfr-s)')
 parser.add_argument('--reconstruct_every_iteration', '-rei', type=int, default=1, help='every how many iterations to reconstruct a joint from the marginals')
+parser.add_argument('--factored_joint', '-fj', const=True, nargs='?', help='keep the reconstructed joints in product form, without building the joint plans (only for cfr-jr)')
+parser.add_argument('--pipelined_reconstruction', '-pr', const=True, nargs='?', help='reconstruct the joints in a background process while iterating (only for cfr-jr)')
+parser.add_argument('--incremental_check', '-ic', const=True, nargs='?', help='keep the utility and epsilons of the joint strategy up to date as plans are added, for cheap frequent checks (only for cfr-s and cfr-jr)')
+parser.add_argument('--async_checks', '-ac', const=True, nargs='?', help='compute the epsilons of the checkpoints in a background process (only for cfr, cfr+, cfr-s and cfr-jr)')
 parser.add_argument('--reconstruct_not_optimal_plan', '-rnop', const=True, nargs='?', help='do not try to find the optimal plan to reconstruct at each reconstruction iteration')
 
-parser.add_argument('--algorithm', '-a', type=str, default='scfr', choices=['cfr-s', 'cfr', 'cfr+', 'cfr-jr'], help='algorithm to be used')
+parser.add_argument('--algorithm', '-a', type=str, default='scfr', choices=['cfr-s', 'cfr', 'cfr+', 'cfr-jr', 'lcfr', 'dcfr', 'es-mccfr', 'os-mccfr'], help='algorithm to be used')
+parser.add_argument('--exploration', '-ex', type=float, default=0.6, help='exploration of the sampling strategy of the player (only for os-mccfr)')
+parser.add_argument('--dcfr_parameters', '-dp', type=float, default=[1.5, 0, 2], nargs=3, help='alpha, beta and gamma parameters (only for dcfr)')
+parser.add_argument('--single_pass', '-sp', const=True, nargs='?', help='update all the players with a single tree traversal per iteration')
+parser.add_argument('--engine', '-e', type=str, default='recursive', choices=['recursive', 'vectorized'], help='how the tree is traversed (only for cfr and cfr+, and cfr+ needs the recursive engine)')
+parser.add_argument('--regret_pruning', '-rp', const=True, nargs='?', help='use regret-based pruning (only for cfr, cfr+, lcfr and dcfr, with the recursive engine)')
+parser.add_argument('--processes', '-np', type=int, default=1, help='number of worker processes for the CFR traversals (only for cfr, cfr+ and cfr-jr)')
+parser.add_argument('--chance_sampling', '-cs', type=int, default=0, help='number of outcomes of the root chance node to sample at each iteration, 0 to traverse all of them (only for cfr, cfr+ and cfr-jr, with the recursive engine)')
+parser.add_argument('--iterative_traversals', '-it', const=True, nargs='?', help='use explicit-stack traversals instead of recursive ones (for very deep trees)')
+parser.add_argument('--release_base_tree', '-rbt', const=True, nargs='?', help='free the base tree once the CFR tree is built, to save memory on large games')
 
 parser.add_argument('--logfile', '-log', type=str, default=(str(int(time.time())) + "log.log"), help='file in which to log events and errors')
 parser.add_argument('--results', '-res', type=str, default='results/', help='folder where to put the results (must contain subfolders for each game')
@@ -70,8 +86,17 @@ number_iterations = args.number_iterations
 bootstrap_iterations = args.bootstrap_iterations
 check_every_iteration = args.check_every_iteration
 bound_joint_size = args.bound_joint_size != None
+incremental_check = args.incremental_check != None
+async_checks = args.async_checks != None
 reconstructEveryIteration = args.reconstruct_every_iteration
 reconstructWithOptimalPlan = args.reconstruct_not_optimal_plan == None
+single_pass_traversal = args.single_pass != None
+engine = {'recursive':CFREngine.Recursive,'vectorized':CFREngine.Vectorized}[args.engine]
+regret_pruning = args.regret_pruning != None
+processes = args.processes
+if args.iterative_traversals != None:
+    setTraversalMode(TraversalMode.Iterative)
+release_base_tree = args.release_base_tree != None
 
 log_file_name = args.logfile
 results_directory = args.results
@@ -88,6 +113,10 @@ def log_line(string):
     log_file.close()
     print(string)
 
+def log_build_times(cfr_tree):
+    phases = ", ".join(phase + " = " + str(round(duration, 3)) + "s" for (phase, duration) in cfr_tree.build_times.items())
+    log_line("Built the CFR tree in " + str(sum(cfr_tree.build_times.values())) + " seconds (" + phases + ")")
+
 def log_result_point_callback(results_file_name):
     def __callback(datapoint):
         results_file = open(results_file_name, "r")
@@ -103,15 +132,37 @@ def solve_function(cfr_tree, results_file_name):
     if args.algorithm == 'cfr-s':
         return SolveWithSampleCFR(cfr_tree, number_iterations, bootstrap_iterations = bootstrap_iterations,
                              checkEveryIteration = check_every_iteration, bound_joint_size = bound_joint_size,
-                             check_callback = log_result_point_callback(results_file_name))
+                             check_callback = log_result_point_callback(results_file_name),
+                             single_pass_traversal = single_pass_traversal, incremental_check = incremental_check,
+                             async_checks = async_checks, batched_sampling = args.batched_sampling != None)
     if args.algorithm == 'cfr' or args.algorithm == 'cfr+':
         return SolveWithCFR(cfr_tree, number_iterations, checkEveryIteration = check_every_iteration,
-                            check_callback = log_result_point_callback(results_file_name), use_cfr_plus = args.algorithm == 'cfr+')
+                            check_callback = log_result_point_callback(results_file_name), use_cfr_plus = args.algorithm == 'cfr+',
+                            engine = engine, single_pass_traversal = single_pass_traversal, regret_pruning = regret_pruning,
+                            processes = processes, chance_sampling_batch = args.chance_sampling, async_checks = async_checks)
+    if args.algorithm == 'lcfr':
+        return SolveWithLinearCFR(cfr_tree, number_iterations, checkEveryIteration = check_every_iteration,
+                                  check_callback = log_result_point_callback(results_file_name), regret_pruning = regret_pruning)
+    if args.algorithm == 'dcfr':
+        (alpha, beta, gamma) = args.dcfr_parameters
+        return SolveWithDiscountedCFR(cfr_tree, number_iterations, alpha, beta, gamma, checkEveryIteration = check_every_iteration,
+                                      check_callback = log_result_point_callback(results_file_name), regret_pruning = regret_pruning)
+    if args.algorithm == 'es-mccfr':
+        return SolveWithExternalSamplingMCCFR(cfr_tree, number_iterations, checkEveryIteration = check_every_iteration,
+                                              check_callback = log_result_point_callback(results_file_name))
+    if args.algorithm == 'os-mccfr':
+        return SolveWithOutcomeSamplingMCCFR(cfr_tree, number_iterations, exploration = args.exploration,
+                                             checkEveryIteration = check_every_iteration,
+                                             check_callback = log_result_point_callback(results_file_name))
     if args.algorithm == 'cfr-jr':
         return SolveWithReconstructionCFR(cfr_tree, number_iterations, checkEveryIteration = check_every_iteration,
                                           reconstructEveryIteration = reconstructEveryIteration,
                                           reconstructWithOptimalPlan = reconstructWithOptimalPlan,
-                                          check_callback = log_result_point_callback(results_file_name))
+                                          check_callback = log_result_point_callback(results_file_name),
+                                          single_pass_traversal = single_pass_traversal, processes = processes,
+                                          chance_sampling_batch = args.chance_sampling, factored_joint = args.factored_joint != None,
+                                          pipelined_reconstruction = args.pipelined_reconstruction != None,
+                                          incremental_check = incremental_check, async_checks = async_checks)
 
 def count_sequences(cfr_tree):
     all_nodes = reduce(lambda x, y: x + y.nodes, cfr_tree.information_sets.values(), [])
@@ -121,8 +172,8 @@ def count_sequences(cfr_tree):
     count = 0
 
     for p in range(cfr_tree.numOfPlayers):
-        Q_raw = list(filter(lambda q: q != {}, map(lambda n: n.base_node.getSequence(p), all_nodes)))
-        Q = [{}] + [dict(t) for t in {tuple(d.items()) for d in Q_raw}]
+        # Sequences are interned, so distinct sequences have distinct ids (the empty one is 0)
+        Q = {0} | set(map(lambda n: cfr_tree.sequence_table.getSequenceId(n, p), all_nodes))
         count += len(Q)
         
     return count
@@ -162,6 +213,10 @@ def run_experiment(cfr_tree, results_file_name, parameters_dict, args, number_it
 
     log_line("Finished solving with " + args.algorithm + ".")
     log_line("Time elapsed = " + str(res['tot_time']) + " seconds.\n")
+    if 'skipped_nodes_fraction' in res:
+        log_line("Fraction of nodes skipped by regret-based pruning = " + str(res['skipped_nodes_fraction']) + "\n")
+    if 'effective_iterations_per_second' in res:
+        log_line("Effective iterations per second with chance sampling = " + str(res['effective_iterations_per_second']) + "\n")
 
     results_file = open(results_file_name, "r")
     old_data = json.load(results_file)
@@ -169,6 +224,10 @@ def run_experiment(cfr_tree, results_file_name, parameters_dict, args, number_it
     old_data["total_duration"] = res['tot_time']
     old_data["average_iterations_per_second"] = number_iterations / res['tot_time']
     old_data["utility"] = res['utility']
+    if 'skipped_nodes_fraction' in res:
+        old_data["skipped_nodes_fraction"] = res['skipped_nodes_fraction']
+    if 'effective_iterations_per_second' in res:
+        old_data["effective_iterations_per_second"] = res['effective_iterations_per_second']
     results_file = open(results_file_name, "w+")
     results_file.write(json.dumps(old_data))
     results_file.close()
@@ -183,7 +242,10 @@ if game == 'kuhn':
     log_line("Building a " + game_name + " tree")
     kuhn_tree = build_kuhn_tree(num_players, rank)
     log_line("Built a " + game_name + " tree")
-    cfr_tree = CFRTree(kuhn_tree)
+    cfr_tree = CFRTree(kuhn_tree, release_base_tree = release_base_tree)
+    log_build_times(cfr_tree)
+    if release_base_tree:
+        kuhn_tree = None
     
     results_file_name = results_directory + "kuhn/" + str(int(time.time())) + "_" + str(num_players) + "_" + str(rank)
     results_file_name = make_filename_unique(results_file_name)
@@ -195,7 +257,10 @@ if game == 'leduc':
     log_line("Building a " + game_name + " tree")
     leduc_tree = build_leduc_tree(num_players, num_of_suits, rank, betting_parameters)
     log_line("Built a " + game_name + " tree")
-    cfr_tree = CFRTree(leduc_tree)
+    cfr_tree = CFRTree(leduc_tree, release_base_tree = release_base_tree)
+    log_build_times(cfr_tree)
+    if release_base_tree:
+        leduc_tree = None
 
     results_file_name = results_directory + "leduc/" + str(int(time.time())) + "_" + str(num_players) + "_" + str(num_of_suits) + "_" + str(rank)
     results_file_name = make_filename_unique(results_file_name)
@@ -207,7 +272,10 @@ if game == 'goofspiel':
     log_line("Building a " + game_name + " tree")
     goofspiel_tree = build_goofspiel_tree(num_players, rank, tie_solver)
     log_line("Built a " + game_name + " tree")
-    cfr_tree = CFRTree(goofspiel_tree)
+    cfr_tree = CFRTree(goofspiel_tree, release_base_tree = release_base_tree)
+    log_build_times(cfr_tree)
+    if release_base_tree:
+        goofspiel_tree = None
 
     results_file_name = results_directory + "goofspiel/" + str(int(time.time())) + \
                         "_" + str(num_players) + "_" + str(rank) + '_' + tie_solver.name
@@ -221,7 +289,8 @@ if game == 'random':
     random_tree = randomTree(args.depth, args.branching_factor, args.iset_probability, num_players,
                              min_utility = 0, max_utility = 1, int_utility = False)
     log_line("Built a " + game_name + " tree")
-    cfr_tree = CFRTree(random_tree)
+    cfr_tree = CFRTree(random_tree, release_base_tree = release_base_tree)
+    log_build_times(cfr_tree)
 
     results_file_name = results_directory + "random/" + str(int(time.time())) + "_" + str(num_players) + "_" + str(args.depth) + \
                                 "_" + str(args.branching_factor)
@@ -231,6 +300,8 @@ if game == 'random':
         with open(results_file_name + '.dat', 'w') as f:
             f.write(tree_to_colgen_dat_file(random_tree))
         log_line("Dat file created (for random tree).")
+    if release_base_tree:
+        random_tree = None
 
     run_experiment(cfr_tree, results_file_name, parameters_dict, args, number_iterations)
 
@@ -243,7 +314,10 @@ if game == 'hanabi':
     hanabi_tree = build_hanabi_tree(num_players, num_of_suits, color_distribution, 
                                     cards_per_player, starting_clue_tokens, utility_splitter = utility_splitter)
     log_line("Built a " + game_name + " tree")
-    cfr_tree = CFRTree(hanabi_tree)
+    cfr_tree = CFRTree(hanabi_tree, release_base_tree = release_base_tree)
+    log_build_times(cfr_tree)
+    if release_base_tree:
+        hanabi_tree = None
 
     results_file_name = results_directory + "hanabi/" + str(int(time.time())) + "_" + string_description
     results_file_name = make_filename_unique(results_file_name)
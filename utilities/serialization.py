@@ -41,6 +41,8 @@ def tree_to_colgen_dat_file(tree, compressSequenceNames = True):
     all_leaves = list(filter(lambda n: n.isLeaf(), reduce(lambda x, y: x + y.children, all_nodes, [])))
     all_nodes = all_nodes + all_leaves
 
+    sequence_table = cfr_tree.sequence_table
+
     Q_holder = []
 
     for p in range(cfr_tree.numOfPlayers):
@@ -48,10 +50,11 @@ def tree_to_colgen_dat_file(tree, compressSequenceNames = True):
         # --------------------------
         # Print sequences
         # --------------------------
-        Q_raw = list(filter(lambda q: q != {}, map(lambda n: n.base_node.getSequence(p), all_nodes)))
+        Q_raw = map(lambda n: sequence_table.getSequenceId(n, p), all_nodes)
 
-        # Remove duplicates
-        Q = [{}] + [dict(t) for t in {tuple(d.items()) for d in Q_raw}]
+        # Remove duplicates (distinct sequences have distinct ids, the empty one is 0)
+        Q_ids = {}.fromkeys(q for q in Q_raw if q != 0)
+        Q = [{}] + [dict(t) for t in {tuple(sequence_table.getSequenceItems(q)) for q in Q_ids}]
         Q_holder.append(Q)
 
         s += "#|Q" + str(p+1) + "| = " + str(len(Q)) + "\n\n"
@@ -80,7 +83,7 @@ def tree_to_colgen_dat_file(tree, compressSequenceNames = True):
         s += ":=\nempty_is_" + str(p+1) + " 1" + (" 0" * (len(Q)-1)) + "\n"
         for h in H:
             s += str(h.id) + " "
-            h_seq = h.nodes[0].base_node.getSequence(p)
+            h_seq = sequence_table.getSequence(h.nodes[0], p)
             h_next_sequences = []
             for a in range(h.action_count):
                 seq_copy = h_seq.copy()
@@ -149,8 +152,7 @@ def tree_to_colgen_dat_file(tree, compressSequenceNames = True):
     return s
 
 def serialize_tree(tree):
-    def serialize_subtree(node):
-        # print("Starting " + str(node))
+    def serialize_node(node):
         if node.isLeaf():
             return 'l ' + str(node.utility)[1:-1].replace(',', '') + '\n'
         
@@ -163,28 +165,32 @@ def serialize_tree(tree):
             res = 'n ' + str(len(node.children)) + ' ' + str(node.player) + ' ' + \
                     str(node.information_set) + chance_probability
 
-        res += '\n'
-
-        for child in node.children:
-            res += serialize_subtree(child)
-        # print("Ending " + str(node))
-        # print(res)
-        # print('----------')
-        return res
+        return res + '\n'
 
     header = str(tree.numOfPlayers) + ' ' + str(tree.root.player) + '\n'
 
-    return header + serialize_subtree(tree.root)
+    # Pre-order visit with an explicit stack (children are pushed reversed, so that they are popped in order)
+    res = [ header ]
+    nodes_to_visit = [ tree.root ]
+
+    while len(nodes_to_visit) > 0:
+        node = nodes_to_visit.pop()
+        res.append(serialize_node(node))
+        nodes_to_visit.extend(reversed(node.children))
+
+    return ''.join(res)
 
 def deserialize_tree(string):
-    def deserialize_subtree(tree, parent_node, lines):
-        line = lines[0]
-        lines = lines[1:]
+    def deserialize_node(tree, parent_node, line):
+        """
+        Add to the tree the node described by line, returning it together with its number of children.
+        """
+
         line_elements = line.split(' ')
 
         if line[0] == 'l':
             utility = ast.literal_eval('[' + line[2:].replace(' ', ',') + ']')
-            tree.addLeaf(parent_node, utility)
+            return (tree.addLeaf(parent_node, utility), 0)
         elif line[0] == 'n':
             num_children = int(line_elements[1])
             player = int(line_elements[2])
@@ -193,19 +199,11 @@ def deserialize_tree(string):
             if len(line_elements) > 4:
                 chance_probability = line_elements[4]
 
-            node = tree.addNode(player, information_set, parent_node, chance_probability)
-
-            for i in range(num_children):
-                lines = deserialize_subtree(tree, node, lines)
+            return (tree.addNode(player, information_set, parent_node, chance_probability), num_children)
         elif line[0] == 'c':
             num_children = int(line_elements[1])
 
-            chance_node = tree.addChanceNode(parent_node)
-
-            for i in range(num_children):
-                lines = deserialize_subtree(tree, chance_node, lines)
-
-        return lines
+            return (tree.addChanceNode(parent_node), num_children)
 
     lines = string.split('\n')
     header_line = lines[0]
@@ -228,8 +226,21 @@ def deserialize_tree(string):
 
     tree = Tree(num_players, first_player, root)
 
-    lines = lines[2:]
-    for i in range(root_num_children):
-        lines = deserialize_subtree(tree, tree.root, lines)
+    # Lines are in pre-order: keep a stack of the nodes that still have children to be read
+    # (and how many), instead of recursing on the remaining lines
+    open_nodes = [ [tree.root, root_num_children] ]
+    line_index = 2
+
+    while len(open_nodes) > 0:
+        if open_nodes[-1][1] == 0:
+            open_nodes.pop()
+            continue
+
+        open_nodes[-1][1] -= 1
+        (node, num_children) = deserialize_node(tree, open_nodes[-1][0], lines[line_index])
+        line_index += 1
+
+        if num_children > 0:
+            open_nodes.append([node, num_children])
 
     return tree
\ No newline at end of file